@@ -1,17 +1,267 @@
 
-from fastapi import FastAPI
-from pydantic import BaseModel
+import asyncio
+import hmac
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Literal
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from musigent import http
+from musigent.metrics import metrics
+from musigent.agents.jingle import JingleInput
+from musigent.jobs import callback_token
 from musigent.runner import MusigentRunner
+from musigent.scheduler import Overloaded
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # MUSIGENT_RETENTION_INTERVAL=seconds archives old interactions in the background
+    interval = float(os.getenv("MUSIGENT_RETENTION_INTERVAL", "0"))
+    retention = None
+    if interval > 0:
+        from musigent.retention import run_periodically
+        retention = asyncio.create_task(run_periodically(runner.retention, interval))
+    from musigent.agents.time import get_utc_time
+    get_utc_time()  # start the geolocation lookup before the first request needs it
+    yield
+    if retention is not None:
+        retention.cancel()
+    await http.aclose()
+    if runner.registry.is_built("quality"):
+        runner.quality.workers.shutdown()
 
-app = FastAPI(title="Musigent - Starter API")
+
+app = FastAPI(title="Musigent - Starter API", lifespan=lifespan)
 runner = MusigentRunner()
 
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 class GenerateRequest(BaseModel):
     mode: str  # jingle | bgm | persona
     prompt: str
     duration_sec: int = 30
+    username: str = "guest"  # persona mode uses this user's taste profile
+    use_cache: bool = True  # false forces a fresh Suno generation
+    timings: bool = False  # add per-stage milliseconds to the result
+    candidates: int | None = Field(None, ge=1, le=8)  # speculative drafts; default MUSIGENT_CANDIDATES
+    stream: Literal["sse", "ndjson"] | None = None  # stream stage events instead of one JSON body
+
+
+STREAM_MEDIA_TYPES = {"sse": "text/event-stream", "ndjson": "application/x-ndjson"}
+
+
+def _stage_line(fmt: str, event: str, data) -> str:
+    if fmt == "sse":
+        return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+    return json.dumps({"event": event, "data": data}, default=str) + "\n"
+
+
+async def staged_response(events, fmt: str) -> StreamingResponse:
+    """
+    Stage events (see MusigentRunner.astream_request) as Server-Sent Events
+    or NDJSON. The first event is awaited before responding, so a request
+    that is not admitted still gets a 503; later failures end the stream
+    with an "error" event.
+    """
+    first = await events.__anext__()
+
+    async def body():
+        try:
+            yield _stage_line(fmt, *first)
+            async for event, data in events:
+                yield _stage_line(fmt, event, data)
+        except Exception as e:
+            yield _stage_line(fmt, "error", {"detail": f"{type(e).__name__}: {e}"})
+        finally:
+            await events.aclose()
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(body(), media_type=STREAM_MEDIA_TYPES[fmt], headers=headers)
+
 
 @app.post("/generate")
 async def generate(req: GenerateRequest):
-    result = runner.handle_request(req.mode, req.prompt, req.duration_sec)
+    if req.stream:
+        return await staged_response(runner.astream_request(
+            req.mode, req.prompt, req.duration_sec, req.username,
+            use_cache=req.use_cache, timings=req.timings, candidates=req.candidates
+        ), req.stream)
+    result = await runner.ahandle_request(
+        req.mode, req.prompt, req.duration_sec, req.username,
+        use_cache=req.use_cache, timings=req.timings, candidates=req.candidates
+    )
     return result
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage latencies, upstream calls, cache and rejection counters (Prometheus text)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/status")
+def status():
+    """Admission queue and Suno credit ledger."""
+    return {"scheduler": runner.scheduler.status(), "suno_credits": runner.credits.status()}
+
+
+@app.get("/quota/{username}")
+def quota(username: str):
+    return runner.quota.usage(username)
+
+
+@app.get("/history")
+def history(
+    username: str | None = None,
+    mode: str | None = None,
+    approved: bool | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    fields: str | None = Query(None, description="comma-separated dotted paths, e.g. plan.mode,evaluation"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = None,
+    archived: bool = False,
+):
+    """
+    Newest-first page of stored interactions; follow `next_cursor` for more.
+    `archived=true` queries interactions moved out by retention.
+    """
+    try:
+        return runner.memory.history(
+            username=username,
+            mode=mode,
+            approved=approved,
+            since=since,
+            until=until,
+            fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+            limit=limit,
+            cursor=cursor,
+            archived=archived,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+AUDIO_CHUNK = 256 * 1024
+
+
+@app.api_route("/audio/{sha256}", methods=["GET", "HEAD"])
+async def audio(sha256: str, request: Request):
+    """
+    Locally stored track by content hash, with single-range requests and
+    immutable caching (the URL changes whenever the content does).
+    """
+    store = runner.audio_store
+    opened = await asyncio.to_thread(store.open, sha256) if store is not None else None
+    if opened is None:
+        raise HTTPException(status_code=404, detail="Unknown track")
+    view, track = opened
+    size = len(view)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{sha256}"',
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    from musigent.audio_store import parse_range
+
+    try:
+        byte_range = parse_range(request.headers.get("range"), size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    status = 200
+    start, end = 0, size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    if request.method == "HEAD":
+        return Response(status_code=status, headers=headers, media_type=track["content_type"])
+
+    async def body():
+        # zero-copy slices of the memory map; the page cache is shared by all readers
+        data = memoryview(view)
+        for offset in range(start, end + 1, AUDIO_CHUNK):
+            yield data[offset:min(offset + AUDIO_CHUNK, end + 1)]
+
+    return StreamingResponse(body(), status_code=status, headers=headers,
+                             media_type=track["content_type"])
+
+
+@app.post("/suno/callback")
+async def suno_callback(request: Request, token: str | None = None):
+    """
+    Completion callbacks from Suno. MUSIGENT_CALLBACK_URL must point at this
+    route with a secret `token` query parameter; other callers get a 403.
+    """
+    expected = callback_token(os.getenv("MUSIGENT_CALLBACK_URL"))
+    if expected is None or not hmac.compare_digest((token or "").encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Invalid callback token")
+    try:
+        suno = runner.registry.get("suno")
+    except ValueError:
+        raise HTTPException(status_code=503, detail="Suno is not configured")
+    payload = await request.json()
+    if not await asyncio.to_thread(suno.jobs.handle_callback, payload):
+        raise HTTPException(status_code=404, detail="Unknown task")
+    return {"status": "received"}
+
+
+class JingleItem(BaseModel):
+    brand_name: str
+    company_field: str
+    customer_persona: str
+    vibe: str = "standard"  # energetic | peaceful | standard
+
+
+class JingleRequest(JingleItem):
+    username: str = "guest"
+    use_cache: bool = True
+    timings: bool = False
+    stream: Literal["sse", "ndjson"] | None = None  # as in /generate
+
+
+@app.post("/jingle")
+async def jingle(req: JingleRequest):
+    """One brand jingle (rate limit and daily quota apply)."""
+    args = (req.brand_name, req.company_field, req.customer_persona, req.vibe,
+            req.username, req.use_cache, req.timings)
+    if req.stream:
+        return await staged_response(runner.astream_jingle_survey(*args), req.stream)
+    return await runner.ahandle_jingle_survey(*args)
+
+
+class JingleBatchRequest(BaseModel):
+    items: list[JingleItem] = Field(..., min_length=1, max_length=50)
+    username: str = "guest"
+    concurrency: int = Field(4, ge=1, le=16)
+    use_cache: bool = True
+    timings: bool = False
+
+
+@app.post("/jingle/batch")
+async def jingle_batch(req: JingleBatchRequest):
+    """Streams one NDJSON line per brand as soon as its jingle is done."""
+    inputs = [JingleInput(**item.model_dump()) for item in req.items]
+
+    async def lines():
+        async for result in runner.ahandle_jingle_batch(
+            inputs, req.username, req.concurrency, req.use_cache, req.timings
+        ):
+            yield json.dumps(result, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
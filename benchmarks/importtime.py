@@ -0,0 +1,111 @@
+# benchmarks/importtime.py
+# Cold-start benchmark: `python -X importtime` numbers for the musigent entry points.
+#
+#   python benchmarks/importtime.py                 # JSON to stdout
+#   python benchmarks/importtime.py -o before.json  # save for comparison
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "import musigent": "import musigent",
+    "import runner": "from musigent.runner import MusigentRunner",
+    "construct runner": (
+        "import time; t = time.perf_counter(); "
+        "from musigent.runner import MusigentRunner; MusigentRunner(); "
+        "print('__elapsed__', time.perf_counter() - t)"
+    ),
+}
+
+HEAVY = ("numpy", "pandas", "pydub", "httpx", "fastapi")
+
+
+def parse_importtime(stderr: str) -> dict:
+    """module -> cumulative microseconds (top-level entries keep their full cost)."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def run_once(stmt: str, workdir: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+               PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", stmt],
+        cwd=workdir, env=env, capture_output=True, text=True,
+    )
+    modules = parse_importtime(proc.stderr)
+    elapsed = None
+    for line in proc.stdout.splitlines():
+        if line.startswith("__elapsed__"):
+            elapsed = float(line.split()[1])
+    # top-level imports are the ones without leading spaces in the raw output
+    top_level = [
+        line.split("|")[-1].strip()
+        for line in proc.stderr.splitlines()
+        if line.startswith("import time:") and "|" in line and not line.split("|")[-1].startswith("  ")
+        and "cumulative" not in line
+    ]
+    return {
+        "ok": proc.returncode == 0,
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode else None,
+        "total_us": sum(modules.get(name, 0) for name in set(top_level)),
+        "musigent_us": sum(modules.get(name, 0) for name in set(top_level) if name.startswith("musigent")),
+        "modules": modules,
+        "elapsed_s": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--repeat", type=int, default=5)
+    parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:  # runner creates its DB in cwd
+        for name, stmt in SCENARIOS.items():
+            runs = [run_once(stmt, workdir) for _ in range(args.repeat)]
+            ok = [r for r in runs if r["ok"]]
+            if not ok:
+                results.append({"scenario": name, "ok": False, "error": runs[-1]["error"]})
+                continue
+            last = ok[-1]["modules"]
+            elapsed = [r["elapsed_s"] for r in ok if r["elapsed_s"] is not None]
+            results.append({
+                "scenario": name,
+                "ok": True,
+                "median_import_us": int(statistics.median(r["total_us"] for r in ok)),
+                "median_musigent_us": int(statistics.median(r["musigent_us"] for r in ok)),
+                "median_elapsed_s": statistics.median(elapsed) if elapsed else None,
+                "heavy_modules_loaded": sorted(m for m in HEAVY if m in last),
+                "slowest_modules": sorted(last.items(), key=lambda kv: -kv[1])[:10],
+            })
+
+    report = {
+        "benchmark": "importtime",
+        "python": platform.python_version(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+# benchmarks/suite.py
+# Offline performance suite: every upstream (Suno, audio CDN, Audd.io, Google)
+# is served in-process by musigent.testing.upstreams, so no API keys or
+# network are needed and runs are reproducible.
+#
+#   python benchmarks/suite.py                                 # all scenarios, JSON to stdout
+#   python benchmarks/suite.py -s single_request -s analysis_long
+#   python benchmarks/suite.py --latency suno=0.5 --latency audd=0.3
+#   python benchmarks/suite.py -o after.json --compare before.json
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def summarize_latencies(seconds: list) -> dict:
+    if not seconds:
+        return {"n": 0}
+    ordered = sorted(seconds)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2),
+        "p50_ms": round(pct(0.50) * 1000, 2),
+        "p95_ms": round(pct(0.95) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+class Context:
+    """Shared settings plus a fresh working directory / runner per scenario."""
+
+    def __init__(self, args, workdir: str):
+        self.args = args
+        self.workdir = workdir
+
+    def scenario_dir(self, name: str) -> str:
+        path = os.path.join(self.workdir, name)
+        os.makedirs(path, exist_ok=True)
+        os.chdir(path)  # MemoryStore and the Suno job table live in the cwd
+        return path
+
+    def upstreams(self, runner=None):
+        from musigent import http
+        from musigent.testing.upstreams import FakeUpstreams
+
+        callback = None
+        if runner is not None and self.args.suno_mode == "callback":
+            callback = runner.registry.get("suno").jobs.handle_callback
+        fake = FakeUpstreams(latency=self.args.latency, track_seconds=self.args.track_seconds,
+                             callback=callback)
+        http.use_transport(fake.transport())
+        return fake
+
+    def runner(self, name: str):
+        from musigent.runner import MusigentRunner
+
+        self.scenario_dir(name)
+        runner = MusigentRunner()
+        self.upstreams(runner)
+        return runner
+
+
+def close_runner(runner) -> None:
+    if runner.registry.is_built("quality"):
+        runner.quality.workers.shutdown()
+
+
+# -------------------------------------------------------------------------
+# SCENARIOS
+# -------------------------------------------------------------------------
+async def single_request(ctx: Context) -> dict:
+    """Sequential /generate-equivalent calls (no cache): latency and per-stage split."""
+    runner = ctx.runner("single_request")
+    try:
+        await runner.ahandle_request("bgm", "warmup", use_cache=False)
+        latencies, stages = [], {}
+        for i in range(ctx.args.requests):
+            start = time.perf_counter()
+            result = await runner.ahandle_request("bgm", f"calm piano {i}", use_cache=False,
+                                                  timings=True)
+            latencies.append(time.perf_counter() - start)
+            for stage, ms in result["timings"].items():
+                stages.setdefault(stage, []).append(ms)
+        return {
+            "latency": summarize_latencies(latencies),
+            "stage_p50_ms": {k: round(statistics.median(v), 2) for k, v in stages.items()},
+        }
+    finally:
+        close_runner(runner)
+
+
+async def generate_throughput(ctx: Context) -> dict:
+    """Concurrent POST /generate through the FastAPI app (in-process ASGI)."""
+    import httpx
+
+    ctx.scenario_dir("generate_throughput")
+    import app as app_module  # builds its runner in the current directory
+
+    ctx.upstreams(app_module.runner)
+    gate = asyncio.Semaphore(ctx.args.concurrency)
+    latencies, errors = [], 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app_module.app),
+                                 base_url="http://bench", timeout=600) as client:
+        async def one(i):
+            nonlocal errors
+            async with gate:
+                start = time.perf_counter()
+                resp = await client.post("/generate", json={
+                    "mode": "bgm", "prompt": f"lofi beat {i}", "use_cache": False,
+                })
+                latencies.append(time.perf_counter() - start)
+                if resp.status_code != 200 or "evaluation" not in resp.json():
+                    errors += 1
+
+        await one(-1)  # warm-up: agents, worker pool
+        latencies.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(ctx.args.requests)))
+        wall = time.perf_counter() - start
+
+    close_runner(app_module.runner)
+    return {
+        "concurrency": ctx.args.concurrency,
+        "requests": ctx.args.requests,
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "requests_per_s": round(ctx.args.requests / wall, 2),
+        "latency": summarize_latencies(latencies),
+    }
+
+
+async def jingle_burst(ctx: Context) -> dict:
+    """Many users firing jingle surveys at once: throughput and limiter outcomes."""
+    runner = ctx.runner("jingle_burst")
+    users, per_user = ctx.args.burst_users, ctx.args.burst_per_user
+    outcomes = {"ok": 0, "rate_limited": 0, "daily_quota": 0, "error": 0}
+    latencies = []
+
+    async def one(user, i):
+        start = time.perf_counter()
+        result = await runner.ahandle_jingle_survey(
+            f"Brand {user}-{i}", "coffee", "students", "energetic", username=f"user{user}",
+        )
+        error = result.get("error")
+        if error is None:
+            outcomes["ok"] += 1
+            latencies.append(time.perf_counter() - start)
+        elif error.startswith("Rate limit"):
+            outcomes["rate_limited"] += 1
+        elif error.startswith("Daily limit"):
+            outcomes["daily_quota"] += 1
+        else:
+            outcomes["error"] += 1
+
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(u, i) for u in range(users) for i in range(per_user)))
+        wall = time.perf_counter() - start
+    finally:
+        close_runner(runner)
+    return {
+        "users": users,
+        "requests_per_user": per_user,
+        "outcomes": outcomes,
+        "wall_s": round(wall, 3),
+        "completed_per_s": round(outcomes["ok"] / wall, 2),
+        "latency": summarize_latencies(latencies),
+    }
+
+
+def _records(n: int, rng: random.Random, now: datetime, users: int = 1000) -> list:
+    records = []
+    for _ in range(n):
+        ts = now - timedelta(seconds=rng.uniform(0, 30 * 86400))
+        records.append({
+            "timestamp_utc": ts.isoformat(timespec="microseconds") + "Z",
+            "username": f"user{rng.randrange(users)}",
+            "plan": {"mode": "jingle", "prompt": "brand jingle", "style": "pop",
+                     "tempo_range": [100, 120], "duration_sec": 5},
+            "draft": {"track_id": "t", "audio_url": "https://cdn.fake.local/audio/t.wav"},
+            "evaluation": {"approved": rng.random() < 0.7, "originality_score": rng.random()},
+            "time_info": None,
+        })
+    return records
+
+
+async def store_growth(ctx: Context) -> dict:
+    """MemoryStore at 10^3..N interactions: insert rate and query latency."""
+    from musigent.memory import MemoryStore
+
+    path = ctx.scenario_dir("store_growth")
+    memory = MemoryStore(os.path.join(path, "memory_db.json"))
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    size = ctx.args.store_size
+    checkpoints = sorted({10 ** k for k in range(3, 8) if 10 ** k <= size} | {size})
+
+    def measure(fn, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return round(statistics.median(timings) * 1000, 3)
+
+    points, total, batch = [], 0, 5000
+    for target in checkpoints:
+        start = time.perf_counter()
+        while total < target:
+            n = min(batch, target - total)
+            await asyncio.to_thread(memory.save_interactions, _records(n, rng, now))
+            total += n
+        insert_s = time.perf_counter() - start
+        added = target - (points[-1]["rows"] if points else 0)
+        db_files = [memory.db_path + suffix for suffix in ("", "-wal")]
+        points.append({
+            "rows": target,
+            "insert_rows_per_s": round(added / insert_s, 1) if insert_s else None,
+            "daily_count_ms": measure(
+                lambda: memory.get_user_daily_count(f"user{rng.randrange(1000)}"), 50),
+            "recent_activity_1h_ms": measure(lambda: memory.recent_activity(3600), 10),
+            "save_interaction_ms": measure(
+                lambda: memory.save_interaction({"mode": "bgm"}, {}, {}, "bench"), 20),
+            "db_bytes": sum(os.path.getsize(f) for f in db_files if os.path.exists(f)),
+        })
+    return {"backend": type(memory.backend).__name__, "points": points}
+
+
+async def analysis_long(ctx: Context) -> dict:
+    """Decode, originality features, fingerprint and streaming early exit on long tracks."""
+    from musigent.analysis import analyze_pcm, decode_audio
+    from musigent.audio_stream import FFMPEG, decode_until_decided
+    from musigent.fingerprint import fingerprint
+    from musigent.testing.upstreams import synth_track
+
+    have_ffmpeg = shutil.which(FFMPEG) is not None
+    repeat = ctx.args.repeat
+
+    def timed(fn):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            value = fn()
+            timings.append(time.perf_counter() - start)
+        return round(statistics.median(timings) * 1000, 2), value
+
+    async def stream(data):
+        async def chunks():
+            for i in range(0, len(data), 64 * 1024):
+                yield data[i:i + 64 * 1024]
+        return await decode_until_decided(chunks(), threshold=0.35)
+
+    tracks = []
+    for seconds in ctx.args.analysis_seconds:
+        data = synth_track(seconds, rate=44100, seed=seconds)
+        entry = {"seconds": seconds, "wav_bytes": len(data)}
+        if have_ffmpeg:
+            entry["decode_ms"], (pcm, rate, _) = timed(lambda: decode_audio(data))
+        else:
+            import io
+            import wave
+
+            import numpy as np
+
+            with wave.open(io.BytesIO(data)) as w:
+                rate = w.getframerate()
+                pcm = np.frombuffer(w.readframes(w.getnframes()), dtype="<i2").reshape(-1, 1)
+        entry["analyze_pcm_ms"], _ = timed(lambda: analyze_pcm(pcm))
+        entry["fingerprint_ms"], _ = timed(lambda: fingerprint(pcm, rate))
+        if have_ffmpeg:
+            start = time.perf_counter()
+            _, info = await stream(data)
+            entry["stream_decide_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            entry["stream_analyzed_seconds"] = info["analyzed_seconds"]
+        tracks.append(entry)
+    return {"ffmpeg": have_ffmpeg, "tracks": tracks}
+
+
+SCENARIOS = {
+    "single_request": single_request,
+    "generate_throughput": generate_throughput,
+    "jingle_burst": jingle_burst,
+    "store_growth": store_growth,
+    "analysis_long": analysis_long,
+}
+
+
+# -------------------------------------------------------------------------
+# REPORT
+# -------------------------------------------------------------------------
+def _numeric_leaves(value, prefix=""):
+    if isinstance(value, dict):
+        for k, v in value.items():
+            yield from _numeric_leaves(v, f"{prefix}.{k}" if prefix else k)
+    elif isinstance(value, list):
+        for i, v in enumerate(value):
+            yield from _numeric_leaves(v, f"{prefix}[{i}]")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, value
+
+
+def compare(old: dict, new: dict) -> dict:
+    """metric -> {"old", "new", "ratio"} for every numeric value in both reports."""
+    old_by_name = {r["scenario"]: r for r in old.get("results", [])}
+    out = {}
+    for result in new.get("results", []):
+        before = old_by_name.get(result["scenario"])
+        if not before:
+            continue
+        old_values = dict(_numeric_leaves(before))
+        diff = {}
+        for name, value in _numeric_leaves(result):
+            if name in old_values:
+                prev = old_values[name]
+                diff[name] = {"old": prev, "new": value,
+                              "ratio": round(value / prev, 3) if prev else None}
+        out[result["scenario"]] = diff
+    return out
+
+
+def parse_latency(items) -> dict:
+    latency = {}
+    for item in items or []:
+        name, _, seconds = item.partition("=")
+        latency[name.strip()] = float(seconds)
+    return latency
+
+
+async def run(args) -> dict:
+    names = args.scenario or list(SCENARIOS)
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        ctx = Context(args, workdir)
+        try:
+            for name in names:
+                start = time.perf_counter()
+                try:
+                    data = await SCENARIOS[name](ctx)
+                    results.append({"scenario": name, "ok": True,
+                                    "elapsed_s": round(time.perf_counter() - start, 3), **data})
+                except Exception as e:
+                    results.append({"scenario": name, "ok": False,
+                                    "error": f"{type(e).__name__}: {e}"})
+        finally:
+            os.chdir(cwd)
+    return {
+        "benchmark": "suite",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp_utc": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "config": {
+            "latency": args.latency,
+            "suno_mode": args.suno_mode,
+            "track_seconds": args.track_seconds,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "audio_workers": os.environ.get("MUSIGENT_AUDIO_WORKERS"),
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline musigent benchmark suite")
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="run only these scenarios (repeatable)")
+    parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    parser.add_argument("--latency", action="append", metavar="UPSTREAM=SECONDS",
+                        help="simulated latency for suno, cdn, audd or google (repeatable)")
+    parser.add_argument("--suno-mode", choices=("sync", "callback"), default="sync",
+                        help="finished track in the generate response, or task + callback")
+    parser.add_argument("--track-seconds", type=float, default=30.0)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--burst-users", type=int, default=10)
+    parser.add_argument("--burst-per-user", type=int, default=8)
+    parser.add_argument("--store-size", type=int, default=100_000,
+                        help="interactions for store_growth (up to 10^6 or more)")
+    parser.add_argument("--analysis-seconds", type=lambda v: [int(x) for x in v.split(",")],
+                        default=[60, 180, 600], help="comma-separated track lengths")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    args.latency = parse_latency(args.latency)
+
+    # keys only need to exist: every call goes to the in-process stand-ins
+    for key in ("SUNO_API_KEY", "AUDD_API_KEY", "GOOGLE_API_KEY"):
+        os.environ.setdefault(key, "benchmark")
+
+    report = asyncio.run(run(args))
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["comparison"] = compare(json.load(f), report)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
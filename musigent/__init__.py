@@ -1,4 +1,12 @@
-# musigent/__init__.py
-from .runner import MusigentRunner
-
-
+# musigent/__init__.py
+# MusigentRunner is imported on first access, so `import musigent` stays cheap.
+
+
+def __getattr__(name):
+    if name == "MusigentRunner":
+        from .runner import MusigentRunner
+        return MusigentRunner
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ["MusigentRunner"]
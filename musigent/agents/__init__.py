@@ -1,7 +1,21 @@
-from .planner import PlannerAgent
-from .composer import ComposerAgent
-from .quality import QualityAgent
-from .time import get_utc_time
-from .jingle import JingleAgent, JingleInput
-
-
+# Agents are imported on first access (QualityAgent pulls in numpy/pydub/httpx).
+import importlib
+
+_EXPORTS = {
+    "PlannerAgent": ".planner",
+    "ComposerAgent": ".composer",
+    "QualityAgent": ".quality",
+    "get_utc_time": ".time",
+    "JingleAgent": ".jingle",
+    "JingleInput": ".jingle",
+}
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module, __name__), name)
+
+
+__all__ = list(_EXPORTS)
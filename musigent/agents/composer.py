@@ -1,27 +1,38 @@
 import uuid
-from musigent.tools import SunoTool, SpotifyTool
+from musigent.registry import Registry, lazy_import
+from musigent.utils.aio import run_sync
 
 
 class ComposerAgent:
-    def __init__(self, memory):
+    def __init__(self, memory, tools: Registry | None = None):
         self.memory = memory
-        self.suno = SunoTool()
-        self.spotify = SpotifyTool()
+        # tools are built on first compose (SunoTool needs SUNO_API_KEY)
+        if tools is None:
+            tools = Registry()
+            tools.register("suno", lambda: lazy_import("musigent.tools:SunoTool")(
+                jobs=lazy_import("musigent.jobs:SunoJobs")(memory.db_path)
+            ))
+        self.tools = tools
+
+    @property
+    def suno(self):
+        return self.tools.get("suno")
 
     def compose(self, plan):
+        return run_sync(self.acompose(plan))
+
+    async def acompose(self, plan):
         track_id = str(uuid.uuid4())
 
-        if plan["mode"] == "persona":
-            taste = self.spotify.analyze_user("mock_user_id")
-        else:
-            taste = {}
+        # persona plans carry the user's profile from PlannerAgent.aplan()
+        taste = plan.get("taste_profile") or {}
 
         # ✅ enforce 5-second max for jingles
         duration = plan["duration_sec"]
         if plan["mode"] == "jingle":
             duration = min(5, duration)
 
-        audio_url = self.suno.generate_music(
+        audio_url = await self.suno.agenerate_music(
             plan["prompt"],
             plan["style"],
             duration,
@@ -1,7 +1,21 @@
+from musigent.registry import Registry, lazy_import
+
 
 class PlannerAgent:
-    def __init__(self, memory):
+    def __init__(self, memory, tools: Registry | None = None):
         self.memory = memory
+        # the taste store (and SpotifyTool behind it) is built on first persona plan
+        if tools is None:
+            tools = Registry()
+            tools.register("spotify", lazy_import("musigent.tools:SpotifyTool"))
+            tools.register("taste", lambda: lazy_import("musigent.taste:TasteStore")(
+                memory.db_path, tools.get("spotify")
+            ))
+        self.tools = tools
+
+    @property
+    def taste(self):
+        return self.tools.get("taste")
 
     def plan(self, mode, prompt, duration_sec):
         plan = {
@@ -24,3 +38,15 @@ class PlannerAgent:
             plan["style"] = "generic"
             plan["tempo_range"] = [60, 120]
         return plan
+
+    async def aplan(self, mode, prompt, duration_sec, username="guest"):
+        """plan(), with persona style and tempo taken from the user's taste profile."""
+        plan = self.plan(mode, prompt, duration_sec)
+        if mode == "persona":
+            from musigent.taste import ENERGY, describe, nearest_style
+
+            vector = await self.taste.aprofile(username)
+            if vector[:ENERGY].any():  # no known genres: keep the generic persona style
+                plan["style"], plan["tempo_range"] = nearest_style(vector)
+            plan["taste_profile"] = describe(vector)
+        return plan
@@ -1,19 +1,46 @@
+import asyncio
 import os
-import io
-import requests
-import numpy as np
-from pydub import AudioSegment
+
+from musigent.audio import AudioCache
+from musigent.workers import AudioWorkerPool
+from musigent import http
+from musigent.events import emit
+from musigent.metrics import metrics, span
+from musigent.utils.aio import run_sync
+
+ORIGINALITY_THRESHOLD = 0.35
 
 
 class QualityAgent:
-    def __init__(self, memory):
+    def __init__(self, memory, assets: AudioCache | None = None,
+                 workers: AudioWorkerPool | None = None, store=None):
         self.memory = memory
         self.audd_key = os.getenv("AUDD_API_KEY", None)
+        # one download + decode per audio_url, shared by both checks;
+        # tracks kept in the AudioStore are read locally
+        self.assets = assets or AudioCache(store=store)
+        # decode + analysis run in worker processes (MUSIGENT_AUDIO_WORKERS=0: thread)
+        self.workers = workers or AudioWorkerPool()
+        # MUSIGENT_STREAM_ANALYSIS=1: decide originality from a prefix of the track
+        self.stream_analysis = os.getenv("MUSIGENT_STREAM_ANALYSIS") == "1"
+        self.stream_margin = float(os.getenv("MUSIGENT_STREAM_MARGIN", "0.05"))
+        self.stream_min_seconds = float(os.getenv("MUSIGENT_STREAM_MIN_SECONDS", "5"))
+        # Audd.io verdicts of earlier tracks, reused for near-duplicates
+        self.fingerprints = None
+        if memory is not None and os.getenv("MUSIGENT_FINGERPRINTS", "1") != "0":
+            from musigent.fingerprint import FingerprintIndex
+            self.fingerprints = FingerprintIndex(
+                memory.db_path,
+                min_similarity=float(os.getenv("MUSIGENT_FP_MIN_SIMILARITY", "0.25")),
+            )
 
     # -------------------------------------------------------------------------
     # MAIN EVALUATION PIPELINE
     # -------------------------------------------------------------------------
     def evaluate(self, draft):
+        return run_sync(self.aevaluate(draft))
+
+    async def aevaluate(self, draft):
         """
         Evaluation:
         - Originality score = audio variability (RMS deviation)
@@ -40,7 +67,11 @@ class QualityAgent:
             }
 
         # ---- REAL originality score ----
-        originality_score = self._compute_originality(audio_url)
+        features, prints = await self._aanalyze(audio_url)
+        originality_score = features["originality_score"] if features else None
+        # an early-exit stream fingerprints only a prefix of the track
+        complete = not features or features.get("complete", True)
+        emit("originality", {"originality_score": originality_score, "audio_features": features})
 
         # If we could not analyze audio (e.g., Suno error / invalid file)
         if originality_score is None:
@@ -48,7 +79,8 @@ class QualityAgent:
             notes.append("Audio could not be analyzed. Originality not computed.")
 
             # we still try copyright check – but if that also fails, risk stays high
-            copyright_info = self._copyright_safety_check(audio_url)
+            copyright_info = await self._acopyright_safety_check(audio_url, prints, complete)
+            emit("copyright", copyright_info)
 
             return {
                 "approved": approved,
@@ -58,12 +90,13 @@ class QualityAgent:
             }
 
         # Normal case: originality successfully computed
-        if originality_score < 0.35:
+        if originality_score < ORIGINALITY_THRESHOLD:
             approved = False
             notes.append("Low originality (audio too repetitive).")
 
         # ---- REAL copyright check ----
-        copyright_info = self._copyright_safety_check(audio_url)
+        copyright_info = await self._acopyright_safety_check(audio_url, prints, complete)
+        emit("copyright", copyright_info)
 
         if copyright_info.get("risk_level") == "high":
             approved = False
@@ -71,6 +104,7 @@ class QualityAgent:
         return {
             "approved": approved,
             "originality_score": originality_score,
+            "audio_features": features,
             "copyright_safety": copyright_info,
             "notes": notes,
         }
@@ -85,58 +119,113 @@ class QualityAgent:
         Low variance → repetitive, low-originality music
         Score output: 0.0 to 1.0, or None if audio cannot be analyzed.
         """
-        try:
-            audio_bytes = requests.get(audio_url, timeout=10).content
-            if not audio_bytes:
-                return None
-
-            audio = AudioSegment.from_file(io.BytesIO(audio_bytes))
+        features = run_sync(self._aanalyze_audio(audio_url))
+        return features["originality_score"] if features else None
 
-            # convert to mono array
-            samples = np.array(audio.get_array_of_samples()).astype(np.float32)
+    async def _aanalyze_audio(self, audio_url):
+        """
+        Full feature set from musigent.analysis (originality score, spectral
+        flux, repetition), or None if audio cannot be analyzed.
+        """
+        features, _ = await self._aanalyze(audio_url)
+        return features
 
-            # compute RMS per chunk
-            chunk_size = 2048
-            rms_values = [
-                float(np.sqrt(np.mean(samples[i:i + chunk_size] ** 2)))
-                for i in range(0, len(samples), chunk_size)
-            ]
+    async def _aanalyze(self, audio_url):
+        """(features, fingerprint) of the track; features are None if it cannot be analyzed."""
+        try:
+            if self.stream_analysis and not self.assets.cached(audio_url):
+                return await self._astream_analyze(audio_url)
 
-            if len(rms_values) < 2:
-                # Too short / invalid to measure originality
-                return None
+            with span("quality.download"):
+                asset = await self.assets.aget(audio_url)
+            if not asset.size:
+                return None, None
+            # decode + analysis are CPU-bound: keep them off the event loop
+            with span("quality.analysis"):
+                if self.workers.enabled:
+                    return await self.workers.analyze_bytes(asset.data)
 
-            # originality is variance normalized
-            variability = np.std(rms_values)
-            if max(rms_values) == 0:
-                return None
+                from musigent.analysis import analyze_track, decode_audio  # numpy, loaded on first analysis
 
-            normalized = min(1.0, variability / max(rms_values))
+                def analyze():
+                    pcm, frame_rate, _ = decode_audio(asset.data)
+                    return analyze_track(pcm, frame_rate)
 
-            return round(float(normalized), 3)
+                return await asyncio.to_thread(analyze)
 
         except Exception:
             # Any decoding/network error → treat as "not analyzable"
-            return None
+            return None, None
+
+    async def _astream_analyze(self, audio_url):
+        """
+        Decode the track while it downloads and stop once the originality
+        verdict is clear of the threshold by `stream_margin`. The features
+        then describe the analyzed prefix ("analyzed_seconds").
+        """
+        from musigent.audio_stream import decode_until_decided
+
+        with span("quality.stream_decode"):
+            pcm, info = await decode_until_decided(
+                self.assets.astream(audio_url),
+                threshold=ORIGINALITY_THRESHOLD,
+                margin=self.stream_margin,
+                min_seconds=self.stream_min_seconds,
+                # the Audd.io check and the local audio store need the whole
+                # file: keep downloading into the cache instead of fetching it twice
+                drain=bool(self.audd_key) or self.assets.store is not None,
+            )
+        if not len(pcm):
+            return None, None
+        with span("quality.analysis"):
+            if self.workers.enabled:
+                features, prints = await self.workers.analyze_pcm(pcm, info["sample_rate"])
+            else:
+                from musigent.analysis import analyze_track
+                features, prints = await asyncio.to_thread(analyze_track, pcm, info["sample_rate"])
+        if features is None:
+            return None, prints if info["complete"] else None
+        return {**features, **info}, prints
 
     # -------------------------------------------------------------------------
     # COPYRIGHT CHECK (USING AUDD.IO)
     # -------------------------------------------------------------------------
-    def _copyright_safety_check(self, audio_url):
+    def _copyright_safety_check(self, audio_url, prints=None, complete=True):
+        return run_sync(self._acopyright_safety_check(audio_url, prints, complete))
+
+    async def _acopyright_safety_check(self, audio_url, prints=None, complete=True):
         """
         Step 1 — Heuristic baseline
-        Step 2 — Audd.io recognition check
+        Step 2 — Local fingerprint index: reuse the verdict of a near-duplicate
+        Step 3 — Audd.io recognition check (fallback), result added to the index
+        when `prints` cover the whole track (`complete`)
         """
         score = 70  # neutral baseline
         reasons = ["Baseline heuristic applied"]
         match_title = None
 
         try:
-            audio_bytes = requests.get(audio_url, timeout=10).content
+            # only fetched when it will be uploaded
+            with span("quality.download"):
+                asset = (await self.assets.aget(audio_url)) if self.audd_key else None
+            audio_bytes = asset.data if asset else b""
 
-            if self.audd_key and audio_bytes:
-                resp = requests.post(
+            known = await self._alookup_fingerprint(prints, asset)
+            if known:
+                verdict = known["verdict"]
+                score = verdict["copyright_safety_score"]
+                match_title = verdict["matched_track"]
+                reasons.append(
+                    f"Near-duplicate of a checked track ({known['similarity']:.0%} of "
+                    f"fingerprint aligned): {verdict['reason']}"
+                )
+
+            elif self.audd_key and audio_bytes:
+                # recognition has no side effects, so it is safe to retry
+                resp = await http.request(
+                    "POST",
                     "https://api.audd.io/",
+                    idempotent=True,
                     data={
                         "api_token": self.audd_key,
                         "method": "recognize",
@@ -155,6 +244,14 @@ class QualityAgent:
                     reasons.append(f"Matched copyrighted track: {match_title}")
                 else:
                     reasons.append("No match found in Audd.io database.")
+
+                # prints of a prefix must not stand in for the whole track in later lookups
+                if data.get("status") == "success" and prints is not None and complete and self.fingerprints:
+                    await asyncio.to_thread(self.fingerprints.add, asset.sha256, audio_url, prints, {
+                        "copyright_safety_score": score,
+                        "matched_track": match_title,
+                        "reason": reasons[-1],
+                    })
             else:
                 reasons.append("Audd.io API key missing or audio empty; skipping recognition.")
 
@@ -175,3 +272,16 @@ class QualityAgent:
             "matched_track": match_title,
             "reasons": reasons,
         }
+
+    async def _alookup_fingerprint(self, prints, asset=None):
+        if self.fingerprints is None or (prints is None and asset is None):
+            return None
+        empty = ([], [])
+        with span("quality.prescreen"):
+            known = await asyncio.to_thread(
+                self.fingerprints.lookup,
+                prints if prints is not None else empty,
+                asset.sha256 if asset else None,
+            )
+        metrics.inc("musigent_copyright_prescreen_total", result="hit" if known else "miss")
+        return known
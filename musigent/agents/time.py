@@ -1,20 +1,85 @@
 # musigent/agents/time.py
 # Time tool: deterministic function that returns real UTC time + timezone.
-import requests
-from datetime import datetime
+# UTC comes from the local clock; the Google geolocation lookup runs in the
+# background at most once per client per TTL and never on the request path.
 import os
+import threading
+import time
+from datetime import datetime
 
-def get_utc_time():
-    try:
-        key = os.environ["GOOGLE_API_KEY"]
-        url = f"https://www.googleapis.com/geolocation/v1/geolocate?key={key}"
-        resp = requests.post(url, timeout=5)
-        
+from musigent import http
+from musigent.utils.aio import spawn
+
+
+class TimeService:
+    def __init__(self, ttl_seconds: int = 6 * 3600):
+        self.ttl_seconds = ttl_seconds
+        # client_id -> {"ok": bool, "location": dict | None, "expires": float}
+        self._cache = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()  # utc_time() runs on the loop and in to_thread workers
+
+    def utc_time(self, client_id: str = "server") -> dict:
+        """
+        Same result as the old blocking lookup: "success" when GOOGLE_API_KEY
+        is set and the geolocation POST got an answer (whatever its status),
+        "error" without a key or when the POST failed. The status reports the
+        last completed lookup; until the first one finishes it assumes the
+        API is reachable.
+        """
         utc = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
+        key = os.getenv("GOOGLE_API_KEY")
+        if not key:
+            return {"status": "error", "utc_time": utc}
+
+        entry = self._cache.get(client_id)
+        if entry is None or entry["expires"] <= time.monotonic():
+            self._schedule_refresh(client_id, key)
+        if entry is not None and not entry["ok"]:
+            return {"status": "error", "utc_time": utc}
         return {
             "status": "success",
             "utc_time": utc,
             "source": "google geolocation"
         }
-    except:
-        return {"status": "error", "utc_time": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")}
+
+    def location(self, client_id: str = "server"):
+        """Last resolved geolocation for this client, or None."""
+        entry = self._cache.get(client_id)
+        return entry["location"] if entry else None
+
+    def _schedule_refresh(self, client_id: str, key: str) -> None:
+        with self._lock:
+            if client_id in self._refreshing:
+                return
+            self._refreshing.add(client_id)
+        try:
+            spawn(self._refresh(client_id, key))
+        except BaseException:
+            with self._lock:
+                self._refreshing.discard(client_id)
+            raise
+
+    async def _refresh(self, client_id: str, key: str) -> None:
+        url = f"https://www.googleapis.com/geolocation/v1/geolocate?key={key}"
+        try:
+            try:
+                resp = await http.request("POST", url, retries=0, timeout=5)
+                # any answer counts as reachable; only a 2xx carries a location
+                entry = {"ok": True, "location": resp.json() if resp.is_success else None}
+            except Exception:
+                entry = {"ok": False, "location": None}
+            entry["expires"] = time.monotonic() + self.ttl_seconds
+            with self._lock:
+                self._cache[client_id] = entry
+        finally:
+            # also when cancelled (loop shutdown): the next call retries
+            with self._lock:
+                self._refreshing.discard(client_id)
+
+
+time_service = TimeService()
+
+
+def get_utc_time(client_id: str = "server"):
+    return time_service.utc_time(client_id)
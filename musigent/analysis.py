@@ -0,0 +1,170 @@
+# musigent/analysis.py
+# Vectorized audio feature extraction for the QualityAgent.
+import io
+
+import numpy as np
+
+FRAME_SIZE = 2048        # samples per analysis frame (per channel)
+BLOCK_FRAMES = 512       # frames converted to float at a time
+N_BANDS = 32             # log-spaced spectral bands per frame
+MAX_SIM_FRAMES = 256     # frames kept for the self-similarity matrix
+MIN_LAG = 4              # ignore near-diagonal similarity (adjacent frames)
+
+
+def decode_audio(data):
+    """
+    Decode an encoded file (bytes / memoryview) with pydub + ffmpeg.
+    Returns (pcm, frame_rate, sample_width) with pcm shaped (frames, channels).
+    """
+    from pydub import AudioSegment
+
+    audio = AudioSegment.from_file(io.BytesIO(data))
+    dtype = {1: np.int8, 2: np.int16, 4: np.int32}[audio.sample_width]
+    pcm = np.frombuffer(audio.raw_data, dtype=dtype).reshape(-1, audio.channels)
+    return pcm, audio.frame_rate, audio.sample_width
+
+
+def _band_edges(frame_size: int, n_bands: int) -> np.ndarray:
+    n_bins = frame_size // 2 + 1
+    edges = np.unique(np.geomspace(1, n_bins, n_bands + 1).astype(int)) - 1
+    return edges[:-1]
+
+
+def analyze_pcm(pcm, frame_size: int = FRAME_SIZE, block_frames: int = BLOCK_FRAMES) -> dict | None:
+    """
+    Per-frame features of a (frames, channels) PCM array, in one pass.
+
+    Channels are averaged to mono before framing. Samples are converted to
+    float one block at a time, so extra memory is one float per frame plus
+    a fixed number of spectra, however long the track is.
+
+    Returns None when the track is too short or silent, otherwise:
+    - originality_score: std(RMS) / max(RMS), capped at 1.0
+    - spectral_flux: mean positive change of the band spectrum between frames
+    - repetition: mean best off-diagonal cosine similarity between frames
+    - frames: number of analysis frames
+    """
+    pcm = np.asarray(pcm)
+    if pcm.ndim == 1:
+        pcm = pcm.reshape(-1, 1)
+    mix = np.full(pcm.shape[1], 1.0 / pcm.shape[1], dtype=np.float32)
+
+    window = np.hanning(frame_size).astype(np.float32)
+    edges = _band_edges(frame_size, N_BANDS)
+
+    # spectra are only taken for (frame, next frame) pairs spread evenly over
+    # the track, which bounds FFT work for long tracks
+    stride = max(1, (len(pcm) // frame_size) // MAX_SIM_FRAMES)
+
+    rms_parts = []
+    band_pairs = []
+    step = block_frames * frame_size
+    for start in range(0, len(pcm), step):
+        mono = pcm[start:start + step].astype(np.float32) @ mix
+        n_full = len(mono) // frame_size
+        if n_full:
+            frames = mono[:n_full * frame_size].reshape(n_full, frame_size)
+            rms_parts.append(np.sqrt(np.einsum("ij,ij->i", frames, frames) / frame_size))
+
+            first = start // frame_size
+            anchors = np.arange((-first) % stride, n_full - 1, stride)
+            if len(anchors):
+                pairs = frames[np.stack([anchors, anchors + 1], axis=1).reshape(-1)]
+                spectrum = np.abs(np.fft.rfft(pairs * window, axis=1))
+                band_pairs.append(np.add.reduceat(spectrum, edges, axis=1).reshape(-1, 2, len(edges)))
+        tail = mono[n_full * frame_size:]
+        if len(tail):
+            # trailing partial frame counts towards RMS only
+            rms_parts.append(np.sqrt(np.mean(tail ** 2, keepdims=True)))
+
+    if not rms_parts:
+        return None
+    rms = np.concatenate(rms_parts)
+    if len(rms) < 2 or rms.max() == 0:
+        return None
+
+    originality = min(1.0, float(np.std(rms) / rms.max()))
+
+    flux = 0.0
+    repetition = 0.0
+    if band_pairs:
+        bands = np.log1p(np.concatenate(band_pairs))
+        diff = np.maximum(bands[:, 1] - bands[:, 0], 0.0).sum(axis=1)
+        flux = float(np.mean(diff / (bands[:, 1].sum(axis=1) + 1e-9)))
+        repetition = _repetition(bands[:, 0])
+
+    return {
+        "originality_score": round(originality, 3),
+        "spectral_flux": round(flux, 3),
+        "repetition": round(repetition, 3),
+        "frames": int(len(rms)),
+    }
+
+
+def analyze_track(pcm, frame_rate: int):
+    """analyze_pcm() features plus the fingerprint, from one decoded buffer."""
+    from musigent.fingerprint import fingerprint
+
+    return analyze_pcm(pcm), fingerprint(pcm, frame_rate)
+
+
+def _repetition(bands: np.ndarray) -> float:
+    if len(bands) > MAX_SIM_FRAMES:
+        idx = np.linspace(0, len(bands) - 1, MAX_SIM_FRAMES).astype(int)
+        bands = bands[idx]
+    n = len(bands)
+    if n <= MIN_LAG:
+        return 0.0
+    # centre each band so similarity reflects shape, not overall loudness
+    bands = bands - bands.mean(axis=0)
+    norms = np.linalg.norm(bands, axis=1, keepdims=True)
+    unit = bands / np.maximum(norms, 1e-9)
+    sim = unit @ unit.T
+    lag = np.abs(np.subtract.outer(np.arange(n), np.arange(n)))
+    sim[lag < MIN_LAG] = -1.0
+    return float(np.clip(sim.max(axis=1), 0.0, 1.0).mean())
+
+
+class RunningRMS:
+    """
+    Online (Welford / Chan) mean and variance of frame RMS values, so the
+    originality score can be tracked while a track is still being decoded.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.max = 0.0
+
+    def update(self, rms: np.ndarray) -> None:
+        """Merge a batch of per-frame RMS values."""
+        n_b = len(rms)
+        if not n_b:
+            return
+        mean_b = float(rms.mean())
+        m2_b = float(((rms - mean_b) ** 2).sum())
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * self.n * n_b / n
+        self.n = n
+        self.max = max(self.max, float(rms.max()))
+
+    @property
+    def score(self) -> float | None:
+        """std(RMS) / max(RMS) capped at 1.0, as in analyze_pcm()."""
+        if self.n < 2 or self.max == 0:
+            return None
+        return min(1.0, (self.m2 / self.n) ** 0.5 / self.max)
+
+    def decided(self, threshold: float, margin: float) -> bool:
+        """
+        True once the score is at least `margin` away from `threshold` and
+        further than two standard errors of the std estimate.
+        """
+        score = self.score
+        if score is None:
+            return False
+        stderr = score / (2 * (self.n - 1)) ** 0.5
+        return abs(score - threshold) >= max(margin, 2 * stderr)
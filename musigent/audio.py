@@ -0,0 +1,164 @@
+# musigent/audio.py
+# Audio asset layer: download each URL once and share the bytes between checks.
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from musigent import http
+from musigent.utils.aio import run_sync
+
+
+class AudioTooLarge(ValueError):
+    """A download went over AudioCache.max_track_bytes."""
+
+
+class AudioAsset:
+    """
+    Raw bytes of one track. `data` is handed out as-is (and `view()` wraps
+    it without copying), so every consumer sees the same memory. Decoding
+    happens where the analysis runs (a worker process, or a thread).
+    """
+
+    def __init__(self, url: str, data: bytes):
+        self.url = url
+        self.data = data
+        self.sha256 = hashlib.sha256(data).hexdigest()
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    def view(self) -> memoryview:
+        return memoryview(self.data)
+
+
+class AudioCache:
+    """
+    Bounded LRU of AudioAssets keyed by URL.
+    Assets with identical content (same sha256) are stored once.
+    With an AudioStore, URLs that were stored locally are read from disk
+    instead of upstream.
+
+    Bodies are streamed, and a track over `max_track_bytes`
+    (MUSIGENT_MAX_TRACK_BYTES, default 64 MB) is abandoned with AudioTooLarge
+    as soon as it is known to be too big.
+    """
+
+    def __init__(self, max_entries: int = 16, max_bytes: int = 256 * 1024 * 1024,
+                 timeout: int = 10, store=None, max_track_bytes: int | None = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.store = store
+        self.max_track_bytes = max_track_bytes or int(
+            os.getenv("MUSIGENT_MAX_TRACK_BYTES", str(64 * 1024 * 1024))
+        )
+        self._by_url = OrderedDict()
+        self._by_hash = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> AudioAsset:
+        return run_sync(self.aget(url))
+
+    async def aget(self, url: str) -> AudioAsset:
+        with self._lock:
+            asset = self._by_url.get(url)
+            if asset is not None:
+                self._by_url.move_to_end(url)
+                return asset
+
+        # concurrent callers for the same URL share one download
+        key = (asyncio.get_running_loop(), url)
+        task = self._pending.get(key)
+        if task is None:
+            task = self._pending[key] = asyncio.ensure_future(self._fetch(url))
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(task)
+
+    def cached(self, url: str) -> bool:
+        with self._lock:
+            return url in self._by_url
+
+    async def astream(self, url: str, chunk_size: int = 64 * 1024):
+        """
+        Yield the body of `url` in chunks as it arrives. A body that is read to
+        the end is cached exactly like aget(); a cached (or in-flight) asset is
+        served from memory.
+        """
+        with self._lock:
+            asset = self._by_url.get(url)
+        if asset is None:
+            task = self._pending.get((asyncio.get_running_loop(), url))
+            if task is not None:
+                asset = await asyncio.shield(task)
+        if asset is None and self.store is not None:
+            if await asyncio.to_thread(self.store.by_url, url):
+                asset = await self.aget(url)
+        if asset is not None:
+            view = asset.view()
+            for start in range(0, len(view), chunk_size):
+                yield view[start:start + chunk_size]
+            return
+
+        parts = []
+        async with http.stream("GET", url, timeout=self.timeout) as resp:
+            async for chunk in self._body(url, resp, chunk_size):
+                parts.append(chunk)
+                yield chunk
+        self._store(url, b"".join(parts))
+
+    async def _body(self, url: str, resp, chunk_size: int):
+        """Chunks of a streamed response, enforcing max_track_bytes."""
+        resp.raise_for_status()
+        limit = self.max_track_bytes
+        if int(resp.headers.get("content-length") or 0) > limit:
+            raise AudioTooLarge(f"{url} is larger than {limit} bytes")
+        received = 0
+        async for chunk in resp.aiter_bytes(chunk_size):
+            received += len(chunk)
+            if received > limit:
+                raise AudioTooLarge(f"{url} is larger than {limit} bytes")
+            yield chunk
+
+    async def _fetch(self, url: str) -> AudioAsset:
+        return self._store(url, await self._download(url))
+
+    def _store(self, url: str, data: bytes) -> AudioAsset:
+        asset = AudioAsset(url, data)
+
+        with self._lock:
+            # reuse an already-cached asset with the same content
+            asset = self._by_hash.get(asset.sha256, asset)
+            self._by_url[url] = asset
+            self._by_url.move_to_end(url)
+            self._by_hash[asset.sha256] = asset
+            self._evict()
+        return asset
+
+    async def _download(self, url: str) -> bytes:
+        if self.store is not None:
+            track = await asyncio.to_thread(self.store.by_url, url)
+            if track is not None:
+                try:
+                    return await asyncio.to_thread(self.store.read, track)
+                except FileNotFoundError:
+                    pass  # metadata without a file: fetch again
+        parts = []
+        async with http.stream("GET", url, timeout=self.timeout) as resp:
+            async for chunk in self._body(url, resp, 256 * 1024):
+                parts.append(chunk)
+        return b"".join(parts)
+
+    def _total_bytes(self) -> int:
+        return sum(a.size for a in self._by_hash.values())
+
+    def _evict(self) -> None:
+        while self._by_url and (
+            len(self._by_url) > self.max_entries or self._total_bytes() > self.max_bytes
+        ):
+            _, old = self._by_url.popitem(last=False)
+            if old not in self._by_url.values():
+                self._by_hash.pop(old.sha256, None)
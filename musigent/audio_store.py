@@ -0,0 +1,178 @@
+# musigent/audio_store.py
+# Content-addressed local copies of generated tracks, with their metadata in
+# the shared SQLite file, served by the API's /audio/{sha256} route.
+import hashlib
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from musigent.storage import connect, immediate, utc_now_iso
+
+# (magic bytes at offset, offset, content type, file extension)
+_SIGNATURES = (
+    (b"RIFF", 0, "audio/wav", ".wav"),
+    (b"ID3", 0, "audio/mpeg", ".mp3"),
+    (b"fLaC", 0, "audio/flac", ".flac"),
+    (b"OggS", 0, "audio/ogg", ".ogg"),
+    (b"ftyp", 4, "audio/mp4", ".m4a"),
+)
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def sniff(data: bytes) -> tuple:
+    """(content type, extension) of an audio file from its leading bytes."""
+    for magic, offset, content_type, ext in _SIGNATURES:
+        if data[offset:offset + len(magic)] == magic:
+            return content_type, ext
+    if len(data) > 1 and data[0] == 0xFF and data[1] & 0xE0 == 0xE0:
+        return "audio/mpeg", ".mp3"  # bare MPEG frame sync, no ID3 tag
+    return "application/octet-stream", ".bin"
+
+
+def parse_range(header: str | None, size: int):
+    """
+    (start, end) inclusive of a single "bytes=..." Range header, or None to
+    serve the whole file (no header, or a form we do not support, such as
+    several ranges). ValueError if the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        # suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(f"range {header!r} outside 0-{size - 1}")
+    return start, end
+
+
+class AudioStore:
+    """
+    Each track stored once under its sha256 (<directory>/ab/<sha256>.<ext>),
+    with a `tracks` row (size, content type, first source URL) and a
+    `track_urls` row per upstream URL it was fetched from.
+
+    Files are written atomically and never change, so they can be served
+    with immutable cache headers. Reads go through read-only memory maps,
+    kept in a small LRU so hot tracks are not reopened per request.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tracks (
+        sha256 TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        content_type TEXT NOT NULL,
+        ext TEXT NOT NULL,
+        source_url TEXT,
+        created_at TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS track_urls (
+        url TEXT PRIMARY KEY,
+        sha256 TEXT NOT NULL
+    );
+    """
+
+    def __init__(self, db_path: str, directory: str, max_open: int = 64):
+        self.db_path = db_path
+        self.directory = directory
+        self.max_open = max_open
+        self._maps = OrderedDict()  # sha256 -> mmap
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.conn.executescript(self.SCHEMA)
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.db_path)
+        return conn
+
+    def path(self, track: dict) -> str:
+        sha = track["sha256"]
+        return os.path.join(self.directory, sha[:2], sha + track["ext"])
+
+    def put(self, data: bytes, source_url: str | None = None) -> dict:
+        """Store `data` (if not stored yet) and return its track metadata."""
+        if not data:
+            raise ValueError("refusing to store an empty track")
+        sha = hashlib.sha256(data).hexdigest()
+        track = self.get(sha)
+        if track is None:
+            content_type, ext = sniff(data)
+            track = {"sha256": sha, "size": len(data), "content_type": content_type,
+                     "ext": ext, "source_url": source_url, "created_at": utc_now_iso()}
+            path = self.path(track)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, path)
+        with immediate(self.conn) as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO tracks (sha256, size, content_type, ext, source_url, created_at) "
+                "VALUES (:sha256, :size, :content_type, :ext, :source_url, :created_at)",
+                track,
+            )
+            if source_url:
+                conn.execute(
+                    "INSERT OR REPLACE INTO track_urls (url, sha256) VALUES (?, ?)", (source_url, sha)
+                )
+        return self.get(sha)
+
+    def get(self, sha256: str) -> dict | None:
+        if not _SHA256.match(sha256 or ""):
+            return None
+        row = self.conn.execute(
+            "SELECT sha256, size, content_type, ext, source_url, created_at FROM tracks WHERE sha256 = ?",
+            (sha256,),
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ("sha256", "size", "content_type", "ext", "source_url", "created_at")
+        return dict(zip(keys, row))
+
+    def by_url(self, url: str) -> dict | None:
+        """Metadata of the stored copy of an upstream URL, if any."""
+        row = self.conn.execute("SELECT sha256 FROM track_urls WHERE url = ?", (url,)).fetchone()
+        return self.get(row[0]) if row else None
+
+    def open(self, sha256: str):
+        """(read-only mmap, metadata) of a stored track, or None."""
+        with self._lock:
+            mapped = self._maps.get(sha256)
+            if mapped is not None:
+                self._maps.move_to_end(sha256)
+                return mapped
+        track = self.get(sha256)
+        if track is None:
+            return None
+        try:
+            with open(self.path(track), "rb") as f:
+                view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._maps[sha256] = (view, track)
+            while len(self._maps) > self.max_open:
+                # not closed explicitly: responses may still be reading it
+                self._maps.popitem(last=False)
+        return view, track
+
+    def read(self, track: dict) -> bytes:
+        with open(self.path(track), "rb") as f:
+            return f.read()
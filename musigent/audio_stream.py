@@ -0,0 +1,125 @@
+# musigent/audio_stream.py
+# Incremental decode of an audio stream through ffmpeg, stopping as soon as
+# the originality decision is clear.
+import asyncio
+import contextlib
+import os
+
+import numpy as np
+
+from musigent.analysis import FRAME_SIZE, RunningRMS
+
+FFMPEG = os.getenv("MUSIGENT_FFMPEG", "ffmpeg")
+SAMPLE_RATE = 22050      # streams are decoded to mono at this rate
+CHECK_FRAMES = 16        # frames read between early-exit checks (~1.5s)
+
+
+async def decode_until_decided(
+    chunks,
+    threshold: float,
+    margin: float = 0.05,
+    min_seconds: float = 5.0,
+    max_seconds: float | None = None,
+    drain: bool = False,
+    sample_rate: int = SAMPLE_RATE,
+    frame_size: int = FRAME_SIZE,
+):
+    """
+    Pipe an async iterator of encoded chunks into ffmpeg and read mono PCM
+    back, updating RunningRMS frame by frame. Decoding stops once at least
+    `min_seconds` are in and the score is clear of `threshold` (see
+    RunningRMS.decided), or after `max_seconds`.
+
+    With `drain=True` the remaining chunks are still consumed after an early
+    exit (without decoding) so the caller's download completes, e.g. to
+    populate a cache; otherwise the transfer is abandoned.
+
+    Returns (pcm, info): the decoded int16 prefix shaped (frames, 1) and
+    {"analyzed_seconds", "complete", "early_exit", "sample_rate"}.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        FFMPEG, "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    decoding = True
+
+    async def feed():
+        nonlocal decoding
+        try:
+            async with contextlib.aclosing(chunks) as body:
+                async for chunk in body:
+                    if not decoding:
+                        continue  # draining
+                    try:
+                        proc.stdin.write(chunk)
+                        await proc.stdin.drain()
+                    except (BrokenPipeError, ConnectionResetError):
+                        decoding = False
+                        if not drain:
+                            return
+        finally:
+            if not proc.stdin.is_closing():
+                proc.stdin.close()
+
+    feeder = asyncio.create_task(feed())
+    stats = RunningRMS()
+    parts = []
+    pending = b""
+    block = CHECK_FRAMES * frame_size * 2
+    early_exit = False
+    try:
+        while True:
+            data = await proc.stdout.read(block)
+            if not data:
+                break
+            pending += data
+            n_full = len(pending) // (frame_size * 2)
+            if not n_full:
+                continue
+            samples = np.frombuffer(pending[:n_full * frame_size * 2], dtype=np.int16)
+            pending = pending[n_full * frame_size * 2:]
+            parts.append(samples)
+
+            frames = samples.astype(np.float32).reshape(n_full, frame_size)
+            stats.update(np.sqrt(np.einsum("ij,ij->i", frames, frames) / frame_size))
+
+            seconds = stats.n * frame_size / sample_rate
+            if max_seconds is not None and seconds >= max_seconds:
+                early_exit = True
+                break
+            if seconds >= min_seconds and stats.decided(threshold, margin):
+                early_exit = True
+                break
+        if not early_exit and pending:
+            parts.append(np.frombuffer(pending[:len(pending) // 2 * 2], dtype=np.int16))
+    except BaseException:
+        feeder.cancel()
+        raise
+    finally:
+        decoding = False
+        if proc.returncode is None:
+            with contextlib.suppress(ProcessLookupError):
+                proc.kill()
+        await proc.wait()
+
+    if not early_exit:
+        await feeder  # surfaces download errors
+    elif drain:
+        with contextlib.suppress(Exception):
+            await feeder  # the decision stands even if the rest of the download fails
+    else:
+        feeder.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await feeder
+
+    pcm = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int16)
+    info = {
+        "analyzed_seconds": round(len(pcm) / sample_rate, 2),
+        "complete": not early_exit,
+        "early_exit": early_exit,
+        "sample_rate": sample_rate,
+    }
+    return pcm.reshape(-1, 1), info
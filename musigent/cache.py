@@ -0,0 +1,116 @@
+# musigent/cache.py
+# Content-addressed cache of generations (draft + evaluation) keyed by plan.
+import asyncio
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# resolves an in-flight future when its owner was cancelled: waiters start over
+_RETRY = object()
+
+# plan fields that determine what Suno is asked to generate
+PLAN_KEY_FIELDS = ("mode", "prompt", "style", "tempo_range", "duration_sec")
+
+
+def plan_key(plan: dict) -> str:
+    """Canonical sha256 of the generation-relevant part of a plan."""
+    canonical = json.dumps(
+        {k: plan.get(k) for k in PLAN_KEY_FIELDS},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(value: dict) -> bool:
+    """
+    Only approved tracks are reused; Suno errors, failed downloads and
+    rejected drafts are generated again on the next request.
+    """
+    draft = value.get("draft") or {}
+    evaluation = value.get("evaluation") or {}
+    url = draft.get("audio_url") or ""
+    return url.startswith("http") and evaluation.get("approved") is True
+
+
+class GenerationCache:
+    """
+    TTL + size-bounded LRU of {"draft", "evaluation"} per plan key.
+
+    `get_or_create` also coalesces concurrent misses: callers asking for a key
+    that is already being generated await the same upstream call.
+    """
+
+    def __init__(self, ttl_seconds: float = 24 * 3600, max_entries: int = 512):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # (loop, key) -> Future
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def put(self, key: str, value: dict) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get_or_create(self, key: str, factory):
+        """
+        Return (value, status) where status is "hit", "miss" or "coalesced".
+        `factory` is an async callable producing {"draft", "evaluation"}.
+
+        If the caller running the factory is cancelled (e.g. a streaming
+        client went away), the callers waiting on it are not: one of them
+        runs the factory instead.
+        """
+        while True:
+            value = self.get(key)
+            if value is not None:
+                return value, "hit"
+
+            loop = asyncio.get_running_loop()
+            with self._lock:
+                future = self._inflight.get((loop, key))
+                owner = future is None
+                if owner:
+                    future = self._inflight[(loop, key)] = loop.create_future()
+            if owner:
+                break
+            value = await asyncio.shield(future)
+            if value is not _RETRY:
+                return copy.deepcopy(value), "coalesced"
+
+        try:
+            value = await factory()
+        except asyncio.CancelledError:
+            future.set_result(_RETRY)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        else:
+            future.set_result(value)
+            if is_cacheable(value):
+                self.put(key, value)
+            return value, "miss"
+        finally:
+            with self._lock:
+                self._inflight.pop((loop, key), None)
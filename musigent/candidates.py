@@ -0,0 +1,98 @@
+# musigent/candidates.py
+# Speculative generation: several candidates per plan, the first approved wins.
+import asyncio
+import time
+
+from musigent.metrics import metrics
+
+
+def _rank(generated: dict):
+    # fallback order when nothing is approved: safest copyright, then most original
+    evaluation = generated["evaluation"]
+    safety = (evaluation.get("copyright_safety") or {}).get("copyright_safety_score") or 0
+    return safety, evaluation.get("originality_score") or 0
+
+
+async def first_approved(generate, candidates: int, max_credits: int | None = None,
+                         time_budget: float | None = None) -> dict:
+    """
+    Keep up to `candidates` calls of `generate()` (an async callable returning
+    {"draft", "evaluation"}) in flight and return the first generation whose
+    evaluation is approved, cancelling the others (their Suno waits and
+    downloads stop; submitted Suno tasks still finish upstream).
+
+    Each call spends one credit: a rejected candidate is replaced while
+    credits remain (`max_credits`, default `candidates`). Once credits or
+    `time_budget` seconds run out, the best rejected candidate is returned;
+    TimeoutError if none finished in time.
+
+    The returned evaluation gets a "candidates" summary: launched, evaluated,
+    cancelled, selected (launch index) and stopped ("approved", "credits"
+    or "time").
+    """
+    limit = max(1, max_credits if max_credits is not None else candidates)
+    width = max(1, min(candidates, limit))
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    running = {}  # task -> launch index
+    finished = []  # (launch index, generation)
+    errors = []
+    launched = 0
+    winner = None
+    stopped = "credits"
+
+    def launch():
+        nonlocal launched
+        running[asyncio.create_task(generate())] = launched
+        launched += 1
+
+    for _ in range(width):
+        launch()
+    try:
+        while running:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                stopped = "time"
+                break
+            for task in done:
+                index = running.pop(task)
+                try:
+                    generated = task.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                finished.append((index, generated))
+                approved = generated["evaluation"].get("approved") is True
+                metrics.inc("musigent_candidates_total", result="approved" if approved else "rejected")
+                if approved and winner is None:
+                    winner = (index, generated)
+            if winner is not None:
+                stopped = "approved"
+                break
+            while len(running) < width and launched < limit:
+                launch()
+    finally:
+        cancelled = len(running)
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.wait(running)
+        if cancelled:
+            metrics.inc("musigent_candidates_total", cancelled, result="cancelled")
+
+    if winner is None:
+        if not finished:
+            if errors and stopped != "time":
+                raise errors[0]
+            raise TimeoutError(f"no candidate finished within {time_budget}s")
+        winner = max(finished, key=lambda item: _rank(item[1]))
+
+    index, generated = winner
+    generated["evaluation"]["candidates"] = {
+        "launched": launched,
+        "evaluated": len(finished),
+        "cancelled": cancelled,
+        "selected": index,
+        "stopped": stopped,
+    }
+    return generated
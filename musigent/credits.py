@@ -0,0 +1,104 @@
+# musigent/credits.py
+# Remaining Suno credit balance, shared by every worker through SQLite.
+import os
+import threading
+import time
+
+from musigent.metrics import metrics
+from musigent.storage import connect, immediate
+
+
+class CreditBudget:
+    """
+    Local ledger of Suno credits so generations are refused here, before
+    Suno answers "insufficient credits".
+
+    Each generation costs `cost` credits (MUSIGENT_SUNO_GENERATION_COST,
+    default 12). The balance starts at MUSIGENT_SUNO_CREDITS if set and is
+    re-synced from Suno's credit endpoint every `refresh_seconds`
+    (MUSIGENT_SUNO_CREDITS_REFRESH, default 300). While the balance is
+    unknown, spending is only counted.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS suno_credits (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        remaining REAL,
+        spent REAL NOT NULL,
+        synced_at REAL
+    );
+    """
+
+    def __init__(self, db_path: str, cost: float | None = None, initial: float | None = None,
+                 refresh_seconds: float | None = None):
+        self.db_path = db_path
+        self.cost = cost if cost is not None else float(os.getenv("MUSIGENT_SUNO_GENERATION_COST", "12"))
+        self.refresh_seconds = (
+            refresh_seconds if refresh_seconds is not None
+            else float(os.getenv("MUSIGENT_SUNO_CREDITS_REFRESH", "300"))
+        )
+        if initial is None and os.getenv("MUSIGENT_SUNO_CREDITS"):
+            initial = float(os.getenv("MUSIGENT_SUNO_CREDITS"))
+        self._local = threading.local()
+        self.conn.executescript(self.SCHEMA)
+        self.conn.execute(
+            "INSERT OR IGNORE INTO suno_credits (id, remaining, spent, synced_at) VALUES (1, ?, 0, NULL)",
+            (initial,),
+        )
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.db_path)
+        return conn
+
+    def _publish(self, remaining) -> None:
+        if remaining is not None:
+            metrics.set("musigent_suno_credits_remaining", remaining)
+
+    def try_spend(self, generations: int = 1) -> bool:
+        """Atomically reserve credits for `generations`; False if the balance is too low."""
+        amount = self.cost * generations
+        with immediate(self.conn) as conn:
+            remaining, = conn.execute("SELECT remaining FROM suno_credits WHERE id = 1").fetchone()
+            if remaining is not None and remaining < amount:
+                return False
+            conn.execute(
+                "UPDATE suno_credits SET remaining = remaining - ?, spent = spent + ? WHERE id = 1",
+                (amount, amount),
+            )
+        self._publish(None if remaining is None else remaining - amount)
+        return True
+
+    def refund(self, generations: int = 1) -> None:
+        """Give back a reservation whose generation was never started."""
+        amount = self.cost * generations
+        self.conn.execute(
+            "UPDATE suno_credits SET remaining = remaining + ?, spent = spent - ? WHERE id = 1",
+            (amount, amount),
+        )
+
+    def sync(self, remaining: float) -> None:
+        """Replace the local balance with the one Suno reports."""
+        self.conn.execute(
+            "UPDATE suno_credits SET remaining = ?, synced_at = ? WHERE id = 1",
+            (remaining, time.time()),
+        )
+        self._publish(remaining)
+
+    def stale(self) -> bool:
+        synced_at, = self.conn.execute("SELECT synced_at FROM suno_credits WHERE id = 1").fetchone()
+        return synced_at is None or time.time() - synced_at >= self.refresh_seconds
+
+    def status(self) -> dict:
+        remaining, spent, synced_at = self.conn.execute(
+            "SELECT remaining, spent, synced_at FROM suno_credits WHERE id = 1"
+        ).fetchone()
+        return {
+            "remaining": remaining,
+            "spent": spent,
+            "synced_at": synced_at,
+            "cost_per_generation": self.cost,
+            "generations_left": None if remaining is None else int(remaining // self.cost),
+        }
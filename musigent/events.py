@@ -0,0 +1,72 @@
+# musigent/events.py
+# Stage events for streaming responses: pipeline code calls emit() as each
+# stage's output appears, and whoever runs the pipeline through stream()
+# receives them right away instead of waiting for the whole result.
+import asyncio
+import contextvars
+import copy
+from contextlib import contextmanager
+
+# plan -> draft -> originality -> copyright; stream() adds "result" last
+STAGES = ("plan", "draft", "originality", "copyright")
+
+_sink = contextvars.ContextVar("musigent_events", default=None)
+
+
+class _Sink:
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.sent = set()
+
+
+def emit(event: str, data) -> None:
+    """
+    Send a stage's output to the active stream, if any. Each event goes out
+    once per stream: later emits of the same stage (e.g. the filled-in
+    evaluation after a cache hit) are dropped.
+    """
+    sink = _sink.get()
+    if sink is None or event in sink.sent:
+        return
+    sink.sent.add(event)
+    # a snapshot: the pipeline keeps adding fields to drafts and evaluations
+    sink.queue.put_nowait((event, copy.deepcopy(data)))
+
+
+@contextmanager
+def muted():
+    """No events from this block (or tasks started in it), e.g. speculative candidates."""
+    token = _sink.set(None)
+    try:
+        yield
+    finally:
+        _sink.reset(token)
+
+
+async def stream(coro):
+    """
+    Run `coro` and yield (event, data) for every stage it emits, then
+    ("result", its return value). Exceptions from `coro` are raised here;
+    closing the iterator early cancels it.
+    """
+    sink = _Sink()
+    token = _sink.set(sink)
+    try:
+        task = asyncio.ensure_future(coro)  # copies the context, sink included
+    finally:
+        _sink.reset(token)
+    try:
+        while True:
+            getter = asyncio.ensure_future(sink.queue.get())
+            await asyncio.wait((getter, task), return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()
+                break
+            yield getter.result()
+        while not sink.queue.empty():
+            yield sink.queue.get_nowait()
+        yield "result", task.result()
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
@@ -0,0 +1,217 @@
+# musigent/fingerprint.py
+# Spectral-peak fingerprints and an on-disk inverted index of tracks whose
+# copyright status has already been checked.
+import json
+import threading
+import time
+
+import numpy as np
+
+from musigent.storage import connect, immediate
+
+WINDOW_SECONDS = 0.064   # FFT window (rounded up to a power of two in samples)
+HOP_SECONDS = 0.032      # time resolution of peak offsets
+MAX_HZ = 5512            # peaks are picked below this frequency...
+N_BANDS = 256            # ...in this many equal-width bands (8 bits)
+PEAK_FRAMES = 8          # a peak is the maximum of +-PEAK_FRAMES frames...
+PEAK_BANDS = 12          # ...and +-PEAK_BANDS bands around it
+FAN_OUT = 6              # later peaks paired with each anchor peak
+MAX_DT = 63              # max frame distance of a pair (6 bits)
+BLOCK_FRAMES = 256       # frames transformed at a time
+FLOOR_STD = 1.0
+
+
+def _max_filter(x: np.ndarray, radius: int, axis: int) -> np.ndarray:
+    """Maximum over [i - radius, i + radius] along `axis`, in O(log width) passes."""
+    width = 2 * radius + 1
+    y = np.moveaxis(x, axis, 0)
+    length = len(y)
+    pad = np.full((radius,) + y.shape[1:], -np.inf, dtype=y.dtype)
+    out = np.concatenate([pad, y, pad])
+    span = 1
+    while span * 2 <= width:
+        # out[i] = max of `span * 2` consecutive inputs starting at i
+        out = np.maximum(out[:-span], out[span:])
+        span *= 2
+    rest = width - span
+    return np.moveaxis(np.maximum(out[:length], out[rest:rest + length]), 0, axis)
+
+
+def fingerprint(pcm, frame_rate: int):
+    """
+    Landmark hashes of a (frames, channels) PCM array.
+
+    Peaks are local maxima of the log band spectrogram, in fixed-Hz bands on
+    a fixed-seconds hop, so tracks decoded at different sample rates produce
+    compatible hashes. Each peak is paired with the next FAN_OUT peaks; a
+    hash packs (anchor band, target band, frame distance) into 22 bits.
+
+    Returns (hashes uint32, offsets int32) of unique (hash, offset) pairs.
+    """
+    pcm = np.asarray(pcm)
+    if pcm.ndim == 1:
+        pcm = pcm.reshape(-1, 1)
+    mono = pcm.astype(np.float32) @ np.full(pcm.shape[1], 1.0 / pcm.shape[1], dtype=np.float32)
+
+    n_fft = 1 << int(np.ceil(np.log2(frame_rate * WINDOW_SECONDS)))
+    empty = np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int32)
+    if len(mono) < n_fft:
+        return empty
+
+    # frame starts on an exact seconds grid, so offsets line up across sample rates
+    n_frames = int((len(mono) - n_fft) / (frame_rate * HOP_SECONDS)) + 1
+    starts = np.round(np.arange(n_frames) * frame_rate * HOP_SECONDS).astype(np.int64)
+    window = np.hanning(n_fft).astype(np.float32)
+    hz_per_bin = frame_rate / n_fft
+    top = min(int(MAX_HZ / hz_per_bin) + 1, n_fft // 2 + 1)
+    # band of every bin below MAX_HZ; bands narrower than a bin stay empty
+    bin_band = np.minimum((np.arange(top) * hz_per_bin / (MAX_HZ / N_BANDS)).astype(int), N_BANDS - 1)
+    edges, first = np.unique(bin_band, return_index=True)
+
+    spec = np.full((n_frames, N_BANDS), -np.inf, dtype=np.float32)
+    for start in range(0, n_frames, BLOCK_FRAMES):
+        frames = mono[starts[start:start + BLOCK_FRAMES, None] + np.arange(n_fft)]
+        spectrum = np.abs(np.fft.rfft(frames * window, axis=1))
+        # log magnitude: a gain change shifts every band equally, peaks stay put
+        spec[start:start + BLOCK_FRAMES, edges] = np.log(
+            np.maximum.reduceat(spectrum[:, :top], first, axis=1) + 1e-3
+        )
+
+    # constellation: points that dominate their time-frequency neighbourhood
+    # and stand above the track's typical level
+    neighbourhood = _max_filter(_max_filter(spec, PEAK_FRAMES, 0), PEAK_BANDS, 1)
+    valid = spec[:, edges]
+    floor = valid.mean() + FLOOR_STD * valid.std() if len(edges) else 0.0
+    t_idx, f_idx = np.nonzero((spec == neighbourhood) & (spec > floor))
+    if len(t_idx) < 2:
+        return empty
+
+    hashes, offsets = [], []
+    for j in range(1, FAN_OUT + 1):
+        dt = t_idx[j:] - t_idx[:-j]
+        ok = (dt > 0) & (dt <= MAX_DT)
+        hashes.append((f_idx[:-j][ok] << 14) | (f_idx[j:][ok] << 6) | dt[ok])
+        offsets.append(t_idx[:-j][ok])
+
+    pairs = np.unique(
+        (np.concatenate(offsets).astype(np.int64) << 32) | np.concatenate(hashes).astype(np.int64)
+    )
+    return (pairs & 0xFFFFFFFF).astype(np.uint32), (pairs >> 32).astype(np.int32)
+
+
+class FingerprintIndex:
+    """
+    Inverted index hash -> (track, offset) of tracks with a known copyright
+    verdict, shared by every worker through SQLite.
+
+    `lookup` aligns a query's hashes with each candidate track by time offset;
+    a track is a near-duplicate when at least `min_similarity` of the query's
+    hashes (and `min_aligned` in absolute terms) agree on one offset.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS fp_tracks (
+        track_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sha256 TEXT UNIQUE NOT NULL,
+        audio_url TEXT,
+        n_hashes INTEGER NOT NULL,
+        verdict TEXT NOT NULL,
+        checked_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS fp_hashes (
+        hash INTEGER NOT NULL,
+        track_id INTEGER NOT NULL,
+        offset INTEGER NOT NULL,
+        PRIMARY KEY (hash, track_id, offset)
+    ) WITHOUT ROWID;
+    """
+
+    def __init__(self, db_path: str, min_similarity: float = 0.25, min_aligned: int = 20):
+        self.db_path = db_path
+        self.min_similarity = min_similarity
+        self.min_aligned = min_aligned
+        self._local = threading.local()
+        self.conn.executescript(self.SCHEMA)
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.db_path)
+        return conn
+
+    def add(self, sha256: str, audio_url: str, prints, verdict: dict) -> None:
+        """Index a checked track with its verdict; re-adding a sha256 updates the verdict."""
+        hashes, offsets = prints
+        with immediate(self.conn) as conn:
+            row = conn.execute(
+                "SELECT track_id FROM fp_tracks WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE fp_tracks SET verdict = ?, checked_at = ? WHERE track_id = ?",
+                    (json.dumps(verdict), time.time(), row[0]),
+                )
+                return
+            track_id = conn.execute(
+                "INSERT INTO fp_tracks (sha256, audio_url, n_hashes, verdict, checked_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (sha256, audio_url, len(hashes), json.dumps(verdict), time.time()),
+            ).lastrowid
+            conn.executemany(
+                "INSERT OR IGNORE INTO fp_hashes (hash, track_id, offset) VALUES (?, ?, ?)",
+                zip(hashes.tolist(), [track_id] * len(hashes), offsets.tolist()),
+            )
+
+    def lookup(self, prints, sha256: str | None = None) -> dict | None:
+        """
+        Best near-duplicate of `prints` as {"sha256", "audio_url", "similarity",
+        "verdict"}, or None.
+        """
+        if sha256 is not None:
+            row = self.conn.execute(
+                "SELECT sha256, audio_url, verdict FROM fp_tracks WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+            if row is not None:
+                return {"sha256": row[0], "audio_url": row[1], "similarity": 1.0,
+                        "verdict": json.loads(row[2])}
+
+        hashes, offsets = prints
+        n_query = len(hashes)
+        if n_query < self.min_aligned:
+            return None
+        rows = self.conn.execute(
+            "SELECT hash, track_id, offset FROM fp_hashes "
+            "WHERE hash IN (SELECT value FROM json_each(?))",
+            (json.dumps(np.unique(hashes).tolist()),),
+        ).fetchall()
+        if not rows:
+            return None
+        found = np.array(rows, dtype=np.int64)
+
+        # join found rows with every query occurrence of the same hash
+        order = np.argsort(hashes, kind="stable")
+        q_hash = hashes[order].astype(np.int64)
+        q_off = offsets[order].astype(np.int64)
+        lo = np.searchsorted(q_hash, found[:, 0], side="left")
+        hi = np.searchsorted(q_hash, found[:, 0], side="right")
+        counts = hi - lo
+        row_idx = np.repeat(np.arange(len(found)), counts)
+        q_idx = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        track = found[row_idx, 1]
+        delta = found[row_idx, 2] - q_off[q_idx]
+
+        # most common (track, delta) pair = best time alignment per track
+        keys, votes = np.unique((track << 32) | (delta + (1 << 31)), return_counts=True)
+        best = int(np.argmax(votes))
+        aligned = int(votes[best])
+        similarity = aligned / n_query
+        if aligned < self.min_aligned or similarity < self.min_similarity:
+            return None
+
+        row = self.conn.execute(
+            "SELECT sha256, audio_url, verdict FROM fp_tracks WHERE track_id = ?",
+            (int(keys[best] >> 32),),
+        ).fetchone()
+        return {"sha256": row[0], "audio_url": row[1], "similarity": round(min(1.0, similarity), 3),
+                "verdict": json.loads(row[2])}
@@ -0,0 +1,265 @@
+# musigent/http.py
+# Shared async HTTP client used by every external tool (Suno, Audd.io, Google):
+# pooled keep-alive connections, retries with jittered backoff, and one
+# circuit breaker per upstream host.
+import asyncio
+import os
+import random
+import time
+import weakref
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpx
+
+from musigent.metrics import metrics, span
+
+DEFAULT_TIMEOUT = httpx.Timeout(
+    float(os.getenv("MUSIGENT_HTTP_TIMEOUT", "30")),
+    connect=float(os.getenv("MUSIGENT_HTTP_CONNECT_TIMEOUT", "10")),
+)
+# httpx keeps a separate pool per origin; these bound each client overall
+DEFAULT_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("MUSIGENT_HTTP_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("MUSIGENT_HTTP_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=30.0,
+)
+
+RETRIES = int(os.getenv("MUSIGENT_HTTP_RETRIES", "2"))
+BACKOFF_BASE = float(os.getenv("MUSIGENT_HTTP_BACKOFF", "0.5"))
+BACKOFF_CAP = 8.0
+RETRY_STATUSES = {500, 502, 503, 504}
+
+# max in-flight requests per upstream host, e.g. "api.sunoapi.org=4,api.audd.io=4"
+UPSTREAM_CONCURRENCY = {
+    host.strip(): int(limit)
+    for host, _, limit in (
+        item.partition("=")
+        for item in os.getenv(
+            "MUSIGENT_UPSTREAM_CONCURRENCY", "api.sunoapi.org=8,api.audd.io=4"
+        ).split(",")
+        if "=" in item
+    )
+}
+
+# errors where the request provably never reached the server
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# one pooled client per event loop (httpx clients are bound to the loop they run on)
+_clients = weakref.WeakKeyDictionary()
+
+# optional transport for every client, e.g. musigent.testing.upstreams for offline runs
+_transport = None
+
+
+def use_transport(transport) -> None:
+    """Route all upstream traffic through `transport` (None: the real network)."""
+    global _transport
+    _transport = transport
+    _clients.clear()  # clients are rebuilt with the new transport on next use
+
+
+def get_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT,
+            limits=DEFAULT_LIMITS,
+            follow_redirects=True,
+            transport=_transport,
+        )
+        _clients[loop] = client
+    return client
+
+
+async def aclose() -> None:
+    """Close the client of the running loop (e.g. on app shutdown)."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+# -------------------------------------------------------------------------
+# CIRCUIT BREAKER
+# -------------------------------------------------------------------------
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls
+    for `reset_timeout` seconds; then lets one trial call through (half-open).
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "half-open":
+            # let exactly one trial through; re-arm the timer for everyone else
+            self.opened_at = time.monotonic()
+            return True
+        return state == "closed"
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+_breakers = {}
+
+
+def breaker_for(url: str) -> CircuitBreaker:
+    host = urlsplit(url).hostname or ""
+    breaker = _breakers.get(host)
+    if breaker is None:
+        breaker = _breakers[host] = CircuitBreaker(
+            failure_threshold=int(os.getenv("MUSIGENT_BREAKER_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("MUSIGENT_BREAKER_RESET", "30")),
+        )
+    return breaker
+
+
+# -------------------------------------------------------------------------
+# PER-UPSTREAM CONCURRENCY
+# -------------------------------------------------------------------------
+_semaphores = weakref.WeakKeyDictionary()  # loop -> {host: Semaphore}
+
+
+def upstream_slot(host: str):
+    """Semaphore limiting in-flight calls to `host` (None if unlimited)."""
+    limit = UPSTREAM_CONCURRENCY.get(host)
+    if not limit:
+        return None
+    per_loop = _semaphores.setdefault(asyncio.get_running_loop(), {})
+    sem = per_loop.get(host)
+    if sem is None:
+        sem = per_loop[host] = asyncio.Semaphore(limit)
+    return sem
+
+
+# -------------------------------------------------------------------------
+# REQUESTS WITH RETRY
+# -------------------------------------------------------------------------
+def _backoff(attempt: int) -> float:
+    # "full jitter": uniform in [0, min(cap, base * 2^attempt)]
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+async def request(method: str, url: str, *, idempotent: bool | None = None,
+                  retries: int | None = None, **kwargs) -> httpx.Response:
+    """
+    Send one request through the shared client.
+
+    Transient failures (connection errors, timeouts, 5xx) are retried with
+    jittered exponential backoff. Non-idempotent calls (POST by default) are
+    only retried when the request never left this process, so e.g. a Suno
+    generation is never submitted twice. The last 5xx response is returned
+    as-is; callers keep doing their own status handling.
+    """
+    if idempotent is None:
+        idempotent = method.upper() in ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+    retries = RETRIES if retries is None else retries
+    breaker = breaker_for(url)
+    host = urlsplit(url).hostname
+    slot = upstream_slot(host)
+
+    for attempt in range(retries + 1):
+        if not breaker.allow():
+            metrics.inc("musigent_upstream_errors_total", host=host, kind="circuit_open")
+            raise CircuitOpenError(f"Upstream {host} is unavailable (circuit open).")
+        last = attempt == retries
+        try:
+            with span(f"upstream:{host}"):
+                if slot is None:
+                    resp = await get_client().request(method, url, **kwargs)
+                else:
+                    async with slot:
+                        resp = await get_client().request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            breaker.record_failure()
+            metrics.inc("musigent_upstream_errors_total", host=host, kind=type(e).__name__)
+            if last or not (idempotent or isinstance(e, _NOT_SENT)):
+                raise
+        else:
+            metrics.inc("musigent_upstream_requests_total", host=host, status=resp.status_code)
+            if resp.status_code not in RETRY_STATUSES:
+                breaker.record_success()
+                return resp
+            breaker.record_failure()
+            metrics.inc("musigent_upstream_errors_total", host=host, kind="http_5xx")
+            if last or not idempotent:
+                return resp
+        await asyncio.sleep(_backoff(attempt))
+
+
+@asynccontextmanager
+async def stream(method: str, url: str, *, idempotent: bool | None = None,
+                 retries: int | None = None, **kwargs):
+    """
+    Streaming variant of request(): yields the response with its body unread.
+
+    Failures before the request was sent are retried, and so are 5xx
+    responses of idempotent requests (their body is dropped unread), with
+    the same backoff and breaker accounting as request(). Once the response
+    has been handed to the caller the stream cannot be replayed.
+    """
+    if idempotent is None:
+        idempotent = method.upper() in ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+    retries = RETRIES if retries is None else retries
+    breaker = breaker_for(url)
+    host = urlsplit(url).hostname
+    slot = upstream_slot(host)
+    opened = False
+
+    for attempt in range(retries + 1):
+        if not breaker.allow():
+            metrics.inc("musigent_upstream_errors_total", host=host, kind="circuit_open")
+            raise CircuitOpenError(f"Upstream {host} is unavailable (circuit open).")
+        last = attempt == retries
+        try:
+            if slot is not None:
+                await slot.acquire()
+            try:
+                async with get_client().stream(method, url, **kwargs) as resp:
+                    metrics.inc("musigent_upstream_requests_total", host=host, status=resp.status_code)
+                    failed = resp.status_code in RETRY_STATUSES
+                    if failed:
+                        breaker.record_failure()
+                        metrics.inc("musigent_upstream_errors_total", host=host, kind="http_5xx")
+                    else:
+                        breaker.record_success()
+                    if not failed or last or not idempotent:
+                        opened = True
+                        yield resp
+                        return
+            finally:
+                if slot is not None:
+                    slot.release()
+        except _NOT_SENT as e:
+            if opened:
+                raise
+            breaker.record_failure()
+            metrics.inc("musigent_upstream_errors_total", host=host, kind=type(e).__name__)
+            if attempt == retries:
+                raise
+        await asyncio.sleep(_backoff(attempt))
@@ -0,0 +1,211 @@
+# musigent/jobs.py
+# Suno generation jobs: submit, track state in the store, finish via callback or polling.
+import asyncio
+import json
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from musigent.storage import connect, immediate
+
+# Suno task states (record-info "status" / callback "callbackType")
+PENDING = "PENDING"
+SUCCESS = "SUCCESS"
+FAILED = "FAILED"
+_FAILED_STATES = {
+    "CREATE_TASK_FAILED",
+    "GENERATE_AUDIO_FAILED",
+    "CALLBACK_EXCEPTION",
+    "SENSITIVE_WORD_ERROR",
+    "error",
+}
+
+
+def callback_token(callback_url: str | None) -> str | None:
+    """The shared secret in a callback URL's `token` query parameter, if any."""
+    values = parse_qs(urlsplit(callback_url or "").query).get("token")
+    return values[0] if values and values[0] else None
+
+
+def _normalize_track(track: dict) -> dict:
+    # record-info uses camelCase, callbacks use snake_case
+    return {
+        "id": track.get("id"),
+        "audio_url": track.get("audioUrl") or track.get("audio_url") or None,
+        "stream_url": (
+            track.get("streamAudioUrl") or track.get("stream_audio_url")
+            or track.get("streamUrl") or None
+        ),
+        "duration": track.get("duration"),
+    }
+
+
+class SunoJobs:
+    """
+    Job table for Suno generation tasks, shared by all workers via SQLite.
+
+    Completions arrive through `handle_callback` (the FastAPI callback route);
+    waiters in this process are woken immediately, and `wait` also polls the
+    store and Suno's record-info endpoint, so a job finishes even when the
+    callback is lost or lands on another worker.
+
+    Only tasks registered with `create` can change state, and rows older
+    than `max_age` seconds (default a day) are pruned as new jobs start.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS suno_jobs (
+        task_id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        tracks TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_suno_jobs_updated ON suno_jobs (updated_at);
+    """
+
+    def __init__(self, db_path: str, poll_interval: float = 10.0, timeout: float = 300.0,
+                 check_interval: float = 1.0, max_age: float = 24 * 3600):
+        self.db_path = db_path
+        self.max_age = max_age
+        self.poll_interval = poll_interval
+        # how often the shared table is re-read (callbacks handled by other workers)
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self._local = threading.local()
+        self._waiters = {}  # task_id -> [(loop, asyncio.Event)]
+        self._lock = threading.Lock()
+        self.conn.executescript(self.SCHEMA)
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.db_path)
+        return conn
+
+    # -------------------------------------------------------------------------
+    # STATE
+    # -------------------------------------------------------------------------
+    def create(self, task_id: str) -> None:
+        now = time.time()
+        with immediate(self.conn) as conn:
+            conn.execute("DELETE FROM suno_jobs WHERE updated_at < ?", (now - self.max_age,))
+            conn.execute(
+                "INSERT OR IGNORE INTO suno_jobs (task_id, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (task_id, PENDING, now, now),
+            )
+
+    def get(self, task_id: str):
+        row = self.conn.execute(
+            "SELECT task_id, status, tracks, error FROM suno_jobs WHERE task_id = ?",
+            (task_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "task_id": row[0],
+            "status": row[1],
+            "tracks": json.loads(row[2]) if row[2] else [],
+            "error": row[3],
+        }
+
+    def update(self, task_id: str, status: str, tracks=None, error=None) -> bool:
+        """
+        Record a state change of a job made by `create`; finished jobs are
+        never changed again. False if the task is unknown.
+        """
+        tracks = [_normalize_track(t) for t in tracks or []]
+        if status not in (SUCCESS, FAILED) and any(t["audio_url"] for t in tracks):
+            status = SUCCESS
+        with immediate(self.conn) as conn:
+            row = conn.execute(
+                "SELECT status FROM suno_jobs WHERE task_id = ?", (task_id,)
+            ).fetchone()
+            if row is None:
+                return False
+            if row[0] in (SUCCESS, FAILED):
+                return True
+            conn.execute(
+                "UPDATE suno_jobs SET status = ?, tracks = ?, error = ?, updated_at = ? "
+                "WHERE task_id = ?",
+                (status, json.dumps(tracks) if tracks else None, error, time.time(), task_id),
+            )
+        if status in (SUCCESS, FAILED):
+            self._notify(task_id)
+        return True
+
+    # -------------------------------------------------------------------------
+    # CALLBACK + WAITING
+    # -------------------------------------------------------------------------
+    def handle_callback(self, payload: dict) -> bool:
+        """
+        Apply a Suno callback body ({"code", "msg", "data": {...}}).
+        Callbacks for tasks this store never submitted are dropped (False).
+        """
+        data = payload.get("data") if isinstance(payload, dict) else None
+        if not isinstance(data, dict):
+            return False
+        task_id = data.get("task_id") or data.get("taskId")
+        if not task_id:
+            return False
+        kind = data.get("callbackType")
+        tracks = data.get("data") if isinstance(data.get("data"), list) else None
+        if payload.get("code", 200) != 200 or kind in _FAILED_STATES:
+            return self.update(task_id, FAILED, error=payload.get("msg"))
+        if kind == "complete":
+            return self.update(task_id, SUCCESS, tracks=tracks)
+        # "text" / "first": partial progress, finished only once a track has audio
+        return self.update(task_id, PENDING, tracks=tracks)
+
+    def _notify(self, task_id: str) -> None:
+        with self._lock:
+            waiters = self._waiters.pop(task_id, [])
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    async def wait(self, task_id: str, poll, timeout: float | None = None) -> dict:
+        """
+        Wait until the job finishes. `poll(task_id)` is the fallback that asks
+        Suno directly and returns (status, tracks, error).
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        next_poll = time.monotonic() + self.poll_interval
+        event = asyncio.Event()
+        with self._lock:
+            self._waiters.setdefault(task_id, []).append((asyncio.get_running_loop(), event))
+
+        try:
+            while True:
+                job = await asyncio.to_thread(self.get, task_id)
+                if job and job["status"] in (SUCCESS, FAILED):
+                    return job
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return {"task_id": task_id, "status": FAILED, "tracks": [],
+                            "error": "timed out waiting for Suno"}
+                try:
+                    await asyncio.wait_for(event.wait(), min(self.check_interval, remaining))
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+                if time.monotonic() < next_poll:
+                    continue
+
+                next_poll = time.monotonic() + self.poll_interval
+                try:
+                    status, tracks, error = await poll(task_id)
+                except Exception:
+                    continue  # transient; try again next tick
+                if status in _FAILED_STATES:
+                    status = FAILED
+                await asyncio.to_thread(self.update, task_id, status, tracks, error)
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(task_id, [])
+                waiters[:] = [w for w in waiters if w[1] is not event]
+                if not waiters:
+                    self._waiters.pop(task_id, None)
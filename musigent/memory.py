@@ -1,83 +1,136 @@
-import json, os
-from datetime import datetime, timedelta 
+import os
+from datetime import datetime, timedelta
+
+from musigent.storage import (
+    Archive,
+    check_fields,
+    decode_cursor,
+    encode_cursor,
+    normalize_timestamp,
+    open_backend,
+    utc_now_iso,
+)
+
+# projection used when a history query names no fields
+HISTORY_FIELDS = (
+    "timestamp_utc",
+    "username",
+    "plan.mode",
+    "plan.prompt",
+    "draft.audio_url",
+    "evaluation.approved",
+    "evaluation.originality_score",
+)
+MAX_HISTORY_LIMIT = 500
+
 
 class MemoryStore:
-    def __init__(self, path="memory_db.json"):
-        self.path = path
-        if not os.path.exists(self.path):
-            with open(self.path, "w", encoding="utf-8") as f:
-                json.dump({"interactions": []}, f)
-        # in-memory per-user daily counter (not persisted)
-        self.user_daily = {}
+    def __init__(self, path="memory_db.json", backend=None):
+        """
+        Interaction store on top of a pluggable backend
+        ("sqlite" by default, or "jsonl"; MUSIGENT_STORE_BACKEND overrides).
 
-    def _today_str(self) -> str:
-        return datetime.utcnow().strftime("%Y-%m-%d")
+        `path` is the legacy JSON log location; the backend file lives next to it
+        and a pre-existing {"interactions": [...]} file is imported once.
+        Interactions expired by musigent.retention are kept in `archive`
+        (MUSIGENT_ARCHIVE_DIR, default memory_db_archive/ next to it).
+        """
+        self.path = path
+        # SQLite file shared by the sqlite backend and cross-worker state
+        self.db_path = os.path.splitext(path)[0] + ".sqlite3"
+        self.archive = Archive(
+            os.getenv("MUSIGENT_ARCHIVE_DIR") or os.path.splitext(path)[0] + "_archive"
+        )
+        self.backend = open_backend(path, backend or os.getenv("MUSIGENT_STORE_BACKEND", "sqlite"))
+        if self.backend.migrate_legacy(self.path):
+            try:
+                os.replace(self.path, self.path + ".migrated")
+            except FileNotFoundError:
+                pass
 
     def get_user_daily_count(self, username: str) -> int:
-        today = self._today_str()
-        info = self.user_daily.get(username)
-        if info and info["day"] == today:
-            return info["count"]
-        return 0
-
-    def _increment_user_daily(self, username: str) -> None:
-        today = self._today_str()
-        info = self.user_daily.get(username)
-        if not info or info["day"] != today:
-            self.user_daily[username] = {"day": today, "count": 1}
-        else:
-            info["count"] += 1
+        """How many interactions this user had since 00:00 UTC today."""
+        today = datetime.utcnow().strftime("%Y-%m-%d")
+        return self.backend.count_since(username, today + "T00:00:00.000000Z")
 
     def save_interaction(self, plan, draft, evaluation, username="guest", time_info=None):
-        """Append one interaction to the JSON log and update per-user daily count."""
-        self._increment_user_daily(username)
-        ts = datetime.utcnow().isoformat() + "Z"
+        """Append one interaction to the store."""
+        self.backend.append(self.make_record(plan, draft, evaluation, username, time_info))
+
+    def save_interactions(self, records: list) -> None:
+        """Append several records (from make_record) in one transaction."""
+        if records:
+            self.backend.append_many(records)
+
+    @staticmethod
+    def make_record(plan, draft, evaluation, username="guest", time_info=None) -> dict:
+        return {
+            "timestamp_utc": utc_now_iso(),
+            "username": username,
+            "plan": plan,
+            "draft": draft,
+            "evaluation": evaluation,
+            "time_info": time_info,
+        }
 
-        with open(self.path, "r+", encoding="utf-8") as f:
-            data = json.load(f)
-            data.setdefault("interactions", []).append({
-                "timestamp_utc": ts,
-                "username": username,
-                "plan": plan,
-                "draft": draft,
-                "evaluation": evaluation,
-                "time_info": time_info,
-            })
-            f.seek(0)
-            json.dump(data, f, indent=2)
-            f.truncate()
-    #This reads our JSON log (where we already save timestamp_utc and username) 
-    #and counts how many events happened in the last 60 seconds for that user.       
     def get_user_recent_count(self, username: str, window_seconds: int = 60) -> int:
         """How many interactions this user had in the last window_seconds (UTC)."""
-        try:
-            with open(self.path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except FileNotFoundError:
-            return 0
+        cutoff = datetime.utcnow() - timedelta(seconds=window_seconds)
+        return self.backend.count_since(
+            username, cutoff.isoformat(timespec="microseconds") + "Z"
+        )
 
-        now = datetime.utcnow()                      # naive UTC
-        cutoff = now - timedelta(seconds=window_seconds)
-        count = 0
+    def recent_activity(self, window_seconds: int = 60, mode: str | None = None) -> list:
+        """(username, timestamp_utc) pairs for every interaction (of `mode`) in the last window."""
+        cutoff = datetime.utcnow() - timedelta(seconds=window_seconds)
+        return self.activity_since(cutoff.isoformat(timespec="microseconds") + "Z", mode)
 
-        for item in data.get("interactions", []):
-            if item.get("username") != username:
-                continue
+    def activity_since(self, since: str, mode: str | None = None) -> list:
+        """(username, timestamp_utc) pairs at or after a canonical UTC timestamp, optionally of one plan mode."""
+        return self.backend.since(since, mode)
 
-            ts = item.get("timestamp_utc") or item.get("timestamp")
-            if not ts:
-                continue
-
-            try:
-                # try to parse a few common formats
-                s = ts.replace("Z", "+00:00").replace(" UTC", "")
-                t = datetime.fromisoformat(s)
-                # force naive UTC for safe comparison
-                t = t.replace(tzinfo=None)
-            except Exception:
-                continue
+    def history(self, username=None, mode=None, approved=None, since=None, until=None,
+                fields=None, limit: int = 50, cursor=None, archived: bool = False) -> dict:
+        """
+        One page of interactions, newest first:
+        {"items": [...], "next_cursor": str | None}.
 
-            if t >= cutoff:
-                count += 1
+        Filters are ANDed; `since` is inclusive and `until` exclusive (any
+        ISO timestamp). `fields` are dotted paths into the stored record
+        (default HISTORY_FIELDS), so pages never load whole plan/draft/
+        evaluation blobs unless asked to. Pass `next_cursor` back as `cursor`
+        for the following page. `archived=True` pages through the archive
+        of expired interactions instead of the live store. Bad arguments
+        raise ValueError.
+        """
+        fields = check_fields(fields or HISTORY_FIELDS)
+        bounds = {}
+        for name, value in (("since", since), ("until", until)):
+            if value is not None:
+                bounds[name] = normalize_timestamp(value)
+                if bounds[name] is None:
+                    raise ValueError(f"Invalid {name} timestamp: {value!r}")
+        limit = max(1, min(int(limit), MAX_HISTORY_LIMIT))
 
-        return count
+        source = self.archive if archived else self.backend
+        rows = source.history(
+            fields,
+            username=username,
+            mode=mode,
+            approved=approved,
+            before=decode_cursor(cursor) if cursor else None,
+            limit=limit + 1,
+            **bounds,
+        )
+        items = []
+        for _, _, values in rows[:limit]:
+            item = {}
+            for field, value in zip(fields, values):
+                *parents, leaf = field.split(".")
+                node = item
+                for key in parents:
+                    node = node.setdefault(key, {})
+                node[leaf] = value
+            items.append(item)
+        next_cursor = encode_cursor(*rows[limit - 1][:2]) if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,155 @@
+# musigent/metrics.py
+# In-process stage tracing and Prometheus-format metrics for the pipeline.
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+HELP = {
+    "musigent_stage_seconds": ("histogram", "Duration of pipeline stages and upstream calls."),
+    "musigent_upstream_requests_total": ("counter", "Upstream HTTP responses by host and status."),
+    "musigent_upstream_errors_total": ("counter", "Upstream failures (transport errors, 5xx, open circuit)."),
+    "musigent_cache_requests_total": ("counter", "Generation cache lookups by result."),
+    "musigent_rejections_total": ("counter", "Rejected requests by reason (rate_limit, daily_quota, overloaded, queue_timeout)."),
+    "musigent_copyright_prescreen_total": ("counter", "Fingerprint pre-screen lookups by result."),
+    "musigent_candidates_total": ("counter", "Speculative candidates by outcome (approved, rejected, cancelled)."),
+    "musigent_queue_depth": ("gauge", "Requests waiting in the admission queue."),
+    "musigent_active_requests": ("gauge", "Requests admitted and running."),
+    "musigent_suno_credits_remaining": ("gauge", "Last known Suno credit balance."),
+    "musigent_retention_archived_total": ("counter", "Interactions moved from the hot store to the archive."),
+    "musigent_retention_errors_total": ("counter", "Background retention runs that failed."),
+}
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metrics:
+    """
+    Thread-safe counters, gauges and fixed-bucket histograms keyed by
+    name + labels. `render()` returns the Prometheus text exposition format.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}    # (name, labels) -> value
+        self._gauges = {}      # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts..., +Inf], sum, count
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges[(name, _labels(labels))] = float(value)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _labels(labels))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            hist[0][index] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted(
+                (key, ([*h[0]], h[1], h[2])) for key, h in self._histograms.items()
+            )
+
+        lines = []
+        seen = set()
+
+        def header(name):
+            if name not in seen:
+                seen.add(name)
+                kind, text = HELP.get(name, ("untyped", name))
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters + gauges:
+            header(name)
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), (counts, total, count) in histograms:
+            header(name)
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+# spans of the request being traced; tasks and to_thread() calls inherit it
+_trace = contextvars.ContextVar("musigent_trace", default=None)
+
+
+@contextmanager
+def trace():
+    """Collect (stage, seconds) of every span run inside this block."""
+    spans = []
+    token = _trace.set(spans)
+    try:
+        yield spans
+    finally:
+        _trace.reset(token)
+
+
+@contextmanager
+def span(stage: str):
+    """Time a stage into musigent_stage_seconds and the active trace, if any."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe("musigent_stage_seconds", elapsed, stage=stage)
+        spans = _trace.get()
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+
+def summarize(spans) -> dict:
+    """Milliseconds per stage (repeated stages summed), in first-seen order."""
+    totals = {}
+    for stage, seconds in spans:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return {stage: round(seconds * 1000, 2) for stage, seconds in totals.items()}
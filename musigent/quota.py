@@ -0,0 +1,123 @@
+# musigent/quota.py
+# Persisted per-user daily quota, shared by every worker through SQLite.
+import threading
+from datetime import datetime
+
+from musigent.storage import connect, immediate
+
+
+class DailyQuota:
+    """
+    "N jingles per user per UTC day" counters.
+
+    One row per (username, day); the check-and-increment runs inside a single
+    write transaction so concurrent workers cannot both take the last slot.
+    Days roll over by key, and rows from earlier days are pruned.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS daily_usage (
+        username TEXT NOT NULL,
+        day TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (username, day)
+    );
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """
+
+    def __init__(self, db_path: str, limit: int = 5):
+        self.db_path = db_path
+        self.limit = limit
+        self._local = threading.local()
+        self._day = None
+        self.conn.executescript(self.SCHEMA)
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.db_path)
+        return conn
+
+    def _today(self) -> str:
+        day = datetime.utcnow().strftime("%Y-%m-%d")
+        if day != self._day:
+            # first call of a new UTC day in this process: drop stale counters
+            self.conn.execute("DELETE FROM daily_usage WHERE day < ?", (day,))
+            self._day = day
+        return day
+
+    def rebuild_from_store(self, memory, mode: str | None = None) -> None:
+        """
+        Seed today's counters from interactions saved before the quota table
+        existed, counting only plans of `mode` if given (the mode the quota
+        applies to). Runs once per day and only reads today's range of the
+        timestamp index.
+        """
+        day = self._today()
+        with immediate(self.conn) as conn:
+            if conn.execute(
+                "SELECT 1 FROM meta WHERE key = 'quota_seeded_day' AND value = ?", (day,)
+            ).fetchone():
+                return
+            counts = {}
+            for username, _ in memory.activity_since(day + "T00:00:00.000000Z", mode):
+                counts[username] = counts.get(username, 0) + 1
+            for username, n in counts.items():
+                conn.execute(
+                    "INSERT INTO daily_usage (username, day, count) VALUES (?, ?, ?) "
+                    "ON CONFLICT (username, day) DO UPDATE SET count = MAX(count, excluded.count)",
+                    (username, day, n),
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('quota_seeded_day', ?)",
+                (day,),
+            )
+
+    def try_consume(self, username: str) -> bool:
+        """Atomically take one unit of today's quota; False if exhausted."""
+        day = self._today()
+        with immediate(self.conn) as conn:
+            row = conn.execute(
+                "SELECT count FROM daily_usage WHERE username = ? AND day = ?",
+                (username, day),
+            ).fetchone()
+            used = row[0] if row else 0
+            if used >= self.limit:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO daily_usage (username, day, count) VALUES (?, ?, ?)",
+                (username, day, used + 1),
+            )
+            return True
+
+    def refund(self, username: str) -> None:
+        """Give back a unit taken by try_consume() for a request that delivered nothing."""
+        self.conn.execute(
+            "UPDATE daily_usage SET count = count - 1 WHERE username = ? AND day = ? AND count > 0",
+            (username, self._today()),
+        )
+
+    def exhausted(self, username: str) -> bool:
+        """Whether today's quota is used up (a read-only check; try_consume() decides)."""
+        return self.used(username) >= self.limit
+
+    def used(self, username: str) -> int:
+        row = self.conn.execute(
+            "SELECT count FROM daily_usage WHERE username = ? AND day = ?",
+            (username, self._today()),
+        ).fetchone()
+        return row[0] if row else 0
+
+    def usage(self, username: str) -> dict:
+        used = self.used(username)
+        return {
+            "username": username,
+            "day": self._day,
+            "used": used,
+            "limit": self.limit,
+            "remaining": max(0, self.limit - used),
+        }
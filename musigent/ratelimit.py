@@ -0,0 +1,152 @@
+# musigent/ratelimit.py
+# Per-user sliding-window rate limiter with O(1) admission.
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from musigent.storage import connect, immediate
+
+
+def _epoch(ts: str) -> float:
+    """Canonical '...Z' UTC timestamp -> epoch seconds."""
+    t = datetime.fromisoformat(ts.rstrip("Z"))
+    return (t - datetime(1970, 1, 1)).total_seconds()
+
+
+class SlidingWindowLimiter:
+    """
+    At most `limit` admissions per user in any `window_seconds` window.
+
+    Each user keeps a ring buffer of the last `limit` admission times, so the
+    check only looks at the oldest slot. By default the buffers live in this
+    process (a deque per user); pass `db_path` to keep them in SQLite so
+    several workers enforce one shared limit.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS rate_slots (
+        username TEXT NOT NULL,
+        slot INTEGER NOT NULL,
+        ts REAL NOT NULL,
+        PRIMARY KEY (username, slot)
+    );
+    CREATE TABLE IF NOT EXISTS rate_heads (
+        username TEXT PRIMARY KEY,
+        next_slot INTEGER NOT NULL
+    );
+    """
+
+    def __init__(self, limit: int = 5, window_seconds: int = 60, db_path: str | None = None):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._hits = {}
+        self._local = threading.local()
+        if db_path:
+            self.conn.executescript(self.SCHEMA)
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.db_path)
+        return conn
+
+    # -------------------------------------------------------------------------
+    # SEEDING
+    # -------------------------------------------------------------------------
+    def seed_from_store(self, memory, mode: str | None = None) -> None:
+        """Rebuild the windows from interactions (of the limited `mode`) saved in the last window."""
+        by_user = {}
+        for username, ts in memory.recent_activity(self.window_seconds, mode):
+            by_user.setdefault(username, []).append(_epoch(ts))
+        for username, stamps in by_user.items():
+            self.seed(username, stamps)
+
+    def seed(self, username: str, timestamps) -> None:
+        stamps = sorted(timestamps)[-self.limit:]
+        if not self.db_path:
+            with self._lock:
+                if username not in self._hits:
+                    self._hits[username] = deque(stamps, maxlen=self.limit)
+            return
+
+        with immediate(self.conn) as conn:
+            # another worker already owns this user's window
+            if conn.execute(
+                "SELECT 1 FROM rate_heads WHERE username = ?", (username,)
+            ).fetchone():
+                return
+            conn.executemany(
+                "INSERT INTO rate_slots (username, slot, ts) VALUES (?, ?, ?)",
+                [(username, i, ts) for i, ts in enumerate(stamps)],
+            )
+            conn.execute(
+                "INSERT INTO rate_heads (username, next_slot) VALUES (?, ?)",
+                (username, len(stamps) % self.limit),
+            )
+
+    # -------------------------------------------------------------------------
+    # ADMISSION
+    # -------------------------------------------------------------------------
+    def allow(self, username: str, now: float | None = None) -> bool:
+        """Admit and record one request, or return False if over the limit."""
+        now = time.time() if now is None else now
+        if self.db_path:
+            return self._allow_shared(username, now)
+
+        with self._lock:
+            hits = self._hits.get(username)
+            if hits is None:
+                hits = self._hits[username] = deque(maxlen=self.limit)
+            if len(hits) >= self.limit and now - hits[0] < self.window_seconds:
+                return False
+            hits.append(now)
+            return True
+
+    def release(self, username: str, admitted_at: float) -> None:
+        """Give back the admission recorded by allow(username, now=admitted_at)."""
+        if not self.db_path:
+            with self._lock:
+                hits = self._hits.get(username)
+                if hits is not None and admitted_at in hits:
+                    hits.remove(admitted_at)
+            return
+
+        with immediate(self.conn) as conn:
+            row = conn.execute(
+                "SELECT slot FROM rate_slots WHERE username = ? AND ts = ?", (username, admitted_at)
+            ).fetchone()
+            if row is None:
+                return
+            conn.execute("DELETE FROM rate_slots WHERE username = ? AND slot = ?", (username, row[0]))
+            # the newest slot: the next admission reuses it
+            conn.execute(
+                "UPDATE rate_heads SET next_slot = ? WHERE username = ? AND next_slot = ?",
+                (row[0], username, (row[0] + 1) % self.limit),
+            )
+
+    def _allow_shared(self, username: str, now: float) -> bool:
+        with immediate(self.conn) as conn:
+            head = conn.execute(
+                "SELECT next_slot FROM rate_heads WHERE username = ?", (username,)
+            ).fetchone()
+            slot = head[0] if head else 0
+            # the slot we are about to overwrite holds the oldest admission
+            oldest = conn.execute(
+                "SELECT ts FROM rate_slots WHERE username = ? AND slot = ?",
+                (username, slot),
+            ).fetchone()
+            if oldest and now - oldest[0] < self.window_seconds:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_slots (username, slot, ts) VALUES (?, ?, ?)",
+                (username, slot, now),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_heads (username, next_slot) VALUES (?, ?)",
+                (username, (slot + 1) % self.limit),
+            )
+            return True
@@ -0,0 +1,48 @@
+# musigent/registry.py
+# Small registry of named components (agents, tools) built on first use.
+import importlib
+import threading
+
+
+def lazy_import(target: str):
+    """Return a callable that imports "package.module:Attr" when first called."""
+    module_name, _, attr = target.partition(":")
+
+    def load(*args, **kwargs):
+        obj = getattr(importlib.import_module(module_name), attr)
+        return obj(*args, **kwargs)
+
+    return load
+
+
+class Registry:
+    """
+    name -> factory. `get(name)` builds the component once and caches it,
+    so unused agents (and the heavy modules behind them) are never loaded.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory) -> None:
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name: str):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                try:
+                    factory = self._factories[name]
+                except KeyError:
+                    raise KeyError(f"No component registered as {name!r}") from None
+                self._instances[name] = factory()
+            return self._instances[name]
+
+    def is_built(self, name: str) -> bool:
+        return name in self._instances
@@ -0,0 +1,186 @@
+# musigent/retention.py
+# Retention for the interaction log: age/size policy, gzipped daily archives
+# and per-user daily summaries kept in the hot store.
+#
+#   python -m musigent.retention                      # apply the policy once
+#   python -m musigent.retention --max-age-days 7 --max-rows 100000
+#   python -m musigent.retention summary --username alice --since 2025-01-01
+import argparse
+import asyncio
+import fcntl
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from musigent.metrics import metrics
+from musigent.storage import connect, immediate
+
+
+def _score(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+class Retention:
+    """
+    Moves interactions out of the hot store once they are older than
+    `max_age_days` (MUSIGENT_RETENTION_DAYS, default 30) or beyond the newest
+    `max_rows` (MUSIGENT_RETENTION_MAX_ROWS, default 0 = no cap) into
+    `memory.archive`, folding each one into daily_summary: one row per
+    (day, username, mode) with counts, approvals and score sums.
+
+    Only one process runs it at a time (a lock file in the archive
+    directory); the others skip that round.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS daily_summary (
+        day TEXT NOT NULL,
+        username TEXT NOT NULL,
+        mode TEXT NOT NULL,
+        interactions INTEGER NOT NULL,
+        approved INTEGER NOT NULL,
+        originality_sum REAL NOT NULL,
+        originality_count INTEGER NOT NULL,
+        copyright_sum REAL NOT NULL,
+        copyright_count INTEGER NOT NULL,
+        PRIMARY KEY (day, username, mode)
+    );
+    """
+
+    def __init__(self, memory, max_age_days: float | None = None, max_rows: int | None = None):
+        self.memory = memory
+        self.max_age_days = (
+            max_age_days if max_age_days is not None
+            else float(os.getenv("MUSIGENT_RETENTION_DAYS", "30"))
+        )
+        self.max_rows = (
+            max_rows if max_rows is not None
+            else int(os.getenv("MUSIGENT_RETENTION_MAX_ROWS", "0"))
+        )
+        self._local = threading.local()
+        self.conn.executescript(self.SCHEMA)
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.memory.db_path)
+        return conn
+
+    def run(self) -> dict:
+        """Apply the policy once: {"archived": n, "cutoff": ..., "skipped": bool}."""
+        cutoff = (
+            datetime.utcnow() - timedelta(days=self.max_age_days)
+        ).isoformat(timespec="microseconds") + "Z"
+        directory = self.memory.archive.directory
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, ".retention.lock"), "w") as lock:
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return {"archived": 0, "cutoff": cutoff, "skipped": True}
+            archived = self.memory.backend.expire(cutoff, self.max_rows, self._archive)
+        metrics.inc("musigent_retention_archived_total", archived)
+        return {"archived": archived, "cutoff": cutoff, "skipped": False}
+
+    def _archive(self, records: list, conn) -> None:
+        # the archive file is durable before the rows leave the hot store
+        self.memory.archive.write(records)
+        if conn is None:
+            with immediate(self.conn) as conn:
+                self._summarize(conn, records)
+        else:
+            self._summarize(conn, records)
+
+    @staticmethod
+    def _summarize(conn, records: list) -> None:
+        totals = {}
+        for record in records:
+            plan = record.get("plan") or {}
+            evaluation = record.get("evaluation") or {}
+            key = (record["timestamp_utc"][:10], record.get("username") or "guest", plan.get("mode") or "")
+            row = totals.setdefault(key, [0, 0, 0.0, 0, 0.0, 0])
+            row[0] += 1
+            row[1] += evaluation.get("approved") is True
+            originality = _score(evaluation.get("originality_score"))
+            if originality is not None:
+                row[2] += originality
+                row[3] += 1
+            copyright_score = _score((evaluation.get("copyright_safety") or {}).get("copyright_safety_score"))
+            if copyright_score is not None:
+                row[4] += copyright_score
+                row[5] += 1
+        conn.executemany(
+            """
+            INSERT INTO daily_summary (day, username, mode, interactions, approved,
+                originality_sum, originality_count, copyright_sum, copyright_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (day, username, mode) DO UPDATE SET
+                interactions = interactions + excluded.interactions,
+                approved = approved + excluded.approved,
+                originality_sum = originality_sum + excluded.originality_sum,
+                originality_count = originality_count + excluded.originality_count,
+                copyright_sum = copyright_sum + excluded.copyright_sum,
+                copyright_count = copyright_count + excluded.copyright_count
+            """,
+            [(*key, *row) for key, row in totals.items()],
+        )
+
+    def summary(self, username: str | None = None, since: str | None = None,
+                until: str | None = None) -> list:
+        """
+        Daily rollups of archived interactions, oldest first. `since` and
+        `until` are inclusive "YYYY-MM-DD" days.
+        """
+        where, params = [], []
+        for clause, value in (("username = ?", username), ("day >= ?", since), ("day <= ?", until)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        rows = self.conn.execute(
+            "SELECT day, username, mode, interactions, approved, "
+            "originality_sum / NULLIF(originality_count, 0), "
+            "copyright_sum / NULLIF(copyright_count, 0) FROM daily_summary"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + " ORDER BY day, username, mode",
+            params,
+        ).fetchall()
+        keys = ("day", "username", "mode", "interactions", "approved",
+                "avg_originality", "avg_copyright_safety")
+        return [dict(zip(keys, row)) for row in rows]
+
+
+async def run_periodically(retention: Retention, interval: float) -> None:
+    """Background loop for the API server: apply the policy every `interval` seconds."""
+    while True:
+        try:
+            await asyncio.to_thread(retention.run)
+        except Exception:
+            metrics.inc("musigent_retention_errors_total")
+        await asyncio.sleep(interval)
+
+
+def main(argv=None) -> None:
+    from musigent.memory import MemoryStore
+
+    parser = argparse.ArgumentParser(description="Archive old musigent interactions")
+    parser.add_argument("command", nargs="?", choices=("run", "summary"), default="run")
+    parser.add_argument("--store", default="memory_db.json", help="MemoryStore path")
+    parser.add_argument("--max-age-days", type=float)
+    parser.add_argument("--max-rows", type=int)
+    parser.add_argument("--username")
+    parser.add_argument("--since", help="first day (YYYY-MM-DD) for summary")
+    parser.add_argument("--until", help="last day (YYYY-MM-DD) for summary")
+    args = parser.parse_args(argv)
+
+    retention = Retention(MemoryStore(args.store), args.max_age_days, args.max_rows)
+    if args.command == "summary":
+        for row in retention.summary(args.username, args.since, args.until):
+            print(json.dumps(row))
+    else:
+        print(json.dumps(retention.run()))
+
+
+if __name__ == "__main__":
+    main()
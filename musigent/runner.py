@@ -1,37 +1,137 @@
-from musigent.utils.formatter import result_to_dataframe
+import asyncio
+import os
+import time
+
+from musigent.utils.aio import run_sync
+from musigent.utils.formatter import MusigentResult
 from musigent.memory import MemoryStore
-from musigent.agents.planner import PlannerAgent
-from musigent.agents.composer import ComposerAgent
-from musigent.agents.quality import QualityAgent
-from musigent.agents.jingle import JingleAgent, JingleInput
-from musigent.agents.time import get_utc_time
+from musigent.ratelimit import SlidingWindowLimiter
+from musigent.quota import DailyQuota
+from musigent.cache import GenerationCache, plan_key
+from musigent.credits import CreditBudget
+from musigent.scheduler import FairScheduler, Overloaded
+from musigent.registry import Registry, lazy_import
+from musigent.events import emit, muted, stream
+from musigent.metrics import metrics, span, summarize, trace
+
+RATE_LIMIT_ERROR = "Rate limit: max 5 jingle requests per minute per user. Please wait and try again."
+DAILY_LIMIT_ERROR = "Daily limit reached. Max 5 jingles per user per day."
 
 
 class MusigentRunner:
     def __init__(self):
         self.memory = MemoryStore("memory_db.json")
-        self.planner = PlannerAgent(self.memory)
-        self.composer = ComposerAgent(self.memory)
-        self.quality = QualityAgent(self.memory)
-        self.jingle = JingleAgent()
-
-    def handle_request(self, mode, prompt, duration_sec: int = 30, username: str = "guest"):
-        plan = self.planner.plan(mode, prompt, duration_sec)
-        draft = self.composer.compose(plan)
-        eval_ = self.quality.evaluate(draft)
-        time_info = get_utc_time()
-
-        self.memory.save_interaction(plan, draft, eval_, username, time_info)
-
-        result = {
-            "plan": plan,
-            "draft": draft,
-            "evaluation": eval_,
-            "time_info": time_info,
-        }
-        result["table"] = result_to_dataframe(result)
+
+        # agents and tools are imported and built on first use
+        self.registry = Registry()
+        self.registry.register("planner", lambda: lazy_import("musigent.agents.planner:PlannerAgent")(self.memory, self.registry))
+        self.registry.register("composer", lambda: lazy_import("musigent.agents.composer:ComposerAgent")(self.memory, self.registry))
+        self.registry.register("quality", lambda: lazy_import("musigent.agents.quality:QualityAgent")(
+            self.memory, store=self.audio_store
+        ))
+        self.registry.register("jingle", lazy_import("musigent.agents.jingle:JingleAgent"))
+        self.registry.register("suno", lambda: lazy_import("musigent.tools:SunoTool")(
+            jobs=lazy_import("musigent.jobs:SunoJobs")(self.memory.db_path),
+            credits=self.credits,
+        ))
+        self.registry.register("spotify", lazy_import("musigent.tools:SpotifyTool"))
+        self.registry.register("taste", lambda: lazy_import("musigent.taste:TasteStore")(
+            self.memory.db_path, self.registry.get("spotify")
+        ))
+        self.registry.register("retention", lambda: lazy_import("musigent.retention:Retention")(self.memory))
+        # generated tracks kept locally under their sha256 (MUSIGENT_AUDIO_STORE=0 disables)
+        self.store_audio = os.getenv("MUSIGENT_AUDIO_STORE", "1") != "0"
+        self.registry.register("audio_store", lambda: lazy_import("musigent.audio_store:AudioStore")(
+            self.memory.db_path,
+            os.getenv("MUSIGENT_AUDIO_DIR") or os.path.splitext(self.memory.path)[0] + "_audio",
+        ))
+
+        # per-minute jingle limit; MUSIGENT_SHARED_LIMITS=1 shares it across workers
+        shared = os.getenv("MUSIGENT_SHARED_LIMITS") == "1"
+        self.rate_limiter = SlidingWindowLimiter(
+            limit=5,
+            window_seconds=60,
+            db_path=self.memory.db_path if shared else None,
+        )
+        self.rate_limiter.seed_from_store(self.memory, mode="jingle")
+
+        # daily jingle quota, persisted and shared by all workers
+        self.quota = DailyQuota(self.memory.db_path, limit=5)
+        self.quota.rebuild_from_store(self.memory, mode="jingle")
+
+        # admission: bounded, per-user fair queue in front of every pipeline run
+        # (Overloaded -> HTTP 503 + Retry-After); Suno credits tracked per generation
+        self.scheduler = FairScheduler()
+        self.credits = CreditBudget(self.memory.db_path)
+
+        # identical plans reuse one Suno generation + evaluation
+        self.cache = GenerationCache(
+            ttl_seconds=float(os.getenv("MUSIGENT_CACHE_TTL", str(24 * 3600))),
+            max_entries=int(os.getenv("MUSIGENT_CACHE_SIZE", "512")),
+        )
+
+        # speculative candidates per plan (see musigent.candidates); 1 = single draft
+        self.candidates = int(os.getenv("MUSIGENT_CANDIDATES", "1"))
+        credits = os.getenv("MUSIGENT_CANDIDATE_CREDITS")
+        self.candidate_credits = int(credits) if credits else None
+        self.candidate_timeout = float(os.getenv("MUSIGENT_CANDIDATE_TIMEOUT", "0")) or None
+
+    @property
+    def planner(self):
+        return self.registry.get("planner")
+
+    @property
+    def composer(self):
+        return self.registry.get("composer")
+
+    @property
+    def quality(self):
+        return self.registry.get("quality")
+
+    @property
+    def jingle(self):
+        return self.registry.get("jingle")
+
+    @property
+    def retention(self):
+        return self.registry.get("retention")
+
+    @property
+    def audio_store(self):
+        return self.registry.get("audio_store") if self.store_audio else None
+
+    def handle_request(self, mode, prompt, duration_sec: int = 30, username: str = "guest",
+                       use_cache: bool = True, timings: bool = False, candidates: int | None = None):
+        return run_sync(self.ahandle_request(
+            mode, prompt, duration_sec, username, use_cache, timings, candidates
+        ))
+
+    async def ahandle_request(self, mode, prompt, duration_sec: int = 30, username: str = "guest",
+                              use_cache: bool = True, timings: bool = False,
+                              candidates: int | None = None):
+        with trace() as spans:
+            with span("request"):
+                async with self.scheduler.slot(username):
+                    with span("planner"):
+                        plan = await self.planner.aplan(mode, prompt, duration_sec, username)
+                    emit("plan", plan)
+                    result = await self._arun_plan(plan, username, use_cache, candidates)
+        if timings:
+            result["timings"] = summarize(spans)
         return result
 
+    def astream_request(self, mode, prompt, duration_sec: int = 30, username: str = "guest",
+                        use_cache: bool = True, timings: bool = False, candidates: int | None = None):
+        """
+        ahandle_request() as an async iterator of (event, data): "plan",
+        "draft" (with audio_url, playable while evaluation runs),
+        "originality", "copyright", then "result" once the interaction is
+        stored. Overloaded is raised before the first event.
+        """
+        return stream(self.ahandle_request(
+            mode, prompt, duration_sec, username, use_cache, timings, candidates
+        ))
+
     def handle_jingle_survey(
         self,
         brand_name: str,
@@ -39,18 +139,56 @@ class MusigentRunner:
         customer_persona: str,
         vibe: str,
         username: str = "guest",
+        use_cache: bool = True,
+        timings: bool = False,
+    ):
+        return run_sync(self.ahandle_jingle_survey(
+            brand_name, company_field, customer_persona, vibe, username, use_cache, timings
+        ))
+
+    def astream_jingle_survey(
+        self,
+        brand_name: str,
+        company_field: str,
+        customer_persona: str,
+        vibe: str,
+        username: str = "guest",
+        use_cache: bool = True,
+        timings: bool = False,
     ):
+        """ahandle_jingle_survey() as stage events, like astream_request()."""
+        return stream(self.ahandle_jingle_survey(
+            brand_name, company_field, customer_persona, vibe, username, use_cache, timings
+        ))
+
+    async def ahandle_jingle_survey(
+        self,
+        brand_name: str,
+        company_field: str,
+        customer_persona: str,
+        vibe: str,
+        username: str = "guest",
+        use_cache: bool = True,
+        timings: bool = False,
+    ):
+        # daily limit first, so requests refused anyway do not fill the rate window
+        if await asyncio.to_thread(self.quota.exhausted, username):
+            metrics.inc("musigent_rejections_total", reason="daily_quota")
+            return {"error": DAILY_LIMIT_ERROR}
+
         # short-term rate limit (max 5 requests per 60 seconds)
-        if self.memory.get_user_recent_count(username, window_seconds=60) >= 5:
-            return {
-                "error": "Rate limit: max 5 jingle requests per minute per user. Please wait and try again."
-            }
+        admitted_at = time.time()
+        if not await asyncio.to_thread(self.rate_limiter.allow, username, admitted_at):
+            metrics.inc("musigent_rejections_total", reason="rate_limit")
+            return {"error": RATE_LIMIT_ERROR}
 
         # daily limit: max 5 jingles per user per day
-        if self.memory.get_user_daily_count(username) >= 5:
-            return {
-                "error": "Daily limit reached. Max 5 jingles per user per day."
-            }
+        if not await asyncio.to_thread(self.quota.try_consume, username):
+            await asyncio.to_thread(self.rate_limiter.release, username, admitted_at)
+            metrics.inc("musigent_rejections_total", reason="daily_quota")
+            return {"error": DAILY_LIMIT_ERROR}
+
+        from musigent.agents.jingle import JingleInput
 
         j_input = JingleInput(
             brand_name=brand_name,
@@ -59,18 +197,201 @@ class MusigentRunner:
             vibe=vibe,
         )
 
-        plan = self.jingle.build_plan(j_input)
-        draft = self.composer.compose(plan)
-        eval_ = self.quality.evaluate(draft)
-        time_info = get_utc_time()
+        with trace() as spans:
+            with span("request"):
+                try:
+                    async with self.scheduler.slot(username):
+                        with span("planner"):
+                            plan = self.jingle.build_plan(j_input)
+                        emit("plan", plan)
+                        result = await self._arun_plan(plan, username, use_cache)
+                except BaseException as e:
+                    # not admitted, failed or cancelled: nothing was delivered
+                    await asyncio.to_thread(self.quota.refund, username)
+                    if isinstance(e, Overloaded):
+                        # never ran: the rate window only counts admitted requests
+                        await asyncio.to_thread(self.rate_limiter.release, username, admitted_at)
+                    raise
+        if timings:
+            result["timings"] = summarize(spans)
+        return result
+
+    async def _agenerate_one(self, plan, store: bool = True):
+        with span("composer"):
+            draft = await self.composer.acompose(plan)
+        emit("draft", draft)
+        with span("quality"):
+            eval_ = await self.quality.aevaluate(draft)
+        if store and self.store_audio:
+            await self._astore_audio(draft)
+        return {"draft": draft, "evaluation": eval_}
+
+    async def _agenerate_candidate(self, plan):
+        # own trace: candidates run in parallel, so their stage times must not
+        # add up in the request's timings ("candidates" covers the wall time)
+        with trace():
+            return await self._agenerate_one(plan, store=False)
+
+    async def _astore_audio(self, draft):
+        """Keep a local copy of the track and add its /audio URL to the draft."""
+        url = draft.get("audio_url") or ""
+        if not url.startswith("http"):
+            return
+        try:
+            with span("audio.store"):
+                # already in the asset cache after the quality checks, as a rule
+                asset = await self.quality.assets.aget(url)
+                if not asset.size:
+                    return
+                track = await asyncio.to_thread(self.audio_store.put, asset.data, url)
+        except Exception:
+            return  # the remote URL still works; storing is best-effort
+        draft["audio_sha256"] = track["sha256"]
+        draft["local_audio_url"] = f"/audio/{track['sha256']}"
 
-        self.memory.save_interaction(plan, draft, eval_, username, time_info)
+    async def _agenerate(self, plan, candidates: int | None = None):
+        """
+        One draft + evaluation, or, with several candidates, credits or a time
+        budget configured, the first approved of speculative candidates.
+        """
+        candidates = candidates or self.candidates
+        credits = self.candidate_credits
+        if candidates <= 1 and (credits or 1) <= 1 and self.candidate_timeout is None:
+            return await self._agenerate_one(plan)
 
-        result = {
-            "plan": plan,
-            "draft": draft,
-            "evaluation": eval_,
-            "time_info": time_info,
-        }
-        result["table"] = result_to_dataframe(result)
+        from musigent.candidates import first_approved
+
+        try:
+            # only the selected candidate's stages are streamed, after selection
+            with span("candidates"), muted():
+                generated = await first_approved(
+                    lambda: self._agenerate_candidate(plan), candidates, credits, self.candidate_timeout
+                )
+        except TimeoutError as e:
+            draft = {
+                "track_id": None,
+                "audio_url": None,
+                "style": plan["style"],
+                "tempo_range": plan["tempo_range"],
+                "taste_profile": plan.get("taste_profile") or {},
+                "error": str(e),
+            }
+            return {"draft": draft, "evaluation": await self.quality.aevaluate(draft)}
+        # losing candidates are never stored, only the selected track
+        if self.store_audio:
+            await self._astore_audio(generated["draft"])
+        return generated
+
+    async def _arun_plan(self, plan, username, use_cache: bool = True, candidates: int | None = None):
+        """Compose → evaluate → timestamp → persist, without blocking the loop."""
+        result, record = await self._agenerate_result(plan, username, use_cache, candidates)
+        with span("store"):
+            await asyncio.to_thread(self.memory.save_interactions, [record])
         return result
+
+    async def _agenerate_result(self, plan, username, use_cache: bool = True,
+                                candidates: int | None = None):
+        """Run one plan and return (result, store record) without persisting."""
+        if use_cache:
+            generated, cache_status = await self.cache.get_or_create(
+                plan_key(plan), lambda: self._agenerate(plan, candidates)
+            )
+        else:
+            generated, cache_status = await self._agenerate(plan, candidates), "bypass"
+        metrics.inc("musigent_cache_requests_total", result=cache_status)
+        # the track can be shared between users, the taste profile must not be
+        draft = {**generated["draft"], "taste_profile": plan.get("taste_profile") or {}}
+        eval_ = generated["evaluation"]
+        # stages not streamed yet (cache hits, candidates, coalesced requests)
+        emit("draft", draft)
+        emit("originality", {"originality_score": eval_.get("originality_score"),
+                             "audio_features": eval_.get("audio_features")})
+        emit("copyright", eval_.get("copyright_safety"))
+
+        from musigent.agents.time import get_utc_time
+        with span("time"):
+            time_info = get_utc_time()
+
+        record = self.memory.make_record(plan, draft, eval_, username, time_info)
+
+        result = MusigentResult(
+            plan=plan,
+            draft=draft,
+            evaluation=eval_,
+            time_info=time_info,
+            cache=cache_status,
+        )
+        return result, record
+
+    # -------------------------------------------------------------------------
+    # BATCH JINGLE SURVEY
+    # -------------------------------------------------------------------------
+    def handle_jingle_batch(self, inputs, username: str = "guest", concurrency: int = 4,
+                            use_cache: bool = True, timings: bool = False):
+        """Sync iterator over ahandle_jingle_batch() results, in completion order."""
+        batch = self.ahandle_jingle_batch(inputs, username, concurrency, use_cache, timings)
+        try:
+            while True:
+                try:
+                    yield run_sync(batch.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            run_sync(batch.aclose())
+
+    async def ahandle_jingle_batch(self, inputs, username: str = "guest", concurrency: int = 4,
+                                   use_cache: bool = True, timings: bool = False):
+        """
+        Run many JingleInput records concurrently (at most `concurrency` at a
+        time; upstream hosts are further capped in musigent.http) and yield
+        {"index": i, ...result} as each one finishes.
+
+        The per-minute limit applies to the batch call as a whole; the daily
+        quota is consumed per jingle. All interactions are written in one
+        transaction when the batch ends (or is abandoned).
+        """
+        inputs = list(inputs)
+        if await asyncio.to_thread(self.quota.exhausted, username):
+            metrics.inc("musigent_rejections_total", reason="daily_quota")
+            yield {"index": None, "error": DAILY_LIMIT_ERROR}
+            return
+        if not await asyncio.to_thread(self.rate_limiter.allow, username):
+            metrics.inc("musigent_rejections_total", reason="rate_limit")
+            yield {"index": None, "error": RATE_LIMIT_ERROR}
+            return
+
+        gate = asyncio.Semaphore(max(1, concurrency))
+        records = []
+
+        async def run_one(index, j_input):
+            async with gate:
+                if not await asyncio.to_thread(self.quota.try_consume, username):
+                    metrics.inc("musigent_rejections_total", reason="daily_quota")
+                    return {"index": index, "error": DAILY_LIMIT_ERROR}
+                # each item runs in its own task, so it gets its own trace
+                with trace() as spans:
+                    try:
+                        async with self.scheduler.slot(username):
+                            with span("planner"):
+                                plan = self.jingle.build_plan(j_input)
+                            result, record = await self._agenerate_result(plan, username, use_cache)
+                    except BaseException as e:
+                        await asyncio.to_thread(self.quota.refund, username)
+                        if isinstance(e, Overloaded):
+                            return {"index": index, "error": str(e), "retry_after": e.retry_after}
+                        if isinstance(e, Exception):
+                            return {"index": index, "error": f"{type(e).__name__}: {e}"}
+                        raise
+                records.append(record)
+                if timings:
+                    result["timings"] = summarize(spans)
+                return MusigentResult(index=index, **result)
+
+        tasks = [asyncio.create_task(run_one(i, j)) for i, j in enumerate(inputs)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.to_thread(self.memory.save_interactions, records)
@@ -0,0 +1,170 @@
+# musigent/scheduler.py
+# Admission control in front of the runner: a bounded queue served in
+# weighted-fair order per user, with a cap on concurrently running requests.
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from musigent.metrics import metrics, span
+
+
+class Overloaded(RuntimeError):
+    """The request was not admitted; retry after `retry_after` seconds (HTTP 503)."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _parse_weights(spec: str) -> dict:
+    # "alice=2,batch-bot=0.5"
+    return {
+        name.strip(): float(weight)
+        for name, _, weight in (item.partition("=") for item in spec.split(","))
+        if name.strip() and weight
+    }
+
+
+class _Waiter:
+    __slots__ = ("username", "start", "loop", "future", "granted")
+
+    def __init__(self, username, start, loop):
+        self.username = username
+        self.start = start
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+
+
+def _wake(future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class FairScheduler:
+    """
+    At most `max_active` requests run at once (MUSIGENT_MAX_ACTIVE, default 16).
+    The rest wait in a queue of at most `max_queue` (MUSIGENT_MAX_QUEUE, 64),
+    `max_queue_per_user` of them per user (MUSIGENT_MAX_QUEUE_PER_USER,
+    default a quarter of the queue), for up to `queue_timeout` seconds
+    (MUSIGENT_QUEUE_TIMEOUT, 60). Anything beyond that raises Overloaded
+    with a Retry-After estimate from the observed service time.
+
+    Waiting requests are served by weighted fair queuing: each gets a
+    virtual finish tag max(now, user's last tag) + cost / weight, and the
+    smallest tag runs next, so a user with a burst of requests cannot starve
+    the others. Weights default to 1 (MUSIGENT_USER_WEIGHTS="alice=2,...").
+
+    Thread-safe and usable from any event loop (the API loop and the
+    background loop behind the sync API share one queue).
+    """
+
+    def __init__(self, max_active: int | None = None, max_queue: int | None = None,
+                 max_queue_per_user: int | None = None, queue_timeout: float | None = None,
+                 weights: dict | None = None):
+        env = os.getenv
+        self.max_active = max_active or int(env("MUSIGENT_MAX_ACTIVE", "16"))
+        self.max_queue = max_queue if max_queue is not None else int(env("MUSIGENT_MAX_QUEUE", "64"))
+        self.max_queue_per_user = max_queue_per_user or int(
+            env("MUSIGENT_MAX_QUEUE_PER_USER", str(max(1, self.max_queue // 4)))
+        )
+        self.queue_timeout = queue_timeout or float(env("MUSIGENT_QUEUE_TIMEOUT", "60"))
+        self.weights = weights if weights is not None else _parse_weights(env("MUSIGENT_USER_WEIGHTS", ""))
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queue = []  # heap of (finish tag, seq, _Waiter)
+        self._queued = {}  # username -> waiting requests
+        self._finish = {}  # username -> last virtual finish tag
+        self._vtime = 0.0
+        self._seq = itertools.count()
+        self._service = 1.0  # moving average of seconds per admitted request
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue would drain at the observed rate."""
+        return max(1, math.ceil((len(self._queue) + 1) * self._service / self.max_active))
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "active": self._active,
+                "queued": len(self._queue),
+                "max_active": self.max_active,
+                "max_queue": self.max_queue,
+                "avg_service_seconds": round(self._service, 3),
+            }
+
+    def _publish(self) -> None:
+        metrics.set("musigent_queue_depth", len(self._queue))
+        metrics.set("musigent_active_requests", self._active)
+
+    @asynccontextmanager
+    async def slot(self, username: str, cost: float = 1.0):
+        """Hold one running slot for the duration of the block."""
+        with span("queue"):
+            await self.acquire(username, cost)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    async def acquire(self, username: str, cost: float = 1.0) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._active < self.max_active and not self._queue:
+                self._active += 1
+                self._publish()
+                return
+            if len(self._queue) >= self.max_queue or self._queued.get(username, 0) >= self.max_queue_per_user:
+                metrics.inc("musigent_rejections_total", reason="overloaded")
+                raise Overloaded("Server busy: the request queue is full.", self.retry_after())
+            start = max(self._vtime, self._finish.get(username, 0.0))
+            finish = start + cost / self.weights.get(username, 1.0)
+            self._finish[username] = finish
+            waiter = _Waiter(username, start, loop)
+            heapq.heappush(self._queue, (finish, next(self._seq), waiter))
+            self._queued[username] = self._queued.get(username, 0) + 1
+            self._publish()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._queue = [item for item in self._queue if item[2] is not waiter]
+                    heapq.heapify(self._queue)
+                    self._queued[username] -= 1
+                    self._publish()
+            if granted and isinstance(e, asyncio.TimeoutError):
+                return  # the slot arrived just as the wait timed out
+            if granted:
+                self.release()
+            if isinstance(e, asyncio.TimeoutError):
+                metrics.inc("musigent_rejections_total", reason="queue_timeout")
+                raise Overloaded("Server busy: timed out waiting in the request queue.",
+                                 self.retry_after()) from None
+            raise
+
+    def release(self, elapsed: float | None = None) -> None:
+        """Free a slot, handing it straight to the next waiter in fair order."""
+        with self._lock:
+            if elapsed is not None:
+                self._service = 0.8 * self._service + 0.2 * elapsed
+            if self._queue:
+                _, _, waiter = heapq.heappop(self._queue)
+                self._queued[waiter.username] -= 1
+                waiter.granted = True
+                self._vtime = max(self._vtime, waiter.start)
+                waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+            else:
+                self._active -= 1
+                # idle: forget tags that can no longer delay anyone
+                self._finish = {u: f for u, f in self._finish.items() if f > self._vtime}
+                self._queued = {u: n for u, n in self._queued.items() if n}
+            self._publish()
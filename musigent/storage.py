@@ -0,0 +1,616 @@
+# musigent/storage.py
+# Storage backends for MemoryStore: append-only JSONL or SQLite (WAL).
+import base64
+import bisect
+import fcntl
+import gzip
+import heapq
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+
+def utc_now_iso() -> str:
+    """Canonical UTC timestamp used for every stored record (sortable as text)."""
+    return datetime.utcnow().isoformat(timespec="microseconds") + "Z"
+
+
+def normalize_timestamp(ts):
+    """
+    Parse the timestamp formats found in older logs and return the canonical
+    form, or None if the value cannot be parsed.
+    """
+    if not ts:
+        return None
+    try:
+        s = str(ts).replace("Z", "+00:00").replace(" UTC", "")
+        t = datetime.fromisoformat(s).replace(tzinfo=None)
+    except Exception:
+        return None
+    return t.isoformat(timespec="microseconds") + "Z"
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """Open a SQLite connection tuned for several concurrent writer processes."""
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
+@contextmanager
+def immediate(conn: sqlite3.Connection):
+    """Write transaction that takes the database write lock up front."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+# ---- HISTORY QUERIES ----
+_FIELD = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
+
+def check_fields(fields) -> tuple:
+    """
+    Validate dotted projection paths such as "evaluation.approved". Paths
+    must not overlap ("plan" and "plan.mode"): both would fill the same node.
+    """
+    fields = tuple(fields)
+    for field in fields:
+        if not _FIELD.match(field):
+            raise ValueError(f"Invalid history field: {field!r}")
+    for i, field in enumerate(fields):
+        for j, other in enumerate(fields):
+            if i != j and (other == field or other.startswith(field + ".")):
+                raise ValueError(f"Overlapping history fields: {field!r} and {other!r}")
+    return fields
+
+
+def encode_cursor(timestamp_utc: str, row_id: int) -> str:
+    """Opaque pagination cursor for the (timestamp_utc, id) of the last row returned."""
+    raw = json.dumps([timestamp_utc, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp_utc, row_id = json.loads(raw)
+        return str(timestamp_utc), int(row_id)
+    except Exception:
+        raise ValueError(f"Invalid history cursor: {cursor!r}")
+
+
+def _extract(record: dict, field: str):
+    value = record
+    for key in field.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _index_columns(record: dict) -> tuple:
+    """(mode, approved) of a record, as stored in the indexed columns."""
+    mode = _extract(record, "plan.mode")
+    approved = _extract(record, "evaluation.approved")
+    return mode, None if approved is None else int(bool(approved))
+
+
+def _load_legacy(json_path: str) -> list:
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return []
+    if not isinstance(data, dict):
+        return []
+    records = []
+    for item in data.get("interactions", []):
+        ts = normalize_timestamp(item.get("timestamp_utc") or item.get("timestamp"))
+        if ts is None:
+            continue
+        item = dict(item)
+        item["timestamp_utc"] = ts
+        item.setdefault("username", "guest")
+        records.append(item)
+    return records
+
+
+class SQLiteBackend:
+    """
+    Interactions in a SQLite database in WAL mode.
+    One row per interaction, indexed on (username, timestamp_utc); plan mode
+    and approval are copied into indexed columns for history queries.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS interactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp_utc TEXT NOT NULL,
+        username TEXT NOT NULL,
+        record TEXT NOT NULL,
+        mode TEXT,
+        approved INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS idx_interactions_user_ts
+        ON interactions (username, timestamp_utc);
+    CREATE INDEX IF NOT EXISTS idx_interactions_ts
+        ON interactions (timestamp_utc);
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """
+
+    INDEXES = """
+    CREATE INDEX IF NOT EXISTS idx_interactions_mode_ts
+        ON interactions (mode, timestamp_utc);
+    CREATE INDEX IF NOT EXISTS idx_interactions_approved_ts
+        ON interactions (approved, timestamp_utc);
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self.conn.executescript(self.SCHEMA)
+        self._migrate()
+        self.conn.executescript(self.INDEXES)
+
+    def _migrate(self) -> None:
+        # databases created before history queries lack the mode/approved columns
+        with immediate(self.conn) as conn:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(interactions)")}
+            if "mode" in columns:
+                return
+            conn.execute("ALTER TABLE interactions ADD COLUMN mode TEXT")
+            conn.execute("ALTER TABLE interactions ADD COLUMN approved INTEGER")
+            conn.execute(
+                "UPDATE interactions SET "
+                "mode = json_extract(record, '$.plan.mode'), "
+                "approved = json_extract(record, '$.evaluation.approved')"
+            )
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.db_path)
+        return conn
+
+    def append(self, record: dict) -> None:
+        self.append_many([record])
+
+    INSERT = (
+        "INSERT INTO interactions (timestamp_utc, username, record, mode, approved) "
+        "VALUES (?, ?, ?, ?, ?)"
+    )
+
+    @staticmethod
+    def _row(record: dict) -> tuple:
+        return (
+            record["timestamp_utc"],
+            record["username"],
+            json.dumps(record, default=str),
+            *_index_columns(record),
+        )
+
+    def append_many(self, records: list) -> None:
+        rows = [self._row(r) for r in records]
+        with immediate(self.conn) as conn:
+            conn.executemany(self.INSERT, rows)
+
+    def count_since(self, username: str, since: str) -> int:
+        row = self.conn.execute(
+            "SELECT COUNT(*) FROM interactions WHERE username = ? AND timestamp_utc >= ?",
+            (username, since),
+        ).fetchone()
+        return row[0]
+
+    def since(self, since: str, mode: str | None = None) -> list:
+        """(username, timestamp_utc) pairs at or after `since`, oldest first."""
+        if mode is None:
+            return self.conn.execute(
+                "SELECT username, timestamp_utc FROM interactions "
+                "WHERE timestamp_utc >= ? ORDER BY timestamp_utc",
+                (since,),
+            ).fetchall()
+        return self.conn.execute(
+            "SELECT username, timestamp_utc FROM interactions "
+            "WHERE mode = ? AND timestamp_utc >= ? ORDER BY timestamp_utc",
+            (mode, since),
+        ).fetchall()
+
+    def history(self, fields: tuple, username=None, mode=None, approved=None,
+                since=None, until=None, before=None, limit: int = 50) -> list:
+        """
+        Newest-first (timestamp_utc, id, [field values]) rows matching the
+        filters, strictly older than the `before` (timestamp_utc, id) key.
+        Only the projected fields are extracted from the stored JSON.
+        """
+        where, params = [], []
+        for column, value in (("username", username), ("mode", mode)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if approved is not None:
+            where.append("approved = ?")
+            params.append(int(bool(approved)))
+        if since is not None:
+            where.append("timestamp_utc >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("timestamp_utc < ?")
+            params.append(until)
+        if before is not None:
+            where.append("(timestamp_utc, id) < (?, ?)")
+            params.extend(before)
+
+        # json_extract with two or more paths returns a JSON array of the values
+        # (a lone path is repeated so objects and strings decode the same way)
+        paths = ["$." + f for f in fields]
+        if len(paths) == 1:
+            paths *= 2
+        params = paths + params
+        paths = ", ".join("?" for _ in paths)
+        sql = (
+            f"SELECT timestamp_utc, id, json_extract(record, {paths}) FROM interactions"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + " ORDER BY timestamp_utc DESC, id DESC LIMIT ?"
+        )
+        rows = self.conn.execute(sql, (*params, limit)).fetchall()
+        return [(ts, row_id, json.loads(values)[:len(fields)]) for ts, row_id, values in rows]
+
+    def expire(self, cutoff: str, max_rows: int, archive, batch: int = 1000) -> int:
+        """
+        Remove the oldest interactions: all before `cutoff` and, if `max_rows`
+        is set, any beyond the newest `max_rows`. Each batch of records goes
+        to `archive(records, conn)` inside the transaction that deletes it.
+        Returns the number of rows removed.
+        """
+        conn = self.conn
+        total = conn.execute("SELECT COUNT(*) FROM interactions").fetchone()[0]
+        old = conn.execute(
+            "SELECT COUNT(*) FROM interactions WHERE timestamp_utc < ?", (cutoff,)
+        ).fetchone()[0]
+        due = max(old, total - max_rows if max_rows else 0)
+        removed = 0
+        while removed < due:
+            with immediate(conn):
+                rows = conn.execute(
+                    "SELECT id, record FROM interactions ORDER BY timestamp_utc, id LIMIT ?",
+                    (min(batch, due - removed),),
+                ).fetchall()
+                if not rows:
+                    break
+                archive([json.loads(record) for _, record in rows], conn)
+                conn.executemany(
+                    "DELETE FROM interactions WHERE id = ?", [(row_id,) for row_id, _ in rows]
+                )
+            removed += len(rows)
+        return removed
+
+    def migrate_legacy(self, json_path: str) -> int:
+        """Import a legacy {"interactions": [...]} file exactly once."""
+        if not os.path.exists(json_path):
+            return 0
+        with immediate(self.conn) as conn:
+            done = conn.execute(
+                "SELECT value FROM meta WHERE key = 'legacy_migrated'"
+            ).fetchone()
+            if done:
+                return 0
+            records = _load_legacy(json_path)
+            conn.executemany(self.INSERT, [self._row(r) for r in records])
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('legacy_migrated', ?)",
+                (json_path,),
+            )
+        return len(records)
+
+
+class JsonlBackend:
+    """
+    Append-only JSON Lines log, one interaction per line.
+    Writers take an exclusive flock; readers keep an in-process
+    (username -> sorted timestamps) index and a time-sorted list of
+    (timestamp, byte offset, username, mode, approved) rows, both refreshed
+    by tailing the file. History queries filter the rows and read back only
+    the lines they return. expire() swaps in a rewritten file; readers see
+    the new inode and re-index, writers reopen.
+
+    Memory is not bounded: the index holds one entry per stored interaction
+    (until expire() drops it), so large stores should use SQLiteBackend.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._inode = None
+        self._offset = 0
+        self._index = {}
+        self._rows = []
+        open(self.path, "a", encoding="utf-8").close()
+
+    @contextmanager
+    def _flock(self, f, mode):
+        fcntl.flock(f.fileno(), mode)
+        try:
+            yield f
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def _append_locked(self):
+        # expire() may swap the file while we wait for the lock: retry on the new one
+        while True:
+            f = open(self.path, "a", encoding="utf-8")
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            if os.fstat(f.fileno()).st_ino == os.stat(self.path).st_ino:
+                break
+            f.close()
+        try:
+            yield f
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            f.close()
+
+    def append(self, record: dict) -> None:
+        self.append_many([record])
+
+    def append_many(self, records: list) -> None:
+        payload = "".join(json.dumps(r, default=str) + "\n" for r in records)
+        with self._append_locked() as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _refresh(self) -> None:
+        with open(self.path, "rb") as f, self._flock(f, fcntl.LOCK_SH):
+            inode = os.fstat(f.fileno()).st_ino
+            if inode != self._inode:
+                # first read, or the log was compacted: index it from scratch
+                self._inode = inode
+                self._offset = 0
+                self._index = {}
+                self._rows = []
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partial write, pick it up next time
+                offset = self._offset
+                self._offset += len(line)
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue
+                ts = item.get("timestamp_utc")
+                if ts:
+                    bisect.insort(self._index.setdefault(item.get("username"), []), ts)
+                    bisect.insort(self._rows, (ts, offset, item.get("username"), *_index_columns(item)))
+
+    def count_since(self, username: str, since: str) -> int:
+        with self._lock:
+            self._refresh()
+            stamps = self._index.get(username, [])
+            return len(stamps) - bisect.bisect_left(stamps, since)
+
+    def since(self, since: str, mode: str | None = None) -> list:
+        with self._lock:
+            self._refresh()
+            rows = self._rows[bisect.bisect_left(self._rows, (since,)):]
+        return [(user, ts) for ts, _, user, row_mode, _ in rows if mode is None or row_mode == mode]
+
+    def history(self, fields: tuple, username=None, mode=None, approved=None,
+                since=None, until=None, before=None, limit: int = 50) -> list:
+        """Same contract as SQLiteBackend.history; the row id is the line's byte offset."""
+        if approved is not None:
+            approved = int(bool(approved))
+        with self._lock:
+            # offsets belong to the indexed inode: pin that file before matching,
+            # so the lines can be read back even if expire() swaps the log meanwhile
+            while True:
+                self._refresh()
+                f = open(self.path, "rb")
+                if os.fstat(f.fileno()).st_ino == self._inode:
+                    break
+                f.close()
+            rows = self._rows
+            end = len(rows)
+            if until is not None:
+                end = bisect.bisect_left(rows, (until,))
+            if before is not None:
+                end = min(end, bisect.bisect_left(rows, tuple(before)))
+            start = bisect.bisect_left(rows, (since,)) if since is not None else 0
+            matches = []
+            for i in range(end - 1, start - 1, -1):
+                ts, offset, user, row_mode, row_approved = rows[i]
+                if ((username is None or user == username)
+                        and (mode is None or row_mode == mode)
+                        and (approved is None or row_approved == approved)):
+                    matches.append((ts, offset))
+                    if len(matches) == limit:
+                        break
+
+        out = []
+        with f:
+            for ts, offset in matches:
+                f.seek(offset)
+                record = json.loads(f.readline())
+                out.append((ts, offset, [_extract(record, field) for field in fields]))
+        return out
+
+    def expire(self, cutoff: str, max_rows: int, archive, batch: int = 1000) -> int:
+        """
+        Same contract as SQLiteBackend.expire, with `archive(records, None)`.
+        Kept lines are copied to a new file that replaces the log once every
+        expired batch has been archived; lines without a timestamp (never
+        visible to readers) are dropped.
+        """
+        with open(self.path, "rb") as f, self._flock(f, fcntl.LOCK_EX):
+            keys = []
+            offset = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    ts = json.loads(line).get("timestamp_utc") or ""
+                except ValueError:
+                    ts = ""
+                keys.append((ts, offset))
+                offset += len(line)
+            old = sum(1 for ts, _ in keys if ts < cutoff)
+            due = max(old, len(keys) - max_rows if max_rows else 0)
+            if not due:
+                return 0
+            expired = {offset for _, offset in sorted(keys)[:due]}
+
+            tmp = self.path + ".tmp"
+            pending = []
+            removed = 0
+            f.seek(0)
+            offset = 0
+            with open(tmp, "wb") as out:
+                for line in f:
+                    if offset in expired:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            record = None
+                        if record and record.get("timestamp_utc"):
+                            pending.append(record)
+                        if len(pending) >= batch:
+                            archive(pending, None)
+                            removed += len(pending)
+                            pending = []
+                    else:
+                        out.write(line)
+                    offset += len(line)
+                if pending:
+                    archive(pending, None)
+                    removed += len(pending)
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp, self.path)
+        return removed
+
+    def migrate_legacy(self, json_path: str) -> int:
+        if not os.path.exists(json_path):
+            return 0
+        with self._append_locked() as f:
+            # only migrate into an empty log, so a second process is a no-op
+            if os.path.getsize(self.path) > 0:
+                return 0
+            records = _load_legacy(json_path)
+            f.write("".join(json.dumps(r, default=str) + "\n" for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+        return len(records)
+
+
+class Archive:
+    """
+    Expired interactions as gzipped JSON Lines, one file per UTC day
+    (interactions-YYYY-MM-DD.jsonl.gz). Each write appends a gzip member,
+    so files only grow and a line's number is a stable id within its day.
+    """
+
+    PREFIX = "interactions-"
+    SUFFIX = ".jsonl.gz"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, day: str) -> str:
+        return os.path.join(self.directory, f"{self.PREFIX}{day}{self.SUFFIX}")
+
+    def days(self) -> list:
+        """Archived days ("YYYY-MM-DD"), oldest first."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            name[len(self.PREFIX):-len(self.SUFFIX)]
+            for name in names
+            if name.startswith(self.PREFIX) and name.endswith(self.SUFFIX)
+        )
+
+    def write(self, records: list) -> None:
+        by_day = {}
+        for record in records:
+            by_day.setdefault(record["timestamp_utc"][:10], []).append(record)
+        os.makedirs(self.directory, exist_ok=True)
+        for day, items in sorted(by_day.items()):
+            payload = "".join(json.dumps(r, default=str) + "\n" for r in items)
+            with open(self._path(day), "ab") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+                    gz.write(payload.encode("utf-8"))
+                raw.flush()
+                os.fsync(raw.fileno())
+
+    def history(self, fields: tuple, username=None, mode=None, approved=None,
+                since=None, until=None, before=None, limit: int = 50) -> list:
+        """
+        Same contract as the backends' history(); the row id is the line
+        number within the day's file. Only days inside the range are opened.
+        """
+        if approved is not None:
+            approved = int(bool(approved))
+        before = tuple(before) if before is not None else None
+
+        def matches(day):
+            with gzip.open(self._path(day), "rt", encoding="utf-8") as f:
+                for line_no, line in enumerate(f):
+                    record = json.loads(line)
+                    ts = record["timestamp_utc"]
+                    if ((since is not None and ts < since)
+                            or (until is not None and ts >= until)
+                            or (before is not None and (ts, line_no) >= before)
+                            or (username is not None and record.get("username") != username)):
+                        continue
+                    row_mode, row_approved = _index_columns(record)
+                    if ((mode is not None and row_mode != mode)
+                            or (approved is not None and row_approved != approved)):
+                        continue
+                    yield ts, line_no, [_extract(record, field) for field in fields]
+
+        out = []
+        for day in reversed(self.days()):
+            if since is not None and day < since[:10]:
+                break
+            if (until is not None and day > until[:10]) or (before is not None and day > before[0][:10]):
+                continue
+            out.extend(heapq.nlargest(limit - len(out), matches(day), key=lambda m: m[:2]))
+            if len(out) >= limit:
+                break
+        return out
+
+
+BACKENDS = {
+    "sqlite": (SQLiteBackend, ".sqlite3"),
+    "jsonl": (JsonlBackend, ".jsonl"),
+}
+
+
+def open_backend(path: str, backend: str = "sqlite"):
+    """
+    Build a backend next to the legacy JSON path,
+    e.g. memory_db.json -> memory_db.sqlite3 / memory_db.jsonl.
+    """
+    try:
+        cls, ext = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown storage backend: {backend!r} (choose from {sorted(BACKENDS)})")
+    base, _ = os.path.splitext(path)
+    return cls(base + ext)
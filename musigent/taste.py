@@ -0,0 +1,182 @@
+# musigent/taste.py
+# Per-user taste profiles as small numeric vectors, cached in SQLite and
+# refreshed in the background, and the mapping from a profile to a style.
+import asyncio
+import os
+import threading
+import time
+
+import numpy as np
+
+from musigent.metrics import span
+from musigent.storage import connect
+
+# vector layout: one weight per genre (L2-normalized), then energy in [0, 1]
+GENRES = (
+    "pop", "rock", "dark_rock", "metal", "electronic", "hip_hop",
+    "jazz", "classical", "ambient", "folk", "latin", "rnb",
+)
+ENERGY = len(GENRES)
+ENERGY_WEIGHT = 0.8  # how much energy counts against genre mix in style distance
+
+# (Suno style, tempo_range, genre weights, energy)
+STYLES = (
+    ("bright pop, catchy hooks, polished", [100, 125], {"pop": 1, "rnb": 0.3}, 0.6),
+    ("classic rock, live drums, warm guitars", [100, 130], {"rock": 1, "pop": 0.2, "folk": 0.2}, 0.65),
+    ("dark rock, driving guitars, moody", [110, 140], {"dark_rock": 1, "rock": 0.6, "metal": 0.3}, 0.75),
+    ("heavy metal, distorted riffs, aggressive", [130, 170], {"metal": 1, "dark_rock": 0.5, "rock": 0.3}, 0.95),
+    ("electronic, pulsing synths, club-ready", [120, 130], {"electronic": 1, "pop": 0.3}, 0.8),
+    ("dark synthwave, analog synths, brooding", [90, 115], {"electronic": 0.8, "dark_rock": 0.6}, 0.6),
+    ("hip-hop, boom-bap drums, deep bass", [85, 100], {"hip_hop": 1, "rnb": 0.4}, 0.65),
+    ("smooth jazz, brushed drums, mellow keys", [70, 110], {"jazz": 1, "rnb": 0.3}, 0.35),
+    ("cinematic orchestral, strings, piano", [60, 90], {"classical": 1, "ambient": 0.3}, 0.4),
+    ("ambient, soft pads, no-vocals", [60, 80], {"ambient": 1, "electronic": 0.3, "classical": 0.2}, 0.15),
+    ("acoustic folk, fingerpicked guitar, warm", [80, 110], {"folk": 1, "rock": 0.2, "pop": 0.2}, 0.4),
+    ("latin, percussion-driven, upbeat", [95, 125], {"latin": 1, "pop": 0.3}, 0.75),
+    ("neo-soul r&b, smooth groove", [70, 95], {"rnb": 1, "hip_hop": 0.3, "jazz": 0.3}, 0.45),
+)
+
+
+def _vector(weights: dict, energy: float) -> np.ndarray:
+    v = np.zeros(len(GENRES) + 1, dtype=np.float32)
+    for genre, weight in weights.items():
+        if genre in GENRES:
+            v[GENRES.index(genre)] = weight
+    norm = np.linalg.norm(v[:ENERGY])
+    if norm:
+        v[:ENERGY] /= norm
+    v[ENERGY] = min(1.0, max(0.0, float(energy)))
+    return v
+
+
+def vectorize(profile: dict) -> np.ndarray:
+    """
+    Vector of a listening profile: {"genre_weights": {genre: weight}} or
+    {"favorite_genres": [...]} (earlier genres weigh more), plus "energy".
+    Unknown genres are ignored.
+    """
+    weights = dict(profile.get("genre_weights") or {})
+    if not weights:
+        for rank, genre in enumerate(profile.get("favorite_genres") or []):
+            weights[genre] = weights.get(genre, 0.0) + 1.0 / (1 + rank)
+    return _vector(weights, profile.get("energy", 0.5))
+
+
+_PROTOTYPES = np.stack([_vector(weights, energy) for _, _, weights, energy in STYLES])
+_SCALE = np.ones(len(GENRES) + 1, dtype=np.float32)
+_SCALE[ENERGY] = ENERGY_WEIGHT
+
+
+def nearest_style(vectors: np.ndarray):
+    """
+    (style, tempo_range) of the closest STYLES prototype to a profile vector,
+    or a list of them for a (users, dims) matrix.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    batch = vectors.reshape(-1, len(GENRES) + 1) * _SCALE
+    distances = (((batch[:, None, :] - _PROTOTYPES * _SCALE) ** 2).sum(axis=2))
+    picks = [(STYLES[i][0], list(STYLES[i][1])) for i in distances.argmin(axis=1)]
+    return picks if vectors.ndim == 2 else picks[0]
+
+
+def describe(vector: np.ndarray) -> dict:
+    """Readable form of a profile vector for drafts and logs."""
+    return {
+        "genres": {g: round(float(w), 3) for g, w in zip(GENRES, vector[:ENERGY]) if w > 0},
+        "energy": round(float(vector[ENERGY]), 3),
+    }
+
+
+class TasteStore:
+    """
+    username -> taste vector, shared by every worker through SQLite.
+
+    A user's profile is fetched from `source.analyze_user(username)` once;
+    after `ttl_seconds` (MUSIGENT_TASTE_TTL, default 24h) the stored vector
+    is still served while a background task fetches a new one, so only a
+    user's very first persona request waits for the source. Concurrent
+    fetches for the same user share one call.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS taste_profiles (
+        username TEXT PRIMARY KEY,
+        vector BLOB NOT NULL,
+        refreshed_at REAL NOT NULL
+    );
+    """
+
+    def __init__(self, db_path: str, source, ttl_seconds: float | None = None):
+        self.db_path = db_path
+        self.source = source
+        self.ttl_seconds = (
+            ttl_seconds if ttl_seconds is not None
+            else float(os.getenv("MUSIGENT_TASTE_TTL", str(24 * 3600)))
+        )
+        self._profiles = {}  # username -> (vector, refreshed_at)
+        self._inflight = {}  # (loop, username) -> Task
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.conn.executescript(self.SCHEMA)
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.db_path)
+        return conn
+
+    def _load(self, username: str):
+        row = self.conn.execute(
+            "SELECT vector, refreshed_at FROM taste_profiles WHERE username = ?", (username,)
+        ).fetchone()
+        if row is None:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32), row[1]
+
+    def _save(self, username: str, vector: np.ndarray, refreshed_at: float) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO taste_profiles (username, vector, refreshed_at) VALUES (?, ?, ?)",
+            (username, vector.astype(np.float32).tobytes(), refreshed_at),
+        )
+
+    async def aprofile(self, username: str) -> np.ndarray:
+        """The user's taste vector; stale ones are returned and refreshed in the background."""
+        entry = self._profiles.get(username)
+        if entry is None:
+            entry = await asyncio.to_thread(self._load, username)
+            if entry is not None:
+                self._profiles[username] = entry
+        if entry is None:
+            return await asyncio.shield(self._refresh(username))
+        vector, refreshed_at = entry
+        if time.time() - refreshed_at >= self.ttl_seconds:
+            self._refresh(username)
+        return vector
+
+    def _refresh(self, username: str) -> asyncio.Task:
+        loop = asyncio.get_running_loop()
+        key = (loop, username)
+        with self._lock:
+            task = self._inflight.get(key)
+            if task is None:
+                task = self._inflight[key] = loop.create_task(self._afetch(username))
+                task.add_done_callback(lambda t: self._done(key, t))
+        return task
+
+    def _done(self, key, task: asyncio.Task) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # background refreshes have nobody awaiting them
+
+    async def _afetch(self, username: str) -> np.ndarray:
+        # another worker may have refreshed the profile in the meantime
+        entry = await asyncio.to_thread(self._load, username)
+        if entry is None or time.time() - entry[1] >= self.ttl_seconds:
+            with span("taste.fetch"):
+                profile = await asyncio.to_thread(self.source.analyze_user, username)
+            entry = (vectorize(profile), time.time())
+            await asyncio.to_thread(self._save, username, *entry)
+        self._profiles[username] = entry
+        return entry[0]
@@ -0,0 +1,93 @@
+# musigent/testing/suno_stub.py
+# Local stand-in for the Suno API (sunoapi.org) for tests and offline runs.
+#
+#   uvicorn musigent.testing.suno_stub:app --port 9000
+#   export SUNO_BASE_URL=http://127.0.0.1:9000
+#
+# POST /api/v1/generate returns a taskId at once; the task "finishes" after
+# SUNO_STUB_DELAY seconds, then shows up in record-info and is POSTed to the
+# request's callBackUrl (unless it is the example.com placeholder).
+import asyncio
+import os
+import uuid
+import zlib
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+
+from musigent.testing.upstreams import synth_track
+
+DELAY = float(os.getenv("SUNO_STUB_DELAY", "2"))
+
+app = FastAPI(title="Suno stub")
+tasks = {}
+
+
+async def _finish(task_id: str, base_url: str, callback_url: str) -> None:
+    await asyncio.sleep(DELAY)
+    track = {
+        "id": f"{task_id}-0",
+        "audioUrl": f"{base_url}/audio/{task_id}.wav",
+        "streamAudioUrl": f"{base_url}/audio/{task_id}.wav",
+        "duration": 5.0,
+    }
+    tasks[task_id] = {"status": "SUCCESS", "tracks": [track]}
+    if callback_url and "example.com" not in callback_url:
+        body = {
+            "code": 200,
+            "msg": "All generated successfully.",
+            "data": {
+                "callbackType": "complete",
+                "task_id": task_id,
+                "data": [{
+                    "id": track["id"],
+                    "audio_url": track["audioUrl"],
+                    "stream_audio_url": track["streamAudioUrl"],
+                    "duration": track["duration"],
+                }],
+            },
+        }
+        try:
+            async with httpx.AsyncClient() as client:
+                await client.post(callback_url, json=body, timeout=5)
+        except httpx.HTTPError:
+            pass  # Suno does not retry either; the client falls back to polling
+
+
+@app.post("/api/v1/generate")
+async def generate(request: Request):
+    payload = await request.json()
+    task_id = uuid.uuid4().hex
+    tasks[task_id] = {"status": "PENDING", "tracks": []}
+    base_url = str(request.base_url).rstrip("/")
+    asyncio.get_running_loop().create_task(_finish(task_id, base_url, payload.get("callBackUrl")))
+    return {"code": 200, "msg": "success", "data": {"taskId": task_id}}
+
+
+@app.get("/api/v1/generate/credit")
+async def credit():
+    return {"code": 200, "msg": "success", "data": 10000}
+
+
+@app.get("/api/v1/generate/record-info")
+async def record_info(taskId: str):
+    task = tasks.get(taskId)
+    if task is None:
+        return {"code": 404, "msg": "task not found", "data": None}
+    return {
+        "code": 200,
+        "msg": "success",
+        "data": {
+            "taskId": taskId,
+            "status": task["status"],
+            "response": {"sunoData": task["tracks"]},
+            "errorMessage": None,
+        },
+    }
+
+
+@app.get("/audio/{task_id}.wav")
+async def audio(task_id: str):
+    # a different track per task, so originality checks see varied material
+    return Response(synth_track(5.0, seed=zlib.crc32(task_id.encode())), media_type="audio/wav")
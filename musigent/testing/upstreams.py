@@ -0,0 +1,176 @@
+# musigent/testing/upstreams.py
+# In-process stand-ins for every upstream (Suno, the audio CDN, Audd.io, Google
+# geolocation) as one httpx transport, for benchmarks and offline runs:
+#
+#   from musigent import http
+#   from musigent.testing.upstreams import FakeUpstreams
+#   http.use_transport(FakeUpstreams(latency={"suno": 0.5}).transport())
+import asyncio
+import io
+import uuid
+import wave
+import zlib
+
+import httpx
+import numpy as np
+
+AUDIO_HOST = "cdn.fake.local"
+AUDIO_RATE = 22050
+BANK_SIZE = 64  # one-second chunks that served tracks are assembled from
+
+DEFAULT_LATENCY = {"suno": 0.0, "cdn": 0.0, "audd": 0.0, "google": 0.0}
+
+
+def _chords(seconds: float, rate: int, rng) -> np.ndarray:
+    # random decaying three-note chords with harmonics, four per second
+    t = np.arange(int(seconds * rate)) / rate
+    step = (t * 4).astype(int)
+    n_steps = int(seconds * 4) + 1
+    envelope = np.exp(-3 * ((t * 4) % 1))
+    x = np.zeros_like(t)
+    for _ in range(3):
+        freq = rng.uniform(100, 1200, size=n_steps)[step]
+        phase = 2 * np.pi * np.cumsum(freq) / rate
+        gain = rng.uniform(0.3, 1.0, size=n_steps)[step]
+        for harmonic in range(1, 5):
+            x += envelope * gain * np.sin(harmonic * phase) / harmonic
+    return (x / max(np.abs(x).max(), 1e-9) * 20000).astype("<i2")
+
+
+def wav_bytes(pcm: np.ndarray, rate: int) -> bytes:
+    """Mono 16-bit WAV container around `pcm`."""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.astype("<i2").tobytes())
+    return buf.getvalue()
+
+
+def synth_track(seconds: float, rate: int = 22050, seed: int = 0) -> bytes:
+    """
+    A mono 16-bit WAV of random decaying chords, so analysis and
+    fingerprints see varied, track-specific material.
+    """
+    return wav_bytes(_chords(seconds, rate, np.random.default_rng(seed)), rate)
+
+
+class FakeUpstreams:
+    """
+    Canned upstream responses behind an httpx.MockTransport.
+
+    - Suno /api/v1/generate answers with a finished track URL, or, when
+      `callback` is set, with a taskId whose completion is delivered by
+      calling `callback(payload)` after the Suno latency (like the real
+      callback POST); record-info serves the same state for polling.
+    - The CDN serves a synthetic WAV of `track_seconds` per track id, built
+      from a bank of pre-rendered one-second chunks in a per-track order, so
+      serving costs almost nothing and tracks are not near-duplicates.
+    - Suno's credit endpoint reports `credits`, which every generation
+      reduces by `generation_cost`; with too few left, generate answers
+      code 429 like the real API.
+    - Audd.io reports "no match"; Google geolocation returns a fixed spot.
+
+    `latency` maps "suno" / "cdn" / "audd" / "google" to seconds.
+    """
+
+    def __init__(self, latency: dict | None = None, track_seconds: float = 30.0,
+                 callback=None, credits: float = 1e9, generation_cost: float = 12):
+        self.latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self.track_seconds = track_seconds
+        self.callback = callback
+        self.credits = credits
+        self.generation_cost = generation_cost
+        self.calls = {name: 0 for name in DEFAULT_LATENCY}
+        self._tasks = {}
+        self._audio = {}
+        self._pending = set()
+        rng = np.random.default_rng(0)
+        self._bank = [_chords(1.0, AUDIO_RATE, rng) for _ in range(BANK_SIZE)]
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def audio(self, track_id: str) -> bytes:
+        data = self._audio.get(track_id)
+        if data is None:
+            rng = np.random.default_rng(zlib.crc32(track_id.encode()))
+            order = rng.integers(0, BANK_SIZE, size=int(np.ceil(self.track_seconds)))
+            pcm = np.concatenate([self._bank[i] for i in order])[:int(self.track_seconds * AUDIO_RATE)]
+            data = self._audio[track_id] = wav_bytes(pcm, AUDIO_RATE)
+        return data
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        if "suno" in host:
+            kind = "suno"
+        elif "audd" in host:
+            kind = "audd"
+        elif "google" in host:
+            kind = "google"
+        else:
+            kind = "cdn"
+        self.calls[kind] += 1
+        if self.latency[kind]:
+            await asyncio.sleep(self.latency[kind])
+        return await getattr(self, f"_{kind}")(request)
+
+    def _track(self, task_id: str) -> dict:
+        url = f"https://{AUDIO_HOST}/audio/{task_id}.wav"
+        return {"id": f"{task_id}-0", "audioUrl": url, "streamAudioUrl": url,
+                "duration": self.track_seconds}
+
+    async def _suno(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/credit"):
+            return httpx.Response(200, json={"code": 200, "msg": "success", "data": self.credits})
+        if request.url.path.endswith("/generate"):
+            if self.credits < self.generation_cost:
+                return httpx.Response(200, json={"code": 429, "msg": "Insufficient credits"})
+            self.credits -= self.generation_cost
+            task_id = uuid.uuid4().hex
+            if self.callback is None:
+                return httpx.Response(200, json={"code": 200, "data": [self._track(task_id)]})
+            self._tasks[task_id] = {"status": "PENDING", "sunoData": []}
+            task = asyncio.ensure_future(self._finish(task_id))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+            return httpx.Response(200, json={"code": 200, "data": {"taskId": task_id}})
+
+        task_id = request.url.params.get("taskId")
+        state = self._tasks.get(task_id, {"status": "PENDING", "sunoData": []})
+        return httpx.Response(200, json={
+            "code": 200,
+            "data": {"taskId": task_id, "status": state["status"],
+                     "response": {"sunoData": state["sunoData"]}},
+        })
+
+    async def _finish(self, task_id: str) -> None:
+        # the generate call already slept once; this models generation time
+        await asyncio.sleep(self.latency["suno"])
+        track = self._track(task_id)
+        self._tasks[task_id] = {"status": "SUCCESS", "sunoData": [track]}
+        payload = {
+            "code": 200,
+            "msg": "All generated successfully.",
+            "data": {
+                "callbackType": "complete",
+                "task_id": task_id,
+                "data": [{"id": track["id"], "audio_url": track["audioUrl"],
+                          "stream_audio_url": track["streamAudioUrl"],
+                          "duration": track["duration"]}],
+            },
+        }
+        await asyncio.to_thread(self.callback, payload)
+
+    async def _cdn(self, request: httpx.Request) -> httpx.Response:
+        track_id = request.url.path.rsplit("/", 1)[-1].split(".")[0]
+        return httpx.Response(200, content=self.audio(track_id),
+                              headers={"Content-Type": "audio/wav"})
+
+    async def _audd(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"status": "success", "result": None})
+
+    async def _google(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"location": {"lat": 52.52, "lng": 13.405},
+                                         "accuracy": 1000})
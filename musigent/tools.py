@@ -1,5 +1,12 @@
+import asyncio
 import os
-import requests
+
+from musigent import http
+from musigent.jobs import FAILED, PENDING, SunoJobs
+from musigent.metrics import span
+from musigent.utils.aio import run_sync, spawn
+
+INSUFFICIENT_CREDITS = "<span style='color:red; font-weight:bold;'>❌ ERROR — INSUFFICIENT CREADITS.PLEASE CHARGE YOUR ACCOUNT!</span><br>"
 
 
 class SunoTool:
@@ -7,7 +14,10 @@ class SunoTool:
         self,
         api_key: str | None = None,
         model: str = "V4_5ALL",
-        callback_url: str = "https://example.com/callback",
+        callback_url: str | None = None,
+        base_url: str | None = None,
+        jobs: SunoJobs | None = None,
+        credits=None,
     ):
         """
         Real Suno API client.
@@ -15,6 +25,17 @@ class SunoTool:
         API key is taken from:
         - explicit api_key argument, OR
         - SUNO_API_KEY environment variable (e.g. Kaggle secret)
+
+        Generations run as Suno tasks: callbacks go to `callback_url`
+        (MUSIGENT_CALLBACK_URL, i.e. this app's /suno/callback route) and
+        record-info polling is the fallback. `base_url` (SUNO_BASE_URL) can
+        point at musigent.testing.suno_stub for local runs.
+
+        With a `credits` ledger (musigent.credits.CreditBudget) each
+        submission reserves its credits first and is refused locally once
+        the budget is spent; the reservation is given back when the
+        submission or its task fails, and the ledger is re-synced from Suno
+        periodically.
         """
         self.api_key = api_key or os.getenv("SUNO_API_KEY")
         if not self.api_key:
@@ -23,19 +44,71 @@ class SunoTool:
                 "Set SUNO_API_KEY env var or pass api_key=... to SunoTool()."
             )
         self.model = model
-        self.callback_url = callback_url
+        self.callback_url = callback_url or os.getenv(
+            "MUSIGENT_CALLBACK_URL", "https://example.com/callback"
+        )
+        self.base_url = (base_url or os.getenv("SUNO_BASE_URL", "https://api.sunoapi.org")).rstrip("/")
+        self.jobs = jobs or SunoJobs("memory_db.sqlite3")
+        self.credits = credits
+
+    @property
+    def _headers(self):
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
 
     def generate_music(self, prompt: str, style: str, duration_sec: int):
         """
         Generate real music via Suno API and return a URL or an error string.
         """
+        return run_sync(self.agenerate_music(prompt, style, duration_sec))
+
+    async def agenerate_music(self, prompt: str, style: str, duration_sec: int):
+        """Async variant of generate_music(): submit, then wait for the task."""
+        with span("suno.submit"):
+            submitted = await self.asubmit(prompt, style, duration_sec)
+        if "task_id" not in submitted:
+            return submitted.get("url") or submitted["error"]
+        with span("suno.wait"):
+            return await self.await_task(submitted["task_id"])
+
+    async def await_task(self, task_id: str):
+        """Wait for a submitted task and return its audio URL or an error string."""
+        job = await self.jobs.wait(task_id, self.apoll)
+        if job["status"] == FAILED:
+            if self.credits is not None:
+                stored = await asyncio.to_thread(self.jobs.get, task_id)
+                # Suno reported the failure (not just our wait timing out): nothing was generated
+                if stored and stored["status"] == FAILED:
+                    await asyncio.to_thread(self.credits.refund)
+            return f"SUNO_ERROR: task {task_id} failed: {job.get('error')}"
+        for track in job["tracks"]:
+            url = track.get("audio_url") or track.get("stream_url")
+            if url:
+                return url
+        return f"SUNO_ERROR: no URL in finished task {task_id}, raw={job}"
+
+    async def asubmit(self, prompt: str, style: str, duration_sec: int) -> dict:
+        """
+        Start one generation. Returns {"task_id": ...} for an async task,
+        {"url": ...} if the response already carries a track,
+        or {"error": ...} with the same error strings as before.
+        """
+        if self.credits is not None:
+            if await asyncio.to_thread(self.credits.stale):
+                spawn(self.arefresh_credits())
+            if not await asyncio.to_thread(self.credits.try_spend):
+                return {"error": INSUFFICIENT_CREDITS}
+        submitted = await self._asubmit(prompt, style, duration_sec)
+        if self.credits is not None and submitted.get("error") not in (None, INSUFFICIENT_CREDITS):
+            # nothing was generated: give the reservation back
+            await asyncio.to_thread(self.credits.refund)
+        return submitted
+
+    async def _asubmit(self, prompt: str, style: str, duration_sec: int) -> dict:
         safe_title = (prompt or "Brand Jingle")[:80]
 
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
-
         payload = {
             "customMode": True,
             "instrumental": True,
@@ -47,9 +120,10 @@ class SunoTool:
         }
 
         try:
-            resp = requests.post(
-                "https://api.sunoapi.org/api/v1/generate",
-                headers=headers,
+            resp = await http.request(
+                "POST",
+                f"{self.base_url}/api/v1/generate",
+                headers=self._headers,
                 json=payload,
                 timeout=30,
             )
@@ -61,12 +135,14 @@ class SunoTool:
 
             # Specific handling for insufficient credits
             if code == 429:
-                return "<span style='color:red; font-weight:bold;'>❌ ERROR — INSUFFICIENT CREADITS.PLEASE CHARGE YOUR ACCOUNT!</span><br>"
+                if self.credits is not None:
+                    await asyncio.to_thread(self.credits.sync, 0)
+                return {"error": INSUFFICIENT_CREDITS}
 
             # Generic non-200 handling
             if code != 200:
                 msg = data.get("msg") if isinstance(data, dict) else str(data)
-                return f"SUNO_ERROR: code={code} msg={msg}"
+                return {"error": f"SUNO_ERROR: code={code} msg={msg}"}
 
             # Extract tracks
             if isinstance(data, dict):
@@ -74,6 +150,12 @@ class SunoTool:
             else:
                 tracks = data
 
+            # Task-based API: {"data": {"taskId": "..."}}
+            if isinstance(tracks, dict) and tracks.get("taskId"):
+                task_id = tracks["taskId"]
+                await asyncio.to_thread(self.jobs.create, task_id)
+                return {"task_id": task_id}
+
             if isinstance(tracks, dict):
                 # e.g. {"0": {...}, "1": {...}}
                 tracks = list(tracks.values())
@@ -83,18 +165,44 @@ class SunoTool:
                 tracks = [tracks]
 
             if not tracks:
-                return f"SUNO_ERROR: no tracks returned, raw={data}"
+                return {"error": f"SUNO_ERROR: no tracks returned, raw={data}"}
 
             first = tracks[0] or {}
             url = first.get("streamUrl") or first.get("audioUrl")
             if not url:
-                return f"SUNO_ERROR: no URL in first track, raw={first}"
+                return {"error": f"SUNO_ERROR: no URL in first track, raw={first}"}
 
-            return url
+            return {"url": url}
 
- 
         except Exception as e:
-            return f"SUNO_EXCEPTION: {type(e).__name__}: {e}"
+            return {"error": f"SUNO_EXCEPTION: {type(e).__name__}: {e}"}
+
+    async def arefresh_credits(self) -> None:
+        """Refresh the credit ledger from Suno's remaining-credits endpoint."""
+        try:
+            resp = await http.request(
+                "GET", f"{self.base_url}/api/v1/generate/credit", headers=self._headers, timeout=15
+            )
+            resp.raise_for_status()
+            data = resp.json()
+        except Exception:
+            return  # keep the local estimate; retried on a later submission
+        if isinstance(data, dict) and data.get("code", 200) == 200 and isinstance(data.get("data"), (int, float)):
+            await asyncio.to_thread(self.credits.sync, data["data"])
+
+    async def apoll(self, task_id: str):
+        """Ask record-info for a task's state: (status, tracks, error)."""
+        resp = await http.request(
+            "GET",
+            f"{self.base_url}/api/v1/generate/record-info",
+            params={"taskId": task_id},
+            headers=self._headers,
+            timeout=15,
+        )
+        resp.raise_for_status()
+        data = resp.json().get("data") or {}
+        tracks = (data.get("response") or {}).get("sunoData") or []
+        return data.get("status", PENDING), tracks, data.get("errorMessage")
 
 
 class SpotifyTool:
@@ -0,0 +1,52 @@
+# musigent/utils/aio.py
+# Bridge between the sync API and the async pipeline.
+import asyncio
+import threading
+
+_loop = None
+_lock = threading.Lock()
+_tasks = set()  # strong refs so spawned tasks are not garbage-collected
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever, name="musigent-loop", daemon=True
+            ).start()
+    return _loop
+
+
+def run_sync(coro):
+    """
+    Run a coroutine to completion from synchronous code.
+
+    All sync calls share one long-lived background loop, so pooled HTTP
+    connections survive between calls and this also works inside Jupyter,
+    where the notebook already has a running loop.
+    """
+    loop = _background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync() called on the Musigent loop; await the async variant instead.")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+def spawn(coro):
+    """
+    Fire-and-forget a coroutine: on the running loop if there is one,
+    otherwise on the shared background loop.
+    """
+    try:
+        task = asyncio.get_running_loop().create_task(coro)
+    except RuntimeError:
+        return asyncio.run_coroutine_threadsafe(coro, _background_loop())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
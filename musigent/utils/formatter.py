@@ -1,4 +1,7 @@
-import pandas as pd
+# pandas is imported inside the functions that need it, so the API path
+# (which only returns JSON) never pays for it.
+from collections.abc import Mapping
+
 
 def flatten_dict(d, parent_key='', sep=' → '):
     """
@@ -15,12 +18,22 @@ def flatten_dict(d, parent_key='', sep=' → '):
     return dict(items)
 
 
+def result_to_records(result_dict):
+    """
+    Flat [{"Field": ..., "Value": ...}] rows of a result – the same content
+    as result_to_dataframe(), without pandas.
+    """
+    return [{"Field": k, "Value": v} for k, v in flatten_dict(result_dict).items()]
+
+
 def result_to_dataframe(result_dict):
     """
     Converts a full Musigent result (plan, draft, evaluation, time)
     into a Pandas Styler for Kaggle/Colab display.
     Forces left-to-right direction and left alignment.
     """
+    import pandas as pd
+
     flat = flatten_dict(result_dict)
     df = pd.DataFrame(flat.items(), columns=["Field", "Value"])
 
@@ -35,14 +48,67 @@ def result_to_dataframe(result_dict):
     return styler
 
 
+def result_to_html(result_dict):
+    """HTML table of a result (renders the Styler from result_to_dataframe)."""
+    return result_to_dataframe(result_dict).to_html()
+
+
+class _LazySections(Mapping):
+    """Section name -> DataFrame, built on first access."""
+
+    def __init__(self, result_dict):
+        self._source = {
+            key.upper(): value
+            for key, value in result_dict.items()
+            if isinstance(value, dict)
+        }
+        self._built = {}
+
+    def __getitem__(self, key):
+        if key not in self._built:
+            import pandas as pd
+
+            self._built[key] = pd.DataFrame(self._source[key].items(), columns=["Key", "Value"])
+        return self._built[key]
+
+    def __iter__(self):
+        return iter(self._source)
+
+    def __len__(self):
+        return len(self._source)
+
+
 def result_to_sections(result_dict):
     """
     Returns a dictionary of dataframes, one per section,
     ideal if you want separate tables (Plan, Draft, Evaluation).
+    Each dataframe is only built when its section is accessed.
+    """
+    return _LazySections(result_dict)
+
+
+class MusigentResult(dict):
     """
-    sections = {}
-    for key, value in result_dict.items():
-        if isinstance(value, dict):
-            df = pd.DataFrame(value.items(), columns=["Key", "Value"])
-            sections[key.upper()] = df
-    return sections
+    A result is a plain dict (plan, draft, evaluation, ...), so it serializes
+    as JSON unchanged. Table views are rendered only when asked for:
+    `.table` (Styler), `.to_html()`, `.to_records()`, `.sections()`.
+    `result["table"]` still works for older notebook code.
+    """
+
+    @property
+    def table(self):
+        return result_to_dataframe(self)
+
+    def to_html(self):
+        return result_to_html(self)
+
+    def to_records(self):
+        return result_to_records(self)
+
+    def sections(self):
+        return result_to_sections(self)
+
+    def __missing__(self, key):
+        if key == "table":
+            return self.table
+        raise KeyError(key)
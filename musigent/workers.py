@@ -0,0 +1,218 @@
+# musigent/workers.py
+# Process pool for CPU-bound audio work (ffmpeg decode + feature analysis).
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+
+class AudioWorkerTimeout(TimeoutError):
+    """Raised when one analysis task exceeds the pool's task timeout."""
+
+
+# -------------------------------------------------------------------------
+# WORKER SIDE (runs in the child processes)
+# -------------------------------------------------------------------------
+def _attach(name: str):
+    # workers share the parent's resource tracker, which unlinks the segment
+    # if the parent dies; the parent unlinks it after every task otherwise
+    return shared_memory.SharedMemory(name=name)
+
+
+def _analyze_encoded(name: str, size: int):
+    """Decode an encoded file held in shared memory; (features, fingerprint)."""
+    from musigent.analysis import analyze_track, decode_audio
+
+    shm = _attach(name)
+    try:
+        buf = shm.buf[:size]
+        try:
+            pcm, frame_rate, _ = decode_audio(buf)
+        finally:
+            buf.release()
+        return analyze_track(pcm, frame_rate)
+    finally:
+        shm.close()
+
+
+def _analyze_shared_pcm(name: str, shape: tuple, dtype: str, frame_rate: int):
+    """Analyze already-decoded samples held in shared memory (zero-copy view)."""
+    import numpy as np
+    from musigent.analysis import analyze_track
+
+    shm = _attach(name)
+    try:
+        pcm = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        try:
+            return analyze_track(pcm, frame_rate)
+        finally:
+            del pcm  # drop the view before closing the mapping
+    finally:
+        shm.close()
+
+
+# -------------------------------------------------------------------------
+# PARENT SIDE
+# -------------------------------------------------------------------------
+class AudioWorkerPool:
+    """
+    Runs decode + analysis in worker processes so evaluations use every core
+    and never hold the GIL of the serving process.
+
+    Inputs are copied once into a shared-memory segment and workers map it
+    instead of receiving a pickled copy. Each task has a timeout: a task
+    that hangs fails alone and is left to finish in its worker. Once half the
+    workers are stuck like that, or a worker dies, new tasks go to a fresh
+    pool and the old one is killed as soon as its other tasks are done.
+
+    MUSIGENT_AUDIO_WORKERS=0 disables the pool (`enabled` is False) and the
+    caller falls back to a thread.
+    """
+
+    def __init__(self, max_workers: int | None = None, task_timeout: float | None = None):
+        if max_workers is None:
+            max_workers = int(os.getenv(
+                "MUSIGENT_AUDIO_WORKERS", str(min(4, os.cpu_count() or 1))
+            ))
+        if task_timeout is None:
+            task_timeout = float(os.getenv("MUSIGENT_AUDIO_TASK_TIMEOUT", "60"))
+        self.max_workers = max(0, max_workers)
+        self.task_timeout = task_timeout
+        # stuck tasks a pool may hold before it is replaced
+        self.max_hung = max(1, self.max_workers // 2)
+        self._executor = None
+        self._running = {}  # executor -> futures not done yet
+        self._hung = {}  # executor -> futures that timed out
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_workers > 0
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._executor is None:
+                # "spawn" avoids forking a process that runs threads + an event loop
+                ctx = multiprocessing.get_context(os.getenv("MUSIGENT_MP_START", "spawn"))
+                self._executor = ProcessPoolExecutor(self.max_workers, mp_context=ctx)
+                self._running[self._executor] = set()
+                self._hung[self._executor] = set()
+            executor = self._executor
+            try:
+                future = executor.submit(fn, *args)
+            except BrokenProcessPool:
+                broken = True
+            else:
+                broken = False
+                self._running[executor].add(future)
+        if broken:
+            self._retire(executor)
+            raise BrokenProcessPool("audio worker pool is broken")
+        future.add_done_callback(lambda f: self._done(executor, f))
+        return executor, future
+
+    def _done(self, executor, future) -> None:
+        with self._lock:
+            self._running.get(executor, set()).discard(future)
+            self._hung.get(executor, set()).discard(future)
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            # a worker died, possibly one running an abandoned task nobody awaits
+            self._retire(executor)
+        else:
+            self._reap(executor)
+
+    def _abandon(self, executor, future) -> None:
+        """Give up on a timed-out task; replace the pool once too many of its workers are stuck."""
+        if future.cancel():
+            return  # never started: nothing is stuck
+        with self._lock:
+            hung = self._hung.get(executor)
+            if hung is None or future.done():
+                return
+            hung.add(future)
+            if len(hung) >= self.max_hung and self._executor is executor:
+                self._executor = None
+        self._reap(executor)
+
+    def _retire(self, executor) -> None:
+        """Send new tasks to a fresh pool (e.g. after a worker crashed)."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        self._reap(executor)
+
+    def _reap(self, executor) -> None:
+        # a retired pool is killed once only its stuck tasks remain
+        with self._lock:
+            if executor is self._executor or executor not in self._running:
+                return
+            if self._running[executor] - self._hung[executor]:
+                return
+            del self._running[executor], self._hung[executor]
+        for proc in list((getattr(executor, "_processes", None) or {}).values()):
+            proc.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            retired = [e for e in self._running if e is not executor]
+        for old in retired:
+            self._reap(old)
+        if executor is not None:
+            with self._lock:
+                self._running.pop(executor, None)
+                hung = self._hung.pop(executor, None)
+            if hung:  # waiting for a stuck task could take forever
+                for proc in list((getattr(executor, "_processes", None) or {}).values()):
+                    proc.kill()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    async def _run(self, fn, *args):
+        for attempt in range(2):
+            executor = None
+            try:
+                executor, future = self._submit(fn, *args)
+                waiter = asyncio.wrap_future(future)
+                return await asyncio.wait_for(asyncio.shield(waiter), self.task_timeout)
+            except asyncio.TimeoutError:
+                # nobody awaits the abandoned task any more; don't log its outcome
+                waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+                self._abandon(executor, future)
+                raise AudioWorkerTimeout(
+                    f"audio analysis exceeded {self.task_timeout:g}s"
+                ) from None
+            except BrokenProcessPool:
+                # a worker crashed (e.g. ffmpeg/numpy segfault): _submit / _done
+                # already sent new tasks to a fresh pool; retry once
+                if executor is not None:
+                    self._retire(executor)
+                if attempt:
+                    raise
+
+    async def _run_shared(self, source, fn, *args):
+        """Copy `source` (bytes-like) into a fresh segment and run fn(name, ...)."""
+        size = memoryview(source).nbytes
+        shm = shared_memory.SharedMemory(create=True, size=max(1, size))
+        try:
+            shm.buf[:size] = memoryview(source).cast("B")
+            return await self._run(fn, shm.name, *args)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    async def analyze_bytes(self, data):
+        """Decode + analyze an encoded file (mp3/wav/...); (features, fingerprint)."""
+        return await self._run_shared(data, _analyze_encoded, memoryview(data).nbytes)
+
+    async def analyze_pcm(self, pcm, frame_rate: int):
+        """Analyze decoded (frames, channels) samples; (features, fingerprint)."""
+        import numpy as np
+
+        pcm = np.ascontiguousarray(pcm)
+        return await self._run_shared(
+            pcm, _analyze_shared_pcm, pcm.shape, pcm.dtype.str, frame_rate
+        )
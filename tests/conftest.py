@@ -0,0 +1,43 @@
+# tests/conftest.py
+# Every test runs in its own directory (the runner keeps its stores next to
+# memory_db.json) with upstream HTTP routed to in-process fakes.
+import os
+
+import pytest
+
+os.environ.setdefault("SUNO_API_KEY", "test-suno-key")
+os.environ.setdefault("AUDD_API_KEY", "test-audd-key")
+os.environ.setdefault("MUSIGENT_AUDIO_WORKERS", "0")  # analysis in a thread, no process pool
+os.environ.setdefault("MUSIGENT_HTTP_BACKOFF", "0")
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def upstreams():
+    """FakeUpstreams (musigent.testing.upstreams) serving all upstream traffic."""
+    from musigent import http
+    from musigent.testing.upstreams import FakeUpstreams
+
+    fake = FakeUpstreams(track_seconds=3)
+    http.use_transport(fake.transport())
+    yield fake
+    http.use_transport(None)
+
+
+@pytest.fixture
+def api(workdir):
+    """(app module, TestClient) with a fresh runner whose stores live in workdir."""
+    import importlib
+
+    from fastapi.testclient import TestClient
+
+    import app
+
+    module = importlib.reload(app)
+    with TestClient(module.app) as client:
+        yield module, client
@@ -0,0 +1,69 @@
+# tests/test_audio.py
+import asyncio
+
+import pytest
+
+from musigent.audio import AudioCache, AudioTooLarge
+from musigent.audio_store import AudioStore
+
+URL = "https://cdn.fake.local/audio/track-1.wav"
+
+
+def test_concurrent_gets_share_one_streamed_download(upstreams):
+    cache = AudioCache()
+
+    async def run():
+        return await asyncio.gather(*(cache.aget(URL) for _ in range(4)))
+
+    assets = asyncio.run(run())
+    assert upstreams.calls["cdn"] == 1
+    assert all(a is assets[0] for a in assets)
+    assert assets[0].data == upstreams.audio("track-1")
+    assert asyncio.run(cache.aget(URL)) is assets[0]
+    assert upstreams.calls["cdn"] == 1
+
+
+def test_same_content_under_two_urls_is_kept_once(upstreams):
+    cache = AudioCache()
+    a = asyncio.run(cache.aget(URL))
+    b = asyncio.run(cache.aget(URL + "?download=1"))
+    assert a is b
+
+
+def test_oversized_track_is_abandoned(upstreams):
+    cache = AudioCache(max_track_bytes=1024)
+    with pytest.raises(AudioTooLarge):
+        asyncio.run(cache.aget(URL))
+    assert not cache.cached(URL)
+
+    async def drain():
+        return [chunk async for chunk in cache.astream(URL)]
+
+    with pytest.raises(AudioTooLarge):
+        asyncio.run(drain())
+
+
+def test_lru_evicts_by_entries(upstreams):
+    cache = AudioCache(max_entries=2)
+    for i in range(3):
+        asyncio.run(cache.aget(f"https://cdn.fake.local/audio/track-{i}.wav"))
+    assert not cache.cached("https://cdn.fake.local/audio/track-0.wav")
+    assert cache.cached("https://cdn.fake.local/audio/track-2.wav")
+
+
+def test_stored_tracks_are_read_from_disk(upstreams, workdir):
+    store = AudioStore(str(workdir / "a.sqlite3"), str(workdir / "audio"))
+    store.put(upstreams.audio("track-1"), URL)
+    cache = AudioCache(store=store)
+    assert asyncio.run(cache.aget(URL)).data == upstreams.audio("track-1")
+    assert upstreams.calls["cdn"] == 0
+
+
+def test_quality_analysis_decodes_in_process(upstreams):
+    from musigent.agents.quality import QualityAgent
+
+    agent = QualityAgent(None)
+    features, prints = asyncio.run(agent._aanalyze(URL))
+    assert 0 <= features["originality_score"] <= 1
+    assert prints is not None
+    assert upstreams.calls["cdn"] == 1
@@ -0,0 +1,88 @@
+# tests/test_audio_store.py
+import pytest
+
+from musigent.audio_store import AudioStore, parse_range, sniff
+
+WAV = b"RIFF" + bytes(range(256)) * 4
+
+
+@pytest.fixture
+def store(workdir):
+    return AudioStore(str(workdir / "s.sqlite3"), str(workdir / "audio"), max_open=2)
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-9", (0, 9)),
+    ("bytes=10-", (10, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=-500", (0, 99)),
+    ("bytes=90-500", (90, 99)),
+    ("bytes=0-1,5-6", None),  # several ranges: whole file
+    ("items=0-9", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=20-10", "bytes=-0"])
+def test_unsatisfiable_range(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 100)
+
+
+def test_sniff():
+    assert sniff(WAV) == ("audio/wav", ".wav")
+    assert sniff(b"ID3\x04rest") == ("audio/mpeg", ".mp3")
+    assert sniff(b"\xff\xfbframe") == ("audio/mpeg", ".mp3")
+    assert sniff(b"\x00\x00\x00\x20ftypM4A ") == ("audio/mp4", ".m4a")
+    assert sniff(b"hello") == ("application/octet-stream", ".bin")
+
+
+def test_same_content_is_stored_once(store):
+    first = store.put(WAV, "https://cdn.example/a.wav")
+    second = store.put(WAV, "https://cdn.example/b.wav")
+    assert first == second
+    assert first["size"] == len(WAV) and first["content_type"] == "audio/wav"
+    assert first["source_url"] == "https://cdn.example/a.wav"
+    assert store.by_url("https://cdn.example/b.wav")["sha256"] == first["sha256"]
+    assert store.read(first) == WAV
+
+
+def test_open_maps_files_and_bounds_the_lru(store):
+    tracks = [store.put(WAV + bytes([i])) for i in range(3)]
+    view, track = store.open(tracks[0]["sha256"])
+    assert view[:] == WAV + b"\x00" and track == tracks[0]
+    for track in tracks[1:]:
+        store.open(track["sha256"])
+    assert list(store._maps) == [t["sha256"] for t in tracks[1:]]
+
+
+def test_unknown_or_malformed_hash(store):
+    with pytest.raises(ValueError):
+        store.put(b"")
+    assert store.get("../etc/passwd") is None
+    assert store.open("0" * 64) is None
+
+
+def test_audio_route_serves_ranges(api):
+    module, client = api
+    sha = module.runner.audio_store.put(WAV)["sha256"]
+
+    whole = client.get(f"/audio/{sha}")
+    assert whole.status_code == 200 and whole.content == WAV
+    assert whole.headers["content-type"] == "audio/wav"
+    assert whole.headers["etag"] == f'"{sha}"'
+
+    part = client.get(f"/audio/{sha}", headers={"Range": "bytes=4-7"})
+    assert part.status_code == 206 and part.content == WAV[4:8]
+    assert part.headers["content-range"] == f"bytes 4-7/{len(WAV)}"
+
+    bad = client.get(f"/audio/{sha}", headers={"Range": f"bytes={len(WAV)}-"})
+    assert bad.status_code == 416
+    assert bad.headers["content-range"] == f"bytes */{len(WAV)}"
+
+    assert client.get(f"/audio/{sha}", headers={"If-None-Match": f'"{sha}"'}).status_code == 304
+    head = client.head(f"/audio/{sha}")
+    assert head.status_code == 200 and head.headers["content-length"] == str(len(WAV))
+    assert client.get("/audio/" + "0" * 64).status_code == 404
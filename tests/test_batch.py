@@ -0,0 +1,48 @@
+# tests/test_batch.py
+import asyncio
+
+import pytest
+
+from musigent.agents.jingle import JingleInput
+from musigent.runner import MusigentRunner
+from musigent.storage import utc_now_iso
+
+ITEM = {"brand_name": "Acme", "company_field": "tools", "customer_persona": "diy"}
+
+
+@pytest.mark.parametrize("body", [
+    {"items": []},
+    {"items": [ITEM] * 51},
+    {"items": [ITEM], "concurrency": 0},
+    {"items": [ITEM], "concurrency": 17},
+])
+def test_batch_request_bounds(api, body):
+    _, client = api
+    assert client.post("/jingle/batch", json=body).status_code == 422
+
+
+def test_batch_runs_at_most_concurrency_items_at_once(workdir, monkeypatch):
+    runner = MusigentRunner()
+    active = peak = 0
+
+    async def generate(plan, username, use_cache):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        record = {"timestamp_utc": utc_now_iso(), "username": username, "plan": plan,
+                  "draft": {}, "evaluation": {}, "time_info": None}
+        return {"plan": plan}, record
+
+    monkeypatch.setattr(runner, "_agenerate_result", generate)
+
+    async def run():
+        inputs = [JingleInput(brand_name=f"B{i}", company_field="f", customer_persona="p", vibe="standard")
+                  for i in range(4)]
+        return [item async for item in runner.ahandle_jingle_batch(inputs, "alice", concurrency=2)]
+
+    items = asyncio.run(run())
+    assert sorted(item["index"] for item in items) == list(range(4))
+    assert peak == 2
+    assert runner.quota.used("alice") == 4
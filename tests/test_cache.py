@@ -0,0 +1,126 @@
+# tests/test_cache.py
+import asyncio
+
+import pytest
+
+from musigent.cache import GenerationCache, is_cacheable, plan_key
+
+
+def generation(url="https://cdn.example/a.wav", approved=True):
+    return {"draft": {"audio_url": url}, "evaluation": {"approved": approved}}
+
+
+def test_plan_key_ignores_fields_that_do_not_change_the_generation():
+    plan = {"mode": "bgm", "prompt": "rain", "style": "ambient", "tempo_range": [60, 80],
+            "duration_sec": 30}
+    assert plan_key(plan) == plan_key({**plan, "note": "ignored"})
+    assert plan_key(plan) != plan_key({**plan, "prompt": "snow"})
+
+
+def test_only_approved_tracks_are_cacheable():
+    assert is_cacheable(generation())
+    assert not is_cacheable(generation(approved=False))
+    assert not is_cacheable(generation(url="SUNO_ERROR: boom"))
+
+
+def test_hit_miss_and_coalesced():
+    cache = GenerationCache()
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return generation()
+
+    async def run():
+        first = await asyncio.gather(*(cache.get_or_create("k", factory) for _ in range(3)))
+        second = await cache.get_or_create("k", factory)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert calls == 1
+    assert sorted(status for _, status in first) == ["coalesced", "coalesced", "miss"]
+    assert second[1] == "hit"
+
+
+def test_failed_factory_fails_waiters_and_is_not_cached():
+    cache = GenerationCache()
+
+    async def factory():
+        await asyncio.sleep(0.02)
+        raise RuntimeError("suno down")
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_create("k", factory) for _ in range(2)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert cache.get("k") is None
+
+
+def test_cancelled_owner_hands_over_to_a_waiter():
+    cache = GenerationCache()
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return generation()
+
+    async def run():
+        owner = asyncio.create_task(cache.get_or_create("k", factory))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get_or_create("k", factory))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        return await asyncio.wait_for(waiter, 1)
+
+    value, status = asyncio.run(run())
+    assert value == generation()
+    assert status == "miss"  # the waiter ran the factory itself
+    assert calls == 2
+
+
+def test_cancelled_waiter_does_not_affect_the_owner():
+    cache = GenerationCache()
+
+    async def factory():
+        await asyncio.sleep(0.05)
+        return generation()
+
+    async def run():
+        owner = asyncio.create_task(cache.get_or_create("k", factory))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get_or_create("k", factory))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        return await owner
+
+    assert asyncio.run(run()) == (generation(), "miss")
+
+
+def test_entries_expire_and_the_least_recently_used_is_evicted(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("musigent.cache.time.monotonic", lambda: clock[0])
+    cache = GenerationCache(ttl_seconds=10, max_entries=2)
+    cache.put("a", generation("a"))
+    cache.put("b", generation("b"))
+    assert cache.get("a") is not None  # "b" is now the least recently used
+    cache.put("c", generation("c"))
+    assert cache.get("b") is None
+    assert cache.get("a")["draft"]["audio_url"] == "a"
+
+    clock[0] += 10
+    assert cache.get("a") is None and cache.get("c") is None
+
+
+def test_hits_are_copies():
+    cache = GenerationCache()
+    cache.put("a", generation())
+    cache.get("a")["draft"]["audio_url"] = "changed"
+    assert cache.get("a")["draft"]["audio_url"] == "https://cdn.example/a.wav"
@@ -0,0 +1,79 @@
+# tests/test_candidates.py
+import asyncio
+
+import pytest
+
+from musigent.candidates import first_approved
+
+
+def scripted(*steps):
+    """generate() whose n-th call sleeps, then returns or raises the n-th step."""
+    steps = list(steps)
+    cancelled = []
+
+    async def generate():
+        delay, outcome = steps.pop(0)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(outcome)
+            raise
+        if isinstance(outcome, Exception):
+            raise outcome
+        approved, safety, originality = outcome
+        return {"draft": {}, "evaluation": {
+            "approved": approved,
+            "originality_score": originality,
+            "copyright_safety": {"copyright_safety_score": safety},
+        }}
+
+    return generate, cancelled
+
+
+def test_first_approved_wins_and_the_rest_are_cancelled():
+    generate, cancelled = scripted(
+        (0.2, (False, 90, 90)), (0.01, (True, 50, 50)), (0.5, (True, 99, 99)),
+    )
+    result = asyncio.run(first_approved(generate, candidates=3))
+    assert result["evaluation"]["candidates"] == {
+        "launched": 3, "evaluated": 1, "cancelled": 2, "selected": 1, "stopped": "approved",
+    }
+    assert len(cancelled) == 2
+
+
+def test_rejected_candidates_are_replaced_while_credits_last():
+    generate, _ = scripted(
+        (0, (False, 40, 90)), (0, (False, 80, 10)), (0, (False, 80, 20)),
+    )
+    result = asyncio.run(first_approved(generate, candidates=1, max_credits=3))
+    # nothing approved: safest copyright first, then most original
+    assert result["evaluation"]["originality_score"] == 20
+    assert result["evaluation"]["candidates"] == {
+        "launched": 3, "evaluated": 3, "cancelled": 0, "selected": 2, "stopped": "credits",
+    }
+
+
+def test_time_budget_returns_the_best_finished_candidate():
+    generate, cancelled = scripted((0, (False, 70, 70)), (5, (True, 99, 99)))
+    result = asyncio.run(first_approved(generate, candidates=2, time_budget=0.1))
+    assert result["evaluation"]["candidates"]["stopped"] == "time"
+    assert result["evaluation"]["candidates"]["selected"] == 0
+    assert len(cancelled) == 1
+
+
+def test_time_budget_without_any_result_times_out():
+    generate, _ = scripted((5, (True, 99, 99)))
+    with pytest.raises(TimeoutError):
+        asyncio.run(first_approved(generate, candidates=1, time_budget=0.05))
+
+
+def test_failed_candidates_are_replaced():
+    generate, _ = scripted((0, RuntimeError("suno down")), (0, (True, 60, 60)))
+    result = asyncio.run(first_approved(generate, candidates=1, max_credits=2))
+    assert result["evaluation"]["candidates"]["selected"] == 1
+
+
+def test_all_failed_raises_the_first_error():
+    generate, _ = scripted((0, RuntimeError("first")), (0.05, RuntimeError("second")))
+    with pytest.raises(RuntimeError, match="first"):
+        asyncio.run(first_approved(generate, candidates=2))
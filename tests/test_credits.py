@@ -0,0 +1,49 @@
+# tests/test_credits.py
+import threading
+
+from musigent.credits import CreditBudget
+
+
+def test_spend_until_the_balance_runs_out(workdir):
+    credits = CreditBudget(str(workdir / "c.sqlite3"), cost=10, initial=25)
+    assert credits.try_spend() and credits.try_spend()
+    assert not credits.try_spend()
+    credits.refund()
+    status = credits.status()
+    assert status["remaining"] == 15 and status["spent"] == 10
+    assert status["generations_left"] == 1
+
+
+def test_unknown_balance_only_counts_spending(workdir):
+    credits = CreditBudget(str(workdir / "c.sqlite3"), cost=10)
+    assert all(credits.try_spend() for _ in range(5))
+    status = credits.status()
+    assert status["remaining"] is None and status["spent"] == 50
+    assert status["generations_left"] is None
+
+
+def test_sync_replaces_the_balance(workdir):
+    credits = CreditBudget(str(workdir / "c.sqlite3"), cost=10, refresh_seconds=300)
+    assert credits.stale()
+    credits.sync(12)
+    assert not credits.stale()
+    assert credits.try_spend()
+    assert not credits.try_spend()
+
+
+def test_workers_share_one_balance(workdir):
+    path = str(workdir / "c.sqlite3")
+    workers = [CreditBudget(path, cost=1, initial=20) for _ in range(4)]
+    granted = []
+
+    def spend(credits):
+        for _ in range(10):
+            granted.append(credits.try_spend())
+
+    threads = [threading.Thread(target=spend, args=(c,)) for c in workers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert granted.count(True) == 20
+    assert workers[0].status()["remaining"] == 0
@@ -0,0 +1,113 @@
+# tests/test_events.py
+import asyncio
+import json
+
+import pytest
+
+from musigent.events import emit, muted, stream
+
+
+async def collect(events):
+    return [item async for item in events]
+
+
+def test_stream_yields_stages_as_they_are_emitted_then_the_result():
+    async def pipeline():
+        emit("plan", {"mode": "bgm"})
+        await asyncio.sleep(0)
+        emit("draft", {"audio_url": "u"})
+        emit("draft", {"audio_url": "again"})  # one event per stage
+        with muted():
+            emit("originality", {})
+        return {"ok": True}
+
+    events = asyncio.run(collect(stream(pipeline())))
+    assert events == [("plan", {"mode": "bgm"}), ("draft", {"audio_url": "u"}), ("result", {"ok": True})]
+
+
+def test_events_are_snapshots():
+    async def pipeline():
+        draft = {"audio_url": "u"}
+        emit("draft", draft)
+        draft["later"] = 1
+        return draft
+
+    events = asyncio.run(collect(stream(pipeline())))
+    assert events[0] == ("draft", {"audio_url": "u"})
+
+
+def test_emit_without_a_stream_is_a_no_op():
+    emit("plan", {})
+
+
+def test_pipeline_errors_are_raised_after_earlier_events():
+    async def pipeline():
+        emit("plan", {})
+        raise RuntimeError("suno down")
+
+    async def main():
+        seen = []
+        with pytest.raises(RuntimeError):
+            async for event, _ in stream(pipeline()):
+                seen.append(event)
+        return seen
+
+    assert asyncio.run(main()) == ["plan"]
+
+
+def test_closing_the_stream_cancels_the_pipeline():
+    cancelled = asyncio.Event()
+
+    async def pipeline():
+        emit("plan", {})
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def main():
+        events = stream(pipeline())
+        assert (await events.__anext__())[0] == "plan"
+        await events.aclose()
+        return cancelled.is_set()
+
+    assert asyncio.run(main())
+
+
+def _sse(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        name, data = block.split("\n")
+        events.append((name.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def test_generate_streams_stage_events(api, upstreams):
+    _, client = api
+    resp = client.post("/generate", json={"mode": "bgm", "prompt": "calm piano", "stream": "sse"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = _sse(resp.text)
+    assert [name for name, _ in events] == ["plan", "draft", "originality", "copyright", "result"]
+    assert events[1][1]["audio_url"] == events[-1][1]["draft"]["audio_url"]
+
+
+def test_jingle_streams_ndjson(api, upstreams):
+    _, client = api
+    resp = client.post("/jingle", json={
+        "brand_name": "Acme", "company_field": "tools", "customer_persona": "diy", "stream": "ndjson",
+    })
+    assert resp.status_code == 200
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [line["event"] for line in lines] == ["plan", "draft", "originality", "copyright", "result"]
+
+
+def test_streamed_request_that_is_not_admitted_gets_a_503(api):
+    module, client = api
+    scheduler = module.runner.scheduler
+    scheduler.max_queue = 0
+    scheduler._active = scheduler.max_active
+    resp = client.post("/generate", json={"mode": "bgm", "prompt": "calm piano", "stream": "sse"})
+    assert resp.status_code == 503
+    assert int(resp.headers["Retry-After"]) >= 1
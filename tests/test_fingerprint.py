@@ -0,0 +1,56 @@
+# tests/test_fingerprint.py
+import numpy as np
+import pytest
+
+from musigent.fingerprint import HOP_SECONDS, FingerprintIndex, fingerprint
+from musigent.testing.upstreams import AUDIO_RATE, _chords
+
+
+def track(seed: int, seconds: float = 6.0) -> np.ndarray:
+    return _chords(seconds, AUDIO_RATE, np.random.default_rng(seed))
+
+
+@pytest.fixture
+def index(workdir):
+    return FingerprintIndex(str(workdir / "fp.sqlite3"))
+
+
+def test_too_short_input_has_no_hashes():
+    hashes, offsets = fingerprint(np.zeros(100, dtype=np.int16), AUDIO_RATE)
+    assert len(hashes) == len(offsets) == 0
+
+
+def test_hashes_survive_gain_and_resampling():
+    pcm = track(1)
+    hashes, _ = fingerprint(pcm, AUDIO_RATE)
+    quieter, _ = fingerprint((pcm * 0.5).astype(np.int16), AUDIO_RATE)
+    upsampled, _ = fingerprint(np.repeat(pcm, 2), AUDIO_RATE * 2)
+    assert len(hashes) > 100
+    assert len(np.intersect1d(hashes, quieter)) / len(np.unique(hashes)) > 0.8
+    assert len(np.intersect1d(hashes, upsampled)) / len(np.unique(hashes)) > 0.25
+
+
+def test_lookup_finds_an_excerpt_of_an_indexed_track(index):
+    pcm = track(1)
+    index.add("a" * 64, "https://cdn.example/a.wav", fingerprint(pcm, AUDIO_RATE), {"safe": True})
+    index.add("b" * 64, "https://cdn.example/b.wav", fingerprint(track(2), AUDIO_RATE), {"safe": False})
+
+    start = round(64 * HOP_SECONDS * AUDIO_RATE)  # cut on the hop grid, about 2s in
+    excerpt = pcm[start:start + 3 * AUDIO_RATE]
+    match = index.lookup(fingerprint(excerpt, AUDIO_RATE))
+    assert match["sha256"] == "a" * 64 and match["verdict"] == {"safe": True}
+    assert match["similarity"] >= index.min_similarity
+
+
+def test_unrelated_track_does_not_match(index):
+    index.add("a" * 64, None, fingerprint(track(1), AUDIO_RATE), {"safe": True})
+    assert index.lookup(fingerprint(track(3), AUDIO_RATE)) is None
+
+
+def test_exact_sha256_short_circuits_and_re_add_updates_the_verdict(index):
+    prints = fingerprint(track(1), AUDIO_RATE)
+    index.add("a" * 64, None, prints, {"safe": True})
+    index.add("a" * 64, None, prints, {"safe": False})
+    empty = (np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int32))
+    match = index.lookup(empty, sha256="a" * 64)
+    assert match["similarity"] == 1.0 and match["verdict"] == {"safe": False}
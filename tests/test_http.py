@@ -0,0 +1,131 @@
+# tests/test_http.py
+import asyncio
+
+import httpx
+import pytest
+
+from musigent import http
+from musigent.http import CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Serve requests with a scripted list of responses / exceptions; records calls."""
+    script, calls = [], []
+
+    def handler(request):
+        calls.append(request)
+        step = script.pop(0) if script else 200
+        if isinstance(step, Exception):
+            raise step
+        return httpx.Response(step, content=str(step).encode())
+
+    monkeypatch.setattr(http, "_breakers", {})
+    http.use_transport(httpx.MockTransport(handler))
+    yield script, calls
+    http.use_transport(None)
+
+
+def run(method, retries=2):
+    async def main():
+        return await http.request(method, "https://api.example.com/x", retries=retries)
+    return asyncio.run(main())
+
+
+def test_get_is_retried_on_5xx(upstream):
+    script, calls = upstream
+    script += [503, 502]
+    assert run("GET").status_code == 200
+    assert len(calls) == 3
+
+
+def test_last_5xx_is_returned_after_retries(upstream):
+    script, calls = upstream
+    script += [503, 503, 503]
+    assert run("GET").status_code == 503
+    assert len(calls) == 3
+
+
+def test_post_is_not_resent_after_a_5xx(upstream):
+    script, calls = upstream
+    script.append(503)
+    assert run("POST").status_code == 503
+    assert len(calls) == 1
+
+
+def test_post_is_retried_only_when_it_was_never_sent(upstream):
+    script, calls = upstream
+    script.append(httpx.ConnectError("refused"))
+    assert run("POST").status_code == 200
+    assert len(calls) == 2
+
+    script.append(httpx.ReadTimeout("slow"))
+    with pytest.raises(httpx.ReadTimeout):
+        run("POST")
+    assert len(calls) == 3
+
+
+def run_stream(method, retries=2):
+    async def main():
+        async with http.stream(method, "https://api.example.com/x", retries=retries) as resp:
+            return resp.status_code, await resp.aread()
+    return asyncio.run(main())
+
+
+def test_streamed_get_is_retried_on_5xx_before_the_body_is_read(upstream):
+    script, calls = upstream
+    script += [503, 502]
+    assert run_stream("GET") == (200, b"200")
+    assert len(calls) == 3
+
+
+def test_streamed_get_hands_over_the_last_5xx(upstream):
+    script, calls = upstream
+    script += [503, 503]
+    assert run_stream("GET", retries=1) == (503, b"503")
+    assert len(calls) == 2
+
+
+def test_streamed_post_is_not_resent_after_a_5xx(upstream):
+    script, calls = upstream
+    script.append(503)
+    assert run_stream("POST")[0] == 503
+    assert len(calls) == 1
+
+
+def test_open_circuit_rejects_without_calling(upstream, monkeypatch):
+    script, calls = upstream
+    monkeypatch.setenv("MUSIGENT_BREAKER_THRESHOLD", "2")
+    script += [503, 503]
+    assert run("GET", retries=1).status_code == 503
+    with pytest.raises(CircuitOpenError):
+        run("GET")
+    assert len(calls) == 2
+
+
+def test_breaker_lets_one_trial_through_when_half_open(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(http.time, "monotonic", lambda: clock[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock[0] += 30
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_failed_trial_reopens_the_circuit(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(http.time, "monotonic", lambda: clock[0])
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
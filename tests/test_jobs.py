@@ -0,0 +1,158 @@
+# tests/test_jobs.py
+import asyncio
+
+import httpx
+import pytest
+
+from musigent import http
+from musigent.jobs import FAILED, PENDING, SUCCESS, SunoJobs, callback_token
+from musigent.testing import suno_stub
+from musigent.tools import SunoTool
+
+
+def complete(task_id, url="https://cdn.example/track.wav"):
+    return {
+        "code": 200,
+        "msg": "All generated successfully.",
+        "data": {"callbackType": "complete", "task_id": task_id,
+                 "data": [{"id": f"{task_id}-0", "audio_url": url}]},
+    }
+
+
+@pytest.fixture
+def jobs(workdir):
+    return SunoJobs(str(workdir / "jobs.sqlite3"), poll_interval=0.05, check_interval=0.02, timeout=5)
+
+
+def test_callback_completes_a_submitted_job_and_wakes_its_waiter(jobs):
+    jobs.create("t1")
+
+    async def never_done(task_id):
+        return PENDING, [], None
+
+    async def run():
+        waiter = asyncio.create_task(jobs.wait("t1", never_done))
+        await asyncio.sleep(0.05)
+        assert await asyncio.to_thread(jobs.handle_callback, complete("t1"))
+        return await asyncio.wait_for(waiter, 1)
+
+    job = asyncio.run(run())
+    assert job["status"] == SUCCESS
+    assert job["tracks"][0]["audio_url"] == "https://cdn.example/track.wav"
+
+
+def test_callback_for_unknown_task_is_dropped(jobs):
+    assert jobs.handle_callback(complete("never-submitted", "http://169.254.169.254/x")) is False
+    assert jobs.get("never-submitted") is None
+    assert jobs.handle_callback({"data": "garbage"}) is False
+
+
+def test_finished_job_is_not_overwritten(jobs):
+    jobs.create("t1")
+    jobs.handle_callback(complete("t1"))
+    assert jobs.handle_callback(complete("t1", "http://evil.example/x")) is True
+    assert jobs.get("t1")["tracks"][0]["audio_url"] == "https://cdn.example/track.wav"
+
+    jobs.create("t2")
+    jobs.handle_callback({"code": 500, "msg": "boom", "data": {"task_id": "t2", "callbackType": "error"}})
+    assert jobs.get("t2")["status"] == FAILED
+
+
+def test_old_jobs_are_pruned(jobs):
+    jobs.max_age = 0.0
+    jobs.create("old")
+    jobs.create("new")
+    assert jobs.get("old") is None
+    assert jobs.get("new")["status"] == PENDING
+
+
+def test_callback_token():
+    assert callback_token("https://h/suno/callback?token=s3cret") == "s3cret"
+    assert callback_token("https://h/suno/callback") is None
+    assert callback_token(None) is None
+
+
+def test_wait_falls_back_to_polling_the_suno_stub(jobs, monkeypatch):
+    """The stub never calls back to example.com, so only record-info polling can finish the task."""
+    monkeypatch.setattr(suno_stub, "DELAY", 0.1)
+    http.use_transport(httpx.ASGITransport(app=suno_stub.app))
+    try:
+        tool = SunoTool(base_url="http://suno.stub", callback_url="https://example.com/callback",
+                        jobs=jobs)
+        url = asyncio.run(tool.agenerate_music("rain", "ambient", 5))
+    finally:
+        http.use_transport(None)
+    assert url.startswith("http://suno.stub/audio/") and url.endswith(".wav")
+
+
+def test_callback_route_requires_the_token(api, monkeypatch):
+    module, client = api
+    monkeypatch.setenv("MUSIGENT_CALLBACK_URL", "https://host/suno/callback?token=s3cret")
+    jobs = module.runner.registry.get("suno").jobs
+    jobs.create("t1")
+
+    assert client.post("/suno/callback", json=complete("t1")).status_code == 403
+    assert client.post("/suno/callback?token=wrong", json=complete("t1")).status_code == 403
+    assert jobs.get("t1")["status"] == PENDING
+
+    assert client.post("/suno/callback?token=s3cret", json=complete("unknown")).status_code == 404
+    assert jobs.get("unknown") is None
+
+    assert client.post("/suno/callback?token=s3cret", json=complete("t1")).status_code == 200
+    assert jobs.get("t1")["status"] == SUCCESS
+
+
+def test_callback_route_without_callback_url_rejects_everything(api, monkeypatch):
+    _, client = api
+    monkeypatch.delenv("MUSIGENT_CALLBACK_URL", raising=False)
+    assert client.post("/suno/callback?token=", json=complete("t1")).status_code == 403
+
+
+def test_callback_route_without_suno_key_is_unavailable(api, monkeypatch):
+    _, client = api
+    monkeypatch.setenv("MUSIGENT_CALLBACK_URL", "https://host/suno/callback?token=s3cret")
+    monkeypatch.delenv("SUNO_API_KEY")
+    assert client.post("/suno/callback?token=s3cret", json=complete("t1")).status_code == 503
+
+
+def test_failed_task_gives_its_credits_back(jobs):
+    from musigent.credits import CreditBudget
+
+    credits = CreditBudget(jobs.db_path, cost=10, initial=100)
+    tool = SunoTool(jobs=jobs, credits=credits)
+    assert credits.try_spend()  # reserved at submission
+    jobs.create("t1")
+    jobs.update("t1", FAILED, [], "content policy")
+    assert asyncio.run(tool.await_task("t1")).startswith("SUNO_ERROR")
+    assert credits.status()["remaining"] == 100
+
+
+def test_timed_out_wait_keeps_the_reservation(jobs):
+    from musigent.credits import CreditBudget
+
+    credits = CreditBudget(jobs.db_path, cost=10, initial=100)
+    tool = SunoTool(jobs=jobs, credits=credits)
+    assert credits.try_spend()
+    jobs.create("t1")
+    jobs.timeout = 0.1
+
+    async def pending(task_id):
+        return PENDING, [], None
+
+    tool.apoll = pending
+    assert "timed out" in asyncio.run(tool.await_task("t1"))
+    # the task may still finish (and be charged) upstream
+    assert credits.status()["remaining"] == 90
+
+
+def test_suno_stub_serves_a_distinct_wav_per_task():
+    async def fetch(task_id):
+        transport = httpx.ASGITransport(app=suno_stub.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://stub") as client:
+            return (await client.get(f"/audio/{task_id}.wav")).content
+
+    async def main():
+        return await fetch("a"), await fetch("b")
+
+    a, b = asyncio.run(main())
+    assert a[:4] == b"RIFF" and a != b
@@ -0,0 +1,67 @@
+# tests/test_metrics.py
+import asyncio
+
+from musigent.metrics import Metrics, span, summarize, trace
+
+
+def test_render_counters_gauges_and_histograms():
+    m = Metrics(buckets=(0.1, 1.0))
+    m.inc("musigent_rejections_total", reason="rate_limit")
+    m.inc("musigent_rejections_total", 2, reason="rate_limit")
+    m.set("musigent_queue_depth", 3)
+    m.observe("musigent_stage_seconds", 0.05, stage="suno")
+    m.observe("musigent_stage_seconds", 0.5, stage="suno")
+    m.observe("musigent_stage_seconds", 5, stage="suno")
+    lines = m.render().splitlines()
+
+    assert "# TYPE musigent_rejections_total counter" in lines
+    assert 'musigent_rejections_total{reason="rate_limit"} 3' in lines
+    assert "musigent_queue_depth 3" in lines
+    assert 'musigent_stage_seconds_bucket{stage="suno",le="0.1"} 1' in lines
+    assert 'musigent_stage_seconds_bucket{stage="suno",le="1"} 2' in lines
+    assert 'musigent_stage_seconds_bucket{stage="suno",le="+Inf"} 3' in lines
+    assert 'musigent_stage_seconds_sum{stage="suno"} 5.55' in lines
+    assert 'musigent_stage_seconds_count{stage="suno"} 3' in lines
+
+
+def test_label_values_are_escaped():
+    m = Metrics()
+    m.inc("x_total", path='a"b\\c\nd')
+    assert 'x_total{path="a\\"b\\\\c\\nd"} 1' in m.render().splitlines()
+
+
+def test_trace_collects_spans_from_tasks_and_threads():
+    async def main():
+        with trace() as spans:
+            with span("request"):
+                async def child():
+                    with span("suno"):
+                        await asyncio.sleep(0)
+
+                def blocking():
+                    with span("analysis"):
+                        pass
+
+                await asyncio.gather(child(), child())
+                await asyncio.to_thread(blocking)
+        return spans
+
+    spans = asyncio.run(main())
+    assert [stage for stage, _ in spans] == ["suno", "suno", "analysis", "request"]
+    summary = summarize(spans)
+    assert list(summary) == ["suno", "analysis", "request"]
+
+
+def test_spans_outside_a_trace_only_feed_the_histogram():
+    with span("orphan"):
+        pass
+    with trace() as spans:
+        pass
+    assert spans == []
+
+
+def test_metrics_route(api):
+    _, client = api
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
@@ -0,0 +1,27 @@
+# tests/test_quality.py
+import asyncio
+
+import pytest
+
+from musigent.agents.quality import QualityAgent
+from musigent.memory import MemoryStore
+from musigent.testing.upstreams import AUDIO_HOST
+
+URL = f"https://{AUDIO_HOST}/track-1.wav"
+
+
+def indexed_tracks(agent):
+    return agent.fingerprints.conn.execute("SELECT COUNT(*) FROM fp_tracks").fetchone()[0]
+
+
+@pytest.mark.parametrize("stream, indexed", [("0", 1), ("1", 0)])
+def test_only_whole_track_prints_are_indexed(workdir, monkeypatch, upstreams, stream, indexed):
+    monkeypatch.setenv("MUSIGENT_STREAM_ANALYSIS", stream)
+    monkeypatch.setenv("MUSIGENT_STREAM_MIN_SECONDS", "1")
+    upstreams.track_seconds = 20
+    agent = QualityAgent(MemoryStore("memory_db.json"))
+
+    evaluation = asyncio.run(agent.aevaluate({"audio_url": URL}))
+    assert evaluation["audio_features"].get("complete", True) is (stream == "0")
+    assert evaluation["copyright_safety"]["reasons"][-1] == "No match found in Audd.io database."
+    assert indexed_tracks(agent) == indexed
@@ -0,0 +1,85 @@
+# tests/test_quota.py
+import asyncio
+import threading
+from datetime import datetime
+
+import pytest
+
+from musigent.memory import MemoryStore
+from musigent.quota import DailyQuota
+from musigent.runner import MusigentRunner
+from musigent.storage import utc_now_iso
+
+
+def test_consume_until_exhausted_then_refund(workdir):
+    quota = DailyQuota(str(workdir / "q.sqlite3"), limit=2)
+    assert quota.try_consume("alice") and quota.try_consume("alice")
+    assert not quota.try_consume("alice")
+    assert quota.try_consume("bob")
+    quota.refund("alice")
+    assert quota.usage("alice")["remaining"] == 1
+    quota.refund("carol")  # nothing taken: stays at zero
+    assert quota.used("carol") == 0
+
+
+def test_concurrent_workers_cannot_overspend(workdir):
+    path = str(workdir / "q.sqlite3")
+    quotas = [DailyQuota(path, limit=5) for _ in range(4)]
+    granted = []
+
+    def worker(quota):
+        for _ in range(5):
+            granted.append(quota.try_consume("alice"))
+
+    threads = [threading.Thread(target=worker, args=(q,)) for q in quotas]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert granted.count(True) == 5
+
+
+def test_rebuild_counts_only_the_limited_mode(workdir):
+    memory = MemoryStore("memory_db.json")
+    memory.save_interactions([
+        {"timestamp_utc": utc_now_iso(), "username": "alice", "plan": {"mode": mode},
+         "draft": {}, "evaluation": {}, "time_info": None}
+        for mode in ("jingle", "bgm", "persona", "jingle")
+    ])
+    quota = DailyQuota(memory.db_path, limit=5)
+    quota.rebuild_from_store(memory, mode="jingle")
+    assert quota.used("alice") == 2
+    assert quota.usage("alice")["day"] == datetime.utcnow().strftime("%Y-%m-%d")
+
+
+@pytest.mark.parametrize("failure", [RuntimeError("suno down"), asyncio.CancelledError()])
+def test_failed_jingle_gives_the_quota_unit_back(workdir, monkeypatch, failure):
+    runner = MusigentRunner()
+
+    async def fail(*args, **kwargs):
+        raise failure
+
+    monkeypatch.setattr(runner, "_arun_plan", fail)
+    with pytest.raises(type(failure)):
+        asyncio.run(runner.ahandle_jingle_survey("Acme", "tools", "diy", "standard", "alice"))
+    assert runner.quota.used("alice") == 0
+
+
+def test_failed_batch_item_gives_the_quota_unit_back(workdir, monkeypatch):
+    from musigent.agents.jingle import JingleInput
+
+    runner = MusigentRunner()
+
+    async def fail(*args, **kwargs):
+        raise RuntimeError("suno down")
+
+    monkeypatch.setattr(runner, "_agenerate_result", fail)
+
+    async def run():
+        inputs = [JingleInput(brand_name=f"B{i}", company_field="f", customer_persona="p", vibe="standard")
+                  for i in range(2)]
+        return [item async for item in runner.ahandle_jingle_batch(inputs, "alice")]
+
+    items = asyncio.run(run())
+    assert all("RuntimeError" in item["error"] for item in items)
+    assert runner.quota.used("alice") == 0
@@ -0,0 +1,85 @@
+# tests/test_ratelimit.py
+import asyncio
+import time
+
+import pytest
+
+from musigent.memory import MemoryStore
+from musigent.ratelimit import SlidingWindowLimiter
+from musigent.runner import DAILY_LIMIT_ERROR, MusigentRunner
+from musigent.scheduler import Overloaded
+from musigent.storage import utc_now_iso
+
+
+@pytest.fixture(params=["memory", "shared"])
+def limiter(request, workdir):
+    db_path = str(workdir / "limits.sqlite3") if request.param == "shared" else None
+    return SlidingWindowLimiter(limit=3, window_seconds=60, db_path=db_path)
+
+
+def test_sliding_window(limiter):
+    assert [limiter.allow("alice", now=t) for t in (0, 1, 2, 3)] == [True, True, True, False]
+    assert limiter.allow("bob", now=3)
+    assert not limiter.allow("alice", now=59.9)
+    assert limiter.allow("alice", now=60.0)  # the admission at t=0 left the window
+    assert not limiter.allow("alice", now=60.5)
+
+
+def test_shared_window_spans_workers(workdir):
+    path = str(workdir / "limits.sqlite3")
+    a, b = (SlidingWindowLimiter(limit=2, window_seconds=60, db_path=path) for _ in range(2))
+    assert a.allow("alice", now=0) and b.allow("alice", now=1)
+    assert not a.allow("alice", now=2) and not b.allow("alice", now=2)
+
+
+def test_seed_counts_only_the_limited_mode(workdir):
+    memory = MemoryStore("memory_db.json")
+    memory.save_interactions([
+        {"timestamp_utc": utc_now_iso(), "username": "alice", "plan": {"mode": mode},
+         "draft": {}, "evaluation": {}, "time_info": None}
+        for mode in ("bgm", "bgm", "bgm", "jingle")
+    ])
+    limiter = SlidingWindowLimiter(limit=2, window_seconds=60)
+    limiter.seed_from_store(memory, mode="jingle")
+    now = time.time()
+    assert limiter.allow("alice", now=now)
+    assert not limiter.allow("alice", now=now)
+
+
+def test_over_quota_requests_do_not_fill_the_rate_window(workdir):
+    runner = MusigentRunner()
+    for _ in range(runner.quota.limit):
+        runner.quota.try_consume("alice")
+
+    async def survey():
+        return await runner.ahandle_jingle_survey("Acme", "tools", "diy", "standard", "alice")
+
+    for _ in range(10):
+        assert asyncio.run(survey()) == {"error": DAILY_LIMIT_ERROR}
+    assert runner.rate_limiter.allow("alice")
+
+
+def test_released_admission_frees_its_slot(limiter):
+    now = time.time()
+    for i in range(3):
+        assert limiter.allow("alice", now=now + i)
+    assert not limiter.allow("alice", now=now + 3)
+    limiter.release("alice", now + 2)
+    assert limiter.allow("alice", now=now + 4)
+    assert not limiter.allow("alice", now=now + 5)
+
+
+def test_overloaded_requests_do_not_fill_the_rate_window(workdir):
+    runner = MusigentRunner()
+    runner.scheduler.max_queue = 0
+    runner.scheduler._active = runner.scheduler.max_active
+
+    async def survey():
+        return await runner.ahandle_jingle_survey("Acme", "tools", "diy", "standard", "alice")
+
+    for _ in range(10):
+        with pytest.raises(Overloaded):
+            asyncio.run(survey())
+    runner.scheduler._active = 0
+    assert runner.rate_limiter.allow("alice")
+    assert runner.quota.used("alice") == 0
@@ -0,0 +1,77 @@
+# tests/test_retention.py
+import fcntl
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from musigent.memory import MemoryStore
+from musigent.retention import Retention
+
+
+def days_ago(days: float) -> str:
+    return (datetime.utcnow() - timedelta(days=days)).isoformat(timespec="microseconds") + "Z"
+
+
+def record(ts, username="alice", mode="jingle", approved=True, originality=0.5, safety=None):
+    evaluation = {"approved": approved, "originality_score": originality}
+    if safety is not None:
+        evaluation["copyright_safety"] = {"copyright_safety_score": safety}
+    return {"timestamp_utc": ts, "username": username, "plan": {"mode": mode},
+            "draft": {}, "evaluation": evaluation, "time_info": None}
+
+
+@pytest.fixture(params=["sqlite", "jsonl"])
+def memory(request, workdir):
+    return MemoryStore("memory_db.json", backend=request.param)
+
+
+def test_old_interactions_move_to_the_archive(memory):
+    old = days_ago(40)
+    memory.save_interactions([
+        record(old, originality=0.2, safety=90),
+        record(old, approved=False, originality=0.6, safety=None),
+        record(old, username="bob", mode="bgm"),
+        record(days_ago(1)),
+    ])
+    result = Retention(memory, max_age_days=30).run()
+    assert result["archived"] == 3 and not result["skipped"]
+
+    assert len(memory.history()["items"]) == 1
+    archived = memory.history(archived=True)["items"]
+    assert sorted(item["username"] for item in archived) == ["alice", "alice", "bob"]
+    assert memory.archive.days() == [old[:10]]
+
+
+def test_summary_keeps_daily_rollups(memory):
+    old = days_ago(40)
+    memory.save_interactions([
+        record(old, originality=0.2, safety=90),
+        record(old, approved=False, originality=0.6),
+        record(old, username="bob", mode="bgm"),
+    ])
+    retention = Retention(memory, max_age_days=30)
+    retention.run()
+    alice, = retention.summary(username="alice")
+    assert alice["day"] == old[:10] and alice["mode"] == "jingle"
+    assert alice["interactions"] == 2 and alice["approved"] == 1
+    assert alice["avg_originality"] == pytest.approx(0.4)
+    assert alice["avg_copyright_safety"] == 90
+    assert retention.summary(since=days_ago(1)[:10]) == []
+
+
+def test_row_cap_archives_the_oldest(memory):
+    memory.save_interactions([record(days_ago(n)) for n in (5, 4, 3, 2, 1)])
+    assert Retention(memory, max_age_days=30, max_rows=2).run()["archived"] == 3
+    kept = memory.history(fields=("timestamp_utc",))["items"]
+    assert [item["timestamp_utc"][:10] for item in kept] == [days_ago(1)[:10], days_ago(2)[:10]]
+
+
+def test_run_is_skipped_while_another_process_holds_the_lock(memory):
+    memory.save_interactions([record(days_ago(40))])
+    os.makedirs(memory.archive.directory, exist_ok=True)
+    with open(os.path.join(memory.archive.directory, ".retention.lock"), "w") as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        result = Retention(memory, max_age_days=30).run()
+    assert result["skipped"] and result["archived"] == 0
+    assert len(memory.history()["items"]) == 1
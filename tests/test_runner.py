@@ -0,0 +1,85 @@
+# tests/test_runner.py
+import asyncio
+
+from musigent.metrics import summarize, trace
+from musigent.runner import MusigentRunner
+
+
+def persona_plan(taste):
+    return {"mode": "persona", "prompt": "my song", "duration_sec": 30,
+            "style": "dark rock, driving guitars, moody", "tempo_range": [110, 140],
+            "taste_profile": taste}
+
+
+def test_cached_persona_draft_carries_the_requesting_users_taste(workdir, monkeypatch):
+    runner = MusigentRunner()
+
+    async def generate(plan, candidates=None):
+        draft = {"track_id": "t", "audio_url": "https://cdn.example/t.wav",
+                 "style": plan["style"], "tempo_range": plan["tempo_range"],
+                 "taste_profile": plan["taste_profile"]}
+        return {"draft": draft, "evaluation": {"approved": True}}
+
+    monkeypatch.setattr(runner, "_agenerate", generate)
+    alice = {"genres": {"dark_rock": 1.0}, "energy": 0.7}
+    bob = {"genres": {"dark_rock": 0.9, "rock": 0.4}, "energy": 0.8}
+
+    async def run():
+        first = await runner._agenerate_result(persona_plan(alice), "alice")
+        second = await runner._agenerate_result(persona_plan(bob), "bob")
+        return first, second
+
+    (result_a, record_a), (result_b, record_b) = asyncio.run(run())
+    assert result_b["cache"] == "hit"
+    assert result_b["draft"]["audio_url"] == result_a["draft"]["audio_url"]
+    assert result_b["draft"]["taste_profile"] == record_b["draft"]["taste_profile"] == bob
+    assert record_a["draft"]["taste_profile"] == alice
+
+
+def test_streamed_analysis_downloads_a_stored_track_once(workdir, monkeypatch, upstreams):
+    monkeypatch.setenv("MUSIGENT_STREAM_ANALYSIS", "1")
+    monkeypatch.setenv("MUSIGENT_STREAM_MIN_SECONDS", "1")
+    monkeypatch.delenv("AUDD_API_KEY")
+    upstreams.track_seconds = 20
+    runner = MusigentRunner()
+
+    result = asyncio.run(runner.ahandle_request("bgm", "calm piano", use_cache=False))
+    features = result["evaluation"]["audio_features"]
+    assert features["early_exit"] and features["analyzed_seconds"] < 20
+    assert result["draft"]["local_audio_url"]
+    assert upstreams.calls["cdn"] == 1
+
+
+def test_only_the_selected_candidate_is_stored_and_timed(workdir, monkeypatch):
+    runner = MusigentRunner()
+    stored = []
+
+    class Composer:
+        calls = 0
+
+        async def acompose(self, plan):
+            Composer.calls += 1
+            await asyncio.sleep(0.05)
+            return {"track_id": f"t{Composer.calls}", "audio_url": f"https://cdn.example/t{Composer.calls}.wav"}
+
+    class Quality:
+        async def aevaluate(self, draft):
+            return {"approved": draft["track_id"] == "t3"}
+
+    async def store(draft):
+        stored.append(draft["track_id"])
+
+    runner.registry.register("composer", Composer)
+    runner.registry.register("quality", Quality)
+    monkeypatch.setattr(runner, "_astore_audio", store)
+
+    async def run():
+        with trace() as spans:
+            generated = await runner._agenerate(persona_plan({}), candidates=3)
+        return generated, summarize(spans)
+
+    generated, timings = asyncio.run(run())
+    assert generated["draft"]["track_id"] == "t3"
+    assert stored == ["t3"]
+    # parallel candidates are not summed into the request's stage times
+    assert set(timings) == {"candidates"}
@@ -0,0 +1,107 @@
+# tests/test_scheduler.py
+import asyncio
+
+import pytest
+
+from musigent.scheduler import FairScheduler, Overloaded
+
+
+async def _queue_up(scheduler, users, served):
+    """Start one waiting request per user, in order; each records its turn and finishes."""
+    async def request(user):
+        async with scheduler.slot(user):
+            served.append(user)
+
+    tasks = []
+    for user in users:
+        tasks.append(asyncio.create_task(request(user)))
+        await asyncio.sleep(0)  # enqueue in this order
+    return tasks
+
+
+def test_free_slots_are_granted_immediately():
+    async def main():
+        scheduler = FairScheduler(max_active=2, max_queue=4)
+        await scheduler.acquire("alice")
+        await scheduler.acquire("bob")
+        assert scheduler.status()["active"] == 2
+        scheduler.release()
+        scheduler.release()
+        assert scheduler.status()["active"] == 0
+
+    asyncio.run(main())
+
+
+def test_a_burst_does_not_starve_other_users():
+    async def main():
+        scheduler = FairScheduler(max_active=1, max_queue=8, max_queue_per_user=8)
+        await scheduler.acquire("holder")
+        served = []
+        tasks = await _queue_up(scheduler, ["alice", "alice", "alice", "bob"], served)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        return served
+
+    assert asyncio.run(main()) == ["alice", "bob", "alice", "alice"]
+
+
+def test_weights_give_a_larger_share():
+    async def main():
+        scheduler = FairScheduler(max_active=1, max_queue=8, max_queue_per_user=8,
+                                  weights={"alice": 2})
+        await scheduler.acquire("holder")
+        served = []
+        tasks = await _queue_up(scheduler, ["bob", "bob", "alice", "alice"], served)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        return served
+
+    # alice's tags are 0.5 and 1.0, bob's 1.0 and 2.0
+    assert asyncio.run(main()) == ["alice", "bob", "alice", "bob"]
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    async def main():
+        scheduler = FairScheduler(max_active=1, max_queue=2, max_queue_per_user=1)
+        await scheduler.acquire("holder")
+        tasks = await _queue_up(scheduler, ["alice"], [])
+        with pytest.raises(Overloaded) as per_user:
+            await scheduler.acquire("alice")  # alice already holds the one place allowed per user
+        tasks += await _queue_up(scheduler, ["bob"], [])
+        with pytest.raises(Overloaded) as full:
+            await scheduler.acquire("carol")
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        return per_user.value, full.value
+
+    per_user, full = asyncio.run(main())
+    assert per_user.retry_after >= 1 and full.retry_after >= 1
+
+
+def test_queue_timeout_gives_up_the_place():
+    async def main():
+        scheduler = FairScheduler(max_active=1, max_queue=4, queue_timeout=0.05)
+        await scheduler.acquire("holder")
+        with pytest.raises(Overloaded):
+            await scheduler.acquire("alice")
+        assert scheduler.status()["queued"] == 0
+        scheduler.release()
+        assert scheduler.status()["active"] == 0
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        scheduler = FairScheduler(max_active=1, max_queue=4)
+        await scheduler.acquire("holder")
+        waiter = asyncio.create_task(scheduler.acquire("alice"))
+        await asyncio.sleep(0)
+        assert scheduler.status()["queued"] == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert scheduler.status()["queued"] == 0
+        scheduler.release()
+        assert scheduler.status()["active"] == 0
+
+    asyncio.run(main())
@@ -0,0 +1,133 @@
+# tests/test_storage.py
+import json
+
+import pytest
+
+from musigent.memory import MemoryStore
+from musigent.storage import JsonlBackend, SQLiteBackend, encode_cursor, normalize_timestamp
+
+
+def record(ts, username="alice", mode="jingle", approved=True):
+    return {
+        "timestamp_utc": ts,
+        "username": username,
+        "plan": {"mode": mode, "prompt": f"prompt {ts}"},
+        "draft": {"audio_url": "https://cdn.example/a.wav"},
+        "evaluation": {"approved": approved, "originality_score": 0.5},
+        "time_info": None,
+    }
+
+
+@pytest.fixture(params=["sqlite", "jsonl"])
+def backend(request, workdir):
+    if request.param == "sqlite":
+        return SQLiteBackend(str(workdir / "store.sqlite3"))
+    return JsonlBackend(str(workdir / "store.jsonl"))
+
+
+def test_append_and_count_since(backend):
+    backend.append(record("2025-01-01T10:00:00.000000Z"))
+    backend.append_many([
+        record("2025-01-02T10:00:00.000000Z"),
+        record("2025-01-02T11:00:00.000000Z", username="bob"),
+    ])
+    assert backend.count_since("alice", "2025-01-01T00:00:00.000000Z") == 2
+    assert backend.count_since("alice", "2025-01-02T00:00:00.000000Z") == 1
+    assert backend.count_since("bob", "2025-01-01T00:00:00.000000Z") == 1
+    assert [u for u, _ in backend.since("2025-01-02T00:00:00.000000Z")] == ["alice", "bob"]
+
+
+def test_history_filters_and_keyset_pages(backend):
+    backend.append_many([
+        record(f"2025-01-0{day}T10:00:00.000000Z", mode="jingle" if day % 2 else "bgm",
+               approved=day != 3)
+        for day in range(1, 8)
+    ])
+    rows = backend.history(("plan.mode",), mode="jingle", limit=10)
+    assert [r[0][:10] for r in rows] == ["2025-01-07", "2025-01-05", "2025-01-03", "2025-01-01"]
+
+    rows = backend.history(("evaluation.approved",), approved=False, limit=10)
+    assert [r[0][:10] for r in rows] == ["2025-01-03"]
+
+    first = backend.history(("username",), limit=3)
+    second = backend.history(("username",), before=first[-1][:2], limit=3)
+    assert [r[0][8:10] for r in first + second] == ["07", "06", "05", "04", "03", "02"]
+
+
+def test_history_projects_nested_fields(backend):
+    backend.append(record("2025-01-01T10:00:00.000000Z"))
+    (_, _, values), = backend.history(("plan", "evaluation.originality_score"), limit=1)
+    assert values == [{"mode": "jingle", "prompt": "prompt 2025-01-01T10:00:00.000000Z"}, 0.5]
+
+
+def test_expire_archives_before_deleting(backend):
+    backend.append_many([record(f"2025-01-0{day}T10:00:00.000000Z") for day in range(1, 6)])
+    archived = []
+    removed = backend.expire("2025-01-03T00:00:00.000000Z", 0, lambda recs, conn: archived.extend(recs))
+    assert removed == 2
+    assert [r["timestamp_utc"][:10] for r in archived] == ["2025-01-01", "2025-01-02"]
+    assert backend.count_since("alice", "2000-01-01T00:00:00.000000Z") == 3
+
+    removed = backend.expire("2000-01-01T00:00:00.000000Z", 1, lambda recs, conn: archived.extend(recs))
+    assert removed == 2
+    assert [r[0][:10] for r in backend.history(("username",), limit=10)] == ["2025-01-05"]
+
+
+def test_sqlite_migrates_old_schema(workdir):
+    import sqlite3
+
+    path = str(workdir / "old.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE interactions (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "timestamp_utc TEXT NOT NULL, username TEXT NOT NULL, record TEXT NOT NULL)"
+    )
+    rec = record("2025-01-01T10:00:00.000000Z", mode="bgm", approved=False)
+    conn.execute("INSERT INTO interactions (timestamp_utc, username, record) VALUES (?, ?, ?)",
+                 (rec["timestamp_utc"], rec["username"], json.dumps(rec)))
+    conn.commit()
+    conn.close()
+
+    backend = SQLiteBackend(path)
+    assert len(backend.history(("username",), mode="bgm", approved=False)) == 1
+
+
+def test_memory_store_imports_legacy_json_once(workdir):
+    legacy = {"interactions": [record("2025-01-01T10:00:00Z")]}
+    (workdir / "memory_db.json").write_text(json.dumps(legacy))
+    store = MemoryStore("memory_db.json")
+    assert store.history(username="alice")["items"][0]["plan"]["mode"] == "jingle"
+    assert (workdir / "memory_db.json.migrated").exists()
+    assert len(MemoryStore("memory_db.json").history()["items"]) == 1
+
+
+def test_memory_store_history_pages_and_validates(workdir):
+    store = MemoryStore("memory_db.json")
+    store.save_interactions([record(f"2025-01-0{day}T10:00:00.000000Z") for day in range(1, 6)])
+    page = store.history(limit=2, fields=["timestamp_utc"])
+    assert len(page["items"]) == 2 and page["next_cursor"]
+    rest = store.history(limit=10, fields=["timestamp_utc"], cursor=page["next_cursor"])
+    assert len(rest["items"]) == 3 and rest["next_cursor"] is None
+
+    with pytest.raises(ValueError):
+        store.history(fields=["plan;drop"])
+    with pytest.raises(ValueError, match="Overlapping"):
+        store.history(fields=["plan", "plan.mode"])
+    with pytest.raises(ValueError, match="Overlapping"):
+        store.history(fields=["plan.mode", "plan.mode"])
+    assert store.history(fields=["plan.mode", "plan.modest"], limit=1)["items"]
+    with pytest.raises(ValueError):
+        store.history(since="yesterday")
+    with pytest.raises(ValueError):
+        store.history(cursor="not-a-cursor")
+
+
+def test_normalize_timestamp_and_cursor_roundtrip():
+    assert normalize_timestamp("2025-01-01T10:00:00Z") == "2025-01-01T10:00:00.000000Z"
+    assert encode_cursor("2025-01-01T10:00:00.000000Z", 5)
+
+
+def test_history_route_rejects_overlapping_fields(api):
+    _, client = api
+    resp = client.get("/history", params={"fields": "plan,plan.mode"})
+    assert resp.status_code == 400
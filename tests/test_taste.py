@@ -0,0 +1,69 @@
+# tests/test_taste.py
+import asyncio
+import time
+
+import numpy as np
+
+from musigent.taste import GENRES, STYLES, TasteStore, describe, nearest_style, vectorize
+
+
+class Source:
+    def __init__(self, profile):
+        self.profile = profile
+        self.calls = 0
+
+    def analyze_user(self, username):
+        self.calls += 1
+        time.sleep(0.02)
+        return dict(self.profile)
+
+
+def test_vectorize_and_nearest_style():
+    metal = vectorize({"favorite_genres": ["metal", "dark_rock"], "energy": 0.95})
+    assert metal.shape == (len(GENRES) + 1,)
+    assert nearest_style(metal)[0].startswith("heavy metal")
+    ambient = vectorize({"genre_weights": {"ambient": 1.0, "unknown": 5}, "energy": 0.1})
+    assert nearest_style(ambient)[0].startswith("ambient")
+    assert [s for s, _ in nearest_style(np.stack([metal, ambient]))] == [
+        nearest_style(metal)[0], nearest_style(ambient)[0]
+    ]
+    assert describe(metal)["energy"] == 0.95
+
+
+def test_every_prototype_maps_to_itself():
+    for style, tempo, weights, energy in STYLES:
+        assert nearest_style(vectorize({"genre_weights": weights, "energy": energy})) == (style, tempo)
+
+
+def test_profile_is_fetched_once_and_coalesced(workdir):
+    source = Source({"favorite_genres": ["jazz"], "energy": 0.3})
+    store = TasteStore(str(workdir / "taste.sqlite3"), source, ttl_seconds=3600)
+
+    async def run():
+        return await asyncio.gather(*(store.aprofile("alice") for _ in range(5)))
+
+    vectors = asyncio.run(run())
+    assert source.calls == 1
+    assert all(np.array_equal(v, vectors[0]) for v in vectors)
+
+    # a new store (another worker) reads the shared table instead of the source
+    other = TasteStore(str(workdir / "taste.sqlite3"), source, ttl_seconds=3600)
+    assert np.array_equal(asyncio.run(other.aprofile("alice")), vectors[0])
+    assert source.calls == 1
+
+
+def test_stale_profile_is_served_while_refreshing(workdir):
+    source = Source({"favorite_genres": ["jazz"], "energy": 0.3})
+    store = TasteStore(str(workdir / "taste.sqlite3"), source, ttl_seconds=0)
+
+    async def run():
+        first = await store.aprofile("alice")
+        source.profile = {"favorite_genres": ["metal"], "energy": 0.9}
+        stale = await store.aprofile("alice")  # returns at once, refresh runs behind it
+        await asyncio.sleep(0.1)
+        return first, stale, store._profiles["alice"][0]
+
+    first, stale, refreshed = asyncio.run(run())
+    assert np.array_equal(first, stale)
+    assert nearest_style(refreshed)[0].startswith("heavy metal")
+    assert source.calls == 2
@@ -0,0 +1,103 @@
+# tests/test_time.py
+import asyncio
+import threading
+
+import httpx
+
+import pytest
+
+from musigent.agents import time as time_agent
+from musigent.agents.time import TimeService
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-google-key")
+    return TimeService()
+
+
+def test_without_key_reports_only_the_clock(monkeypatch):
+    monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+    info = TimeService().utc_time()
+    assert info["status"] == "error" and info["utc_time"].endswith("UTC")
+
+
+def test_concurrent_callers_schedule_one_refresh(service, monkeypatch):
+    spawned = []
+
+    def spawn(coro):
+        spawned.append(coro)
+        coro.close()
+
+    monkeypatch.setattr(time_agent, "spawn", spawn)
+    start = threading.Barrier(8)
+
+    def call():
+        start.wait()
+        for _ in range(50):
+            service.utc_time("c1")
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(spawned) == 1
+
+
+def test_refresh_resolves_location_in_the_background(service, upstreams):
+    async def main():
+        assert service.utc_time("c1")["status"] == "success"  # not known yet: optimistic
+        assert service.location("c1") is None
+        while "c1" in service._refreshing:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert service.location("c1") is not None
+    assert service.utc_time("c1")["status"] == "success"
+
+
+def test_cancelled_refresh_can_be_retried(service, monkeypatch):
+    async def hang(*args, **kwargs):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(time_agent.http, "request", hang)
+
+    async def main():
+        service.utc_time("c1")
+        await asyncio.sleep(0)
+        assert "c1" in service._refreshing
+        # asyncio.run() cancels the pending refresh on exit
+
+    asyncio.run(main())
+    assert "c1" not in service._refreshing
+
+
+def run_refresh(service, respond):
+    async def request(*args, **kwargs):
+        return respond()
+
+    async def main():
+        service.utc_time("c1")
+        while "c1" in service._refreshing:
+            await asyncio.sleep(0.01)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(time_agent.http, "request", request)
+        asyncio.run(main())
+    return service.utc_time("c1")
+
+
+def test_any_answer_from_the_api_counts_as_success(service):
+    # like the blocking lookup: the POST completed, its status code does not matter
+    info = run_refresh(service, lambda: httpx.Response(403, json={"error": "quota"}))
+    assert info["status"] == "success" and info["source"] == "google geolocation"
+    assert service.location("c1") is None
+
+
+def test_failed_lookup_reports_an_error(service):
+    def fail():
+        raise httpx.ConnectError("offline")
+
+    info = run_refresh(service, fail)
+    assert info["status"] == "error" and "source" not in info
@@ -0,0 +1,88 @@
+# tests/test_workers.py
+import asyncio
+import os
+import time
+
+import pytest
+
+from musigent.workers import AudioWorkerTimeout, AudioWorkerPool
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def _sleep_then_crash(seconds):
+    time.sleep(seconds)
+    os._exit(1)
+
+
+@pytest.fixture
+def workers(request):
+    pool = AudioWorkerPool(max_workers=getattr(request, "param", 2), task_timeout=1.0)
+    yield pool
+    pool.shutdown()
+
+
+async def _warm_up(pool):
+    # spawning the workers must not count against the timeout
+    timeout, pool.task_timeout = pool.task_timeout, 60
+    try:
+        await asyncio.gather(*(pool._run(_sleep, 0.1) for _ in range(pool.max_workers)))
+    finally:
+        pool.task_timeout = timeout
+
+
+@pytest.mark.parametrize("workers", [4], indirect=True)
+def test_hung_task_times_out_alone(workers):
+    async def main():
+        await _warm_up(workers)
+        executor = workers._executor
+        slow, normal = await asyncio.gather(
+            workers._run(_sleep, 5), workers._run(_sleep, 0.2), return_exceptions=True
+        )
+        assert isinstance(slow, AudioWorkerTimeout)
+        assert normal == 0.2
+        # the pool survived the timeout and still runs tasks on its free worker
+        assert workers._executor is executor
+        assert await workers._run(_sleep, 0) == 0
+        assert workers._executor is executor
+
+    asyncio.run(main())
+
+
+def test_pool_is_replaced_once_too_many_workers_hang(workers):
+    async def main():
+        await _warm_up(workers)
+        executor = workers._executor
+        with pytest.raises(AudioWorkerTimeout):
+            await workers._run(_sleep, 5)
+        # max_workers=2: one stuck worker is half the pool, so it gets replaced
+        assert workers._executor is None
+        assert executor not in workers._running
+        assert await workers._run(_sleep, 0) == 0
+        assert workers._executor is not executor
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("workers", [4], indirect=True)
+def test_worker_crashing_after_its_timeout_gets_the_pool_replaced(workers):
+    async def main():
+        await _warm_up(workers)
+        executor = workers._executor
+        with pytest.raises(AudioWorkerTimeout):
+            await workers._run(_sleep_then_crash, 1.5)
+        assert workers._executor is executor  # one stuck worker of four: pool kept
+        for _ in range(100):
+            if workers._executor is not executor:
+                break
+            await asyncio.sleep(0.05)
+        # the crash retired the broken pool; later tasks run on a fresh one
+        assert workers._executor is not executor
+        timeout, workers.task_timeout = workers.task_timeout, 60  # includes spawning
+        assert await workers._run(_sleep, 0) == 0
+        workers.task_timeout = timeout
+
+    asyncio.run(main())